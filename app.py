@@ -1,14 +1,18 @@
-from flask import Flask, request, render_template, redirect, url_for, flash, send_file, abort
+from flask import Flask, request, render_template, redirect, url_for, flash, send_file, abort, jsonify, Response
 import os
 import uuid
 import tempfile
 import traceback
 import logging
 import json
-import io
+from contextlib import closing
 from werkzeug.utils import secure_filename
-from processor import process_katapult_json
+from werkzeug.exceptions import HTTPException
+from processor import process_katapult_json, validate_katapult_data, load_katapult_data
 from processor import storage
+from processor import result_cache
+from processor.streaming_ingest import UploadValidator
+from processor.job_queue import JobQueue, WorkerPool, STATUS_SUCCESS
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -38,11 +42,51 @@ app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max upload size
 app.config['UPLOAD_FOLDER'] = uploads_dir
 app.config['ALLOWED_EXTENSIONS'] = {'json'}
 app.config['DELETE_UPLOADED_JSON'] = True  # Set to False to keep uploaded JSON for debugging
+# Run report generation in background worker processes instead of inside the request
+app.config['ASYNC_PROCESSING'] = os.environ.get('ASYNC_PROCESSING', 'True').lower() == 'true'
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 1))  # Worker processes per web process
+app.config['JOB_DB_PATH'] = os.environ.get('JOB_DB_PATH', os.path.join(uploads_dir, 'jobs.sqlite3'))
+# Parse uploads incrementally, keeping only the fields the report reads
+app.config['STREAMING_INGEST'] = os.environ.get('STREAMING_INGEST', 'True').lower() == 'true'
+# Processes used to extract pole data for one report (1 = serial)
+app.config['EXTRACTION_WORKERS'] = int(os.environ.get('EXTRACTION_WORKERS', 1))
+# Show a per-stage timing breakdown with each report
+app.config['PROFILE_STAGES'] = os.environ.get('PROFILE_STAGES', 'False').lower() == 'true'
+# Re-extract only the poles that changed since the previous upload of the same job
+app.config['INCREMENTAL_PROCESSING'] = os.environ.get('INCREMENTAL_PROCESSING', 'False').lower() == 'true'
+# With S3 storage, redirect report downloads to a presigned S3 URL instead of streaming them through the app
+app.config['S3_PRESIGNED_DOWNLOADS'] = os.environ.get('S3_PRESIGNED_DOWNLOADS', 'False').lower() == 'true'
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+job_queue = JobQueue(app.config['JOB_DB_PATH']) if app.config['ASYNC_PROCESSING'] else None
+worker_pool = WorkerPool(app.config['JOB_DB_PATH'], app.config['JOB_WORKERS']) if app.config['ASYNC_PROCESSING'] else None
 
 def allowed_file(filename):
     """Check if file has an allowed extension"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def wants_json():
+    """True if the client asked for a JSON response rather than an HTML page"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def job_status_payload(job):
+    """Public view of a queued job for the status endpoint"""
+    payload = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+    }
+    if job['status'] == STATUS_SUCCESS:
+        payload['stats'] = job['stats']
+        payload['download_url'] = url_for('download_job', job_id=job['id'])
+    if job['error']:
+        payload['error'] = job['error']
+    return payload
+
 @app.route('/')
 def index():
     """Render the main upload page"""
@@ -108,21 +152,70 @@ def upload_file():
         excel_filename = f"make_ready_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         excel_path = os.path.join(app.config['UPLOAD_FOLDER'], excel_filename)
         
-        # Save the uploaded file using storage utility
-        json_path = storage.save_file(json_path, file)
-        logger.info(f'Successfully saved uploaded file: {json_path}')
+        # Save the uploaded file using storage utility, block by block. It is hashed and
+        # checked as it is written, so it is never held in memory or read back for that.
+        content_hash = storage.ContentHash()
+        upload_validator = UploadValidator()
+        json_path = storage.save_file(json_path, file, content_hash=content_hash, validator=upload_validator)
+        upload_hash = content_hash.hexdigest()
+        logger.info(f'Successfully saved uploaded file: {json_path} ({content_hash.size} bytes, sha256 {upload_hash})')
         
-        # Validate JSON file
+        # Reject files that are not Katapult exports before they are cached, queued or loaded
         try:
-            # Get file content from storage
-            json_content = storage.get_file(json_path)
-            if isinstance(json_content, bytes):
-                json_content = json_content.decode('utf-8')
-            
-            json_data = json.loads(json_content)
+            upload_validator.validate()
+        except json.JSONDecodeError:
+            flash('The uploaded file is not valid JSON.', 'danger')
+            logger.error(f'Invalid JSON format: {json_path}')
+            storage.delete_file(json_path)
+            return redirect(url_for('index'))
+        except ValueError as e:
+            flash(f'Validation error: {str(e)}', 'danger')
+            logger.error(f'JSON validation failed: {str(e)}')
+            storage.delete_file(json_path)
+            return redirect(url_for('index'))
+        
+        # The same export was processed before: serve the cached report
+        report_cache = result_cache.default_cache()
+        if report_cache is not None:
+            stats = report_cache.fetch(upload_hash, excel_path)
+            if stats is not None:
+                if app.config['DELETE_UPLOADED_JSON']:
+                    storage.delete_file(json_path)
+                logger.info(f'Served cached report for {json_path}: {excel_path}')
+                if wants_json():
+                    return jsonify({'status': STATUS_SUCCESS, 'stats': stats,
+                                    'download_url': url_for('download_file', filename=excel_filename)})
+                return render_template('result.html', excel_filename=excel_filename, stats=stats)
+        
+        # Hand the file to the background workers and return straight away;
+        # loading and processing happen in the worker.
+        if app.config['ASYNC_PROCESSING']:
+            worker_pool.start()
+            # Prefix with the upload id so reports queued in the same second don't collide
+            excel_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{excel_filename}")
+            job_id = job_queue.enqueue(json_path, excel_path, excel_filename,
+                                       delete_input=app.config['DELETE_UPLOADED_JSON'],
+                                       content_hash=upload_hash)
+            status_url = url_for('job_status', job_id=job_id)
+            if wants_json():
+                return jsonify({'job_id': job_id, 'status_url': status_url}), 202
+            return render_template('processing.html', job_id=job_id, status_url=status_url)
+        
+        # Load the JSON file. The parsed data is handed straight to the processor
+        # below so large exports are only parsed once.
+        try:
+            if app.config['STREAMING_INGEST']:
+                # Stream straight from the saved upload (local file or S3 body)
+                with closing(storage.open_file(json_path)) as json_file:
+                    json_data = load_katapult_data(json_file, streaming=True)
+            else:
+                # Get file content from storage
+                json_content = storage.get_file(json_path)
+                
+                json_data = load_katapult_data(json_content)
+                del json_content
             # Verify this is a Katapult file by checking for key structures
-            if not all(key in json_data for key in ['nodes', 'connections']):
-                raise ValueError("This does not appear to be a valid Katapult JSON file. Required keys not found.")
+            validate_katapult_data(json_data)
         except json.JSONDecodeError:
             flash('The uploaded file is not valid JSON.', 'danger')
             logger.error(f'Invalid JSON format: {json_path}')
@@ -138,7 +231,10 @@ def upload_file():
         
         # Process the file
         logger.info(f'Processing file: {json_path}')
-        stats = process_katapult_json(json_path, excel_path)
+        stats = process_katapult_json(json_data, excel_path,
+                                      extraction_workers=app.config['EXTRACTION_WORKERS'],
+                                      profile=app.config['PROFILE_STAGES'],
+                                      incremental=app.config['INCREMENTAL_PROCESSING'])
         
         # Check if processing was successful
         if stats.get('status') == 'error':
@@ -148,6 +244,9 @@ def upload_file():
                 os.remove(json_path)
             return redirect(url_for('index'))
         
+        # Keep the report for repeated uploads of the same export
+        result_cache.cache_report(upload_hash, excel_path, stats)
+        
         # Clean up the uploaded JSON file if configured to do so
         if app.config['DELETE_UPLOADED_JSON']:
             storage.delete_file(json_path)
@@ -167,6 +266,39 @@ def upload_file():
         flash(f'An unexpected error occurred: {str(e)}', 'danger')
         return redirect(url_for('index'))
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the status and progress of a queued report job"""
+    if job_queue is None:
+        abort(404, description="Background processing is disabled")
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'job_id': job_id, 'status': 'unknown', 'error': 'Job not found'}), 404
+    # Make sure someone is draining the queue (e.g. after a restart)
+    worker_pool.start()
+    return jsonify(job_status_payload(job))
+
+@app.route('/jobs/<job_id>/download')
+def download_job(job_id):
+    """Serve the Excel report produced by a finished job"""
+    if job_queue is None:
+        abort(404, description="Background processing is disabled")
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404, description="Job not found")
+    if job['status'] != STATUS_SUCCESS:
+        return jsonify(job_status_payload(job)), 409
+    if not os.path.exists(job['output_path']):
+        logger.error(f'Report for job {job_id} is missing: {job["output_path"]}')
+        abort(404, description="File not found")
+    
+    logger.info(f'Serving download for job {job_id}: {job["excel_filename"]}')
+    return send_file(
+        job['output_path'],
+        as_attachment=True,
+        download_name=job['excel_filename']
+    )
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """Handle file download"""
@@ -179,31 +311,41 @@ def download_file(filename):
     
     logger.info(f'Serving download: {filename}')
     try:
-        # For S3 storage, check if the file exists by trying to get metadata
-        if os.environ.get('USE_S3', 'False').lower() == 'true':
-            s3_path = f"s3://{os.environ.get('S3_BUCKET_NAME')}/{filename}"
-            file_content = storage.get_file(s3_path)
+        # Reports on S3 are sent to the client from the bucket, never buffered here
+        s3_backend = storage.get_s3_backend()
+        if s3_backend is not None:
+            s3_path = f"s3://{s3_backend.bucket}/{filename}"
             
-            # Create a BytesIO object from the file content
-            file_stream = io.BytesIO(file_content)
+            # Let the client fetch the report straight from S3
+            if app.config['S3_PRESIGNED_DOWNLOADS']:
+                download_url = storage.presigned_url(s3_path, download_name=filename, content_type=XLSX_MIMETYPE)
+                if download_url:
+                    return redirect(download_url)
             
-            return send_file(
-                file_stream,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-        else:
-            # Local storage - check if file exists
-            if not os.path.exists(file_path):
-                logger.error(f'Download attempted for non-existent file: {file_path}')
-                abort(404, description="File not found")
-                
-            return send_file(
-                file_path,
-                as_attachment=True,
-                download_name=filename
-            )
+            # Otherwise stream the S3 body through in blocks
+            try:
+                blocks, size = storage.stream_file(s3_path)
+                response = Response(blocks, mimetype=XLSX_MIMETYPE, direct_passthrough=True)
+                response.headers['Content-Length'] = str(size)
+                response.headers['Content-Disposition'] = storage.content_disposition(filename)
+                return response
+            except FileNotFoundError:
+                # Reports generated by this dyno are kept locally
+                logger.info(f'{filename} is not in the S3 bucket; looking for a local copy')
+        
+        # Local storage - check if file exists
+        if not os.path.exists(file_path):
+            logger.error(f'Download attempted for non-existent file: {file_path}')
+            abort(404, description="File not found")
+            
+        # send_file streams the file from disk with its Content-Length
+        return send_file(
+            file_path,
+            as_attachment=True,
+            download_name=filename
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f'Error serving file: {str(e)}')
         abort(500, description="Error serving file")
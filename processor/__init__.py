@@ -1,4 +1,4 @@
 # Export the main function for external use
-from .core import process_katapult_json
+from .core import process_katapult_json, validate_katapult_data, load_katapult_data
 
-__all__ = ['process_katapult_json']
+__all__ = ['process_katapult_json', 'validate_katapult_data', 'load_katapult_data']
@@ -4,224 +4,300 @@ Functions for processing connection-related data from Katapult JSON.
 
 import math
 import logging
+from collections import namedtuple
 from .height_utils import format_height_feet_inches
-from .photo_data_utils import get_photofirst_data, get_utility_company_names
+from .job_index import as_job_index
+from .instrumentation import timed
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def get_lowest_heights_for_connection(job_data, connection_id):
-    """Get the lowest heights for a connection"""
-    lowest_com = float('inf')
-    lowest_cps = float('inf')
-    connection_data = job_data.get("connections", {}).get(connection_id, {})
+# One wire annotation on a span: the TraceClass of its trace, measured height in
+# inches (None if missing or not numeric) and the raw annotation
+SpanWire = namedtuple("SpanWire", "trace height annotation")
+
+# Lowest measurement of one trace across a span. position orders wires in the
+# sequence they were walked so ties go to the first one, and move is the
+# mr_move/_effective_moves total of the annotation at that lowest point.
+SpanTrace = namedtuple("SpanTrace", "trace height section_id position move")
+
+
+def _parse_height(value):
+    """Return value as a float, or None if it is missing or not numeric."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, str):
+            value = float(value)
+        return float(value)
+    except (ValueError, TypeError):
+        logger.debug(f"Error converting measured_height '{value}' to float")
+        return None
+
+
+def _midspan_move_inches(wire_annotation):
+    """
+    Total proposed move of a span wire annotation in inches.
+
+    mr_move counts in full; each _effective_moves value contributes half of itself,
+    rounded away from zero. Values that are not numeric are ignored.
+    """
+    total_move_inches = 0.0
+    mr_move = wire_annotation.get("mr_move", "0") # Default to "0" if missing
+    try:
+        if isinstance(mr_move, str):
+            mr_move = float(mr_move)
+        total_move_inches += float(mr_move)
+    except (ValueError, TypeError) as e:
+        logger.debug(f"Error converting mr_move '{mr_move}' to float: {str(e)}")
+        # mr_move might be invalid, treat as 0
+
+    effective_moves_dict = wire_annotation.get("_effective_moves", {})
+    if isinstance(effective_moves_dict, dict):
+        for move_key, move_val in effective_moves_dict.items():
+            try:
+                if isinstance(move_val, str):
+                    move_val = float(move_val)
+                move_val_float = float(move_val)
+
+                if move_val_float > 0:
+                    move_contribution = math.ceil(move_val_float / 2.0)
+                elif move_val_float < 0:
+                    move_contribution = math.floor(move_val_float / 2.0)
+                else:
+                    move_contribution = 0
+
+                total_move_inches += move_contribution
+            except (ValueError, TypeError) as e:
+                logger.debug(f"Error processing effective_move '{move_val}': {str(e)}")
+                continue
+    return total_move_inches
+
+
+def _attacher_matches(trace, attacher_name_upper):
+    """Flexible match of an attacher name against a wire's company / cable type."""
+    # Various formats of the wire's attacher name for flexible matching
+    for fmt_upper in (trace.company_upper, trace.attacher_name_upper, trace.cable_type_upper):
+        if (fmt_upper == attacher_name_upper or
+            fmt_upper in attacher_name_upper or
+            attacher_name_upper in fmt_upper):
+            return True
+    return False
+
+
+class SpanProfile:
+    """
+    Wire measurements of one connection, collected in a single pass over its sections.
+
+    Midspan lookups used to walk every section's photo data once per attacher
+    row; the profile is built the first time a connection is asked about and
+    answers the lowest-height and proposed-height questions from it.
+
+    Attributes:
+        connection_id (str): The connection the profile describes
+        section_wires (dict): section_id -> [SpanWire, ...] for every section with a main photo
+        traces (dict): trace_id -> SpanTrace, in the order the traces first appear
+        lowest_com (float): Lowest communication wire height in inches (inf if none)
+        lowest_cps (float): Lowest utility neutral / street light height in inches (inf if none)
+    """
+
+    def __init__(self, job_index, connection_id):
+        self.connection_id = connection_id
+        self.section_wires = {}
+        self.traces = {}
+        self.lowest_com = float('inf')
+        self.lowest_cps = float('inf')
+        # Stripped attacher name -> proposed height in inches (None when none)
+        self._proposed_heights = {}
+        self._build(job_index)
+
+    def _build(self, job_index):
+        sections = job_index.connection(self.connection_id).get("sections", {}) or {}
+        position = 0
+
+        for section_id in sections:
+            if not job_index.section_main_photo_id(self.connection_id, section_id):
+                logger.debug(f"No main photo found in section {section_id} of connection {self.connection_id}")
+                continue
+
+            photofirst_data = job_index.section_main_photofirst_data(self.connection_id, section_id)
+            wires = self.section_wires[section_id] = []
+
+            for wire_key, wire in photofirst_data.get("wire", {}).items():
+                trace_id = wire.get("_trace")
+                trace = job_index.trace_class(trace_id) if trace_id else None
+                if trace is None:
+                    continue
+
+                height = _parse_height(wire.get("_measured_height"))
+                wires.append(SpanWire(trace, height, wire))
+                position += 1
+
+                # NaN and +inf never count as the lowest measurement
+                if height is None or not height < float('inf'):
+                    continue
+                current = self.traces.get(trace_id)
+                if current is None or height < current.height:
+                    self.traces[trace_id] = SpanTrace(trace, height, section_id, position, _midspan_move_inches(wire))
+
+        for span_trace in self.traces.values():
+            trace = span_trace.trace
+            if trace.is_utility and (trace.is_neutral or trace.is_street_light):
+                self.lowest_cps = min(self.lowest_cps, span_trace.height)
+            elif not trace.is_utility: # Assuming any non-CPS is communication for this purpose
+                self.lowest_com = min(self.lowest_com, span_trace.height)
+
+    def lowest_trace_for_attacher(self, attacher_name):
+        """
+        Return the SpanTrace with the lowest measurement matching attacher_name (primary wires excluded).
+
+        Args:
+            attacher_name (str): Stripped attacher name (e.g., "ATT Fiber")
+
+        Returns:
+            SpanTrace: The lowest matching trace (first measured wins ties), or None
+        """
+        attacher_name_upper = attacher_name.upper()
+        lowest = None
+        for span_trace in self.traces.values():
+            if span_trace.trace.is_primary:
+                continue # Skip primary wires
+            if not _attacher_matches(span_trace.trace, attacher_name_upper):
+                continue
+            if lowest is None or (span_trace.height, span_trace.position) < (lowest.height, lowest.position):
+                lowest = span_trace
+        return lowest
+
+    def proposed_height_inches(self, attacher_name):
+        """Midspan proposed height in inches for attacher_name (None if none), computed once per name."""
+        if attacher_name in self._proposed_heights:
+            return self._proposed_heights[attacher_name]
+
+        lowest = self.lowest_trace_for_attacher(attacher_name)
+        if lowest is None:
+            logger.debug(f"No matching wire found for attacher '{attacher_name}' in connection {self.connection_id}")
+            result = None
+        elif lowest.trace.is_proposed:
+            # If the wire itself is marked as 'proposed' in traces, its "proposed height" is its measured height
+            result = lowest.height
+        elif abs(lowest.move) > 0.01: # Using a small epsilon for float comparison
+            result = lowest.height + lowest.move
+        else:
+            # No significant move, so no "proposed height" distinct from existing
+            result = None
+        self._proposed_heights[attacher_name] = result
+        return result
+
+    def proposed_height(self, attacher_name):
+        """Formatted midspan proposed height for attacher_name ("" when none)."""
+        return format_height_feet_inches(self.proposed_height_inches(attacher_name))
+
+
+def get_span_profile(job_index, connection_id):
+    """
+    Return the SpanProfile of a connection, building it on first use.
+
+    Args:
+        job_index (JobIndex): Index over the Katapult JSON data (a raw job dict is also accepted)
+        connection_id (str): The connection ID
+
+    Returns:
+        SpanProfile: The profile cached on the job index
+    """
+    job_index = as_job_index(job_index)
+    profile = job_index.span_profiles.get(connection_id)
+    if profile is None:
+        profile = job_index.span_profiles[connection_id] = SpanProfile(job_index, connection_id)
+    return profile
+
+
+def get_lowest_height_values(job_index, connection_id):
+    """
+    Get the lowest communication and CPS electrical heights of a connection in inches.
+
+    Args:
+        job_index (JobIndex): Index over the Katapult JSON data (a raw job dict is also accepted)
+        connection_id (str): The connection ID
+
+    Returns:
+        tuple: (lowest_com, lowest_cps) as floats, None where nothing was measured
+    """
+    job_index = as_job_index(job_index)
+    connection_data = job_index.connection(connection_id)
     if not connection_data: 
         logger.debug(f"Connection ID {connection_id} not found in job_data")
-        return "", ""
+        return None, None
         
     sections = connection_data.get("sections", {})
     if not sections: 
         logger.debug(f"No sections found in connection {connection_id}")
-        return "", ""
-        
-    trace_data = job_data.get("traces", {}).get("trace_data", {})
-    utility_company_names = get_utility_company_names()
-    
-    for section_id, section_data_entry in sections.items():
-        section_photos_dict = section_data_entry.get("photos", {})
-        main_photo_id = next((pid for pid, p_entry in section_photos_dict.items() if p_entry.get("association") == "main"), None)
-        if not main_photo_id: 
-            logger.debug(f"No main photo found in section {section_id} of connection {connection_id}")
-            continue
-        
-        main_photo_entry = section_photos_dict.get(main_photo_id, {})
-        photofirst_data = get_photofirst_data(main_photo_id, main_photo_entry, job_data)
-        
-        for wire_key, wire in photofirst_data.get("wire", {}).items():
-            trace_id = wire.get("_trace")
-            if not trace_id or trace_id not in trace_data: 
-                continue
-                
-            trace_info = trace_data[trace_id]
-            company = trace_info.get("company", "").strip()
-            cable_type = trace_info.get("cable_type", "").strip()
-            measured_height = wire.get("_measured_height")
-            
-            if measured_height is not None:
-                try:
-                    # Convert to float if it's a string
-                    if isinstance(measured_height, str):
-                        measured_height = float(measured_height)
-                    height = float(measured_height)
-                    
-                    # Check if company is a utility company using flexible matching
-                    is_utility = any(company.upper() == util_name.upper() for util_name in utility_company_names)
-                    
-                    if is_utility and cable_type.upper() in ["NEUTRAL", "STREET LIGHT"]:
-                        lowest_cps = min(lowest_cps, height)
-                        logger.debug(f"Found CPS wire in section {section_id}: {cable_type}, height: {height}")
-                    elif not is_utility: # Assuming any non-CPS is communication for this purpose
-                        lowest_com = min(lowest_com, height)
-                        logger.debug(f"Found communication wire in section {section_id}: {company} {cable_type}, height: {height}")
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Error converting measured_height '{measured_height}' to float: {str(e)}")
-                    continue
+        return None, None
+
+    profile = get_span_profile(job_index, connection_id)
+    lowest_com = profile.lowest_com if profile.lowest_com != float('inf') else None
+    lowest_cps = profile.lowest_cps if profile.lowest_cps != float('inf') else None
+    return lowest_com, lowest_cps
+
+
+def get_lowest_heights_for_connection(job_index, connection_id):
+    """Get the lowest heights for a connection"""
+    lowest_com, lowest_cps = get_lowest_height_values(job_index, connection_id)
     
-    lowest_com_formatted = format_height_feet_inches(lowest_com) if lowest_com != float('inf') else ""
-    lowest_cps_formatted = format_height_feet_inches(lowest_cps) if lowest_cps != float('inf') else ""
+    lowest_com_formatted = format_height_feet_inches(lowest_com)
+    lowest_cps_formatted = format_height_feet_inches(lowest_cps)
     
     logger.debug(f"Connection {connection_id} - Lowest com height: {lowest_com_formatted}, Lowest CPS height: {lowest_cps_formatted}")
     return lowest_com_formatted, lowest_cps_formatted
 
-def get_midspan_proposed_heights(job_data, connection_id, attacher_name):
+@timed("get_midspan_proposed_height_value")
+def get_midspan_proposed_height_value(job_index, connection_id, attacher_name):
     """
-    Get the proposed height for a specific attacher in the connection's span.
+    Get the proposed height in inches for a specific attacher in the connection's span.
     
     For each wire:
     1. Find the section with the lowest measured height for the attacher
     2. Use that section's wire data to check for mr_move or effective_moves
     3. If there are moves (nonzero), calculate and return the proposed height
-    4. If no moves, or if the wire is marked 'proposed', return existing height or empty.
+    4. If the wire is marked 'proposed', return its measured height; if no moves, None.
+
+    The span is walked once per connection (see SpanProfile); repeated lookups
+    for the same attacher are dictionary hits.
     
     Args:
-        job_data (dict): The Katapult JSON data
+        job_index (JobIndex): Index over the Katapult JSON data (a raw job dict is also accepted)
         connection_id (str): The connection ID to analyze
         attacher_name (str): The attacher name to find (e.g., "ATT Fiber")
         
     Returns:
-        str: Formatted proposed height or empty string if no changes / not applicable
+        float: Proposed height in inches, or None if no changes / not applicable
     """
     if not attacher_name:
         logger.debug(f"Empty attacher name provided for connection {connection_id}")
-        return ""
+        return None
         
     attacher_name = attacher_name.strip()
     
-    connection_data = job_data.get("connections", {}).get(connection_id, {})
+    job_index = as_job_index(job_index)
+    connection_data = job_index.connection(connection_id)
     if not connection_data: 
         logger.debug(f"Connection ID {connection_id} not found in job_data")
-        return ""
+        return None
         
     sections = connection_data.get("sections", {})
     if not sections: 
         logger.debug(f"No sections found in connection {connection_id}")
-        return ""
-        
-    trace_data = job_data.get("traces", {}).get("trace_data", {})
-    
-    lowest_height_for_attacher = float('inf')
-    # Stores (section_data_entry, wire_annotation, trace_info_for_wire) for the wire with lowest height
-    lowest_height_wire_details = None 
-    matched_on = ""
-    
-    for section_id, section_data_entry in sections.items():
-        section_photos_dict = section_data_entry.get("photos", {})
-        main_photo_id = next((pid for pid, p_entry in section_photos_dict.items() if p_entry.get("association") == "main"), None)
-        if not main_photo_id: 
-            logger.debug(f"No main photo found in section {section_id} of connection {connection_id}")
-            continue
-            
-        main_photo_entry = section_photos_dict.get(main_photo_id, {})
-        photofirst_data = get_photofirst_data(main_photo_id, main_photo_entry, job_data)
-        
-        for wire_key, wire_annotation in photofirst_data.get("wire", {}).items():
-            trace_id = wire_annotation.get("_trace")
-            if not trace_id or trace_id not in trace_data: 
-                continue
-                
-            trace_info_for_wire = trace_data[trace_id]
-            company = trace_info_for_wire.get("company", "").strip()
-            cable_type = trace_info_for_wire.get("cable_type", "").strip()
-            
-            if cable_type.upper() == "PRIMARY": 
-                continue # Skip primary wires
-            
-            # Build various formats of attacher name for flexible matching
-            current_wire_attacher_formats = [
-                company.strip(),
-                f"{company} {cable_type}".strip(),
-                cable_type.strip()
-            ]
-            
-            # Check for a match using flexible pattern matching
-            match_found = False
-            for fmt in current_wire_attacher_formats:
-                if (fmt.upper() == attacher_name.upper() or 
-                    fmt.upper() in attacher_name.upper() or 
-                    attacher_name.upper() in fmt.upper()):
-                    match_found = True
-                    matched_on = fmt
-                    break
-            
-            if match_found:
-                measured_height_str = wire_annotation.get("_measured_height")
-                if measured_height_str is not None:
-                    try:
-                        if isinstance(measured_height_str, str):
-                            measured_height_str = float(measured_height_str)
-                        current_measured_height = float(measured_height_str)
-                        if current_measured_height < lowest_height_for_attacher:
-                            lowest_height_for_attacher = current_measured_height
-                            lowest_height_wire_details = (section_data_entry, wire_annotation, trace_info_for_wire)
-                            logger.debug(f"Found matching wire for '{attacher_name}' (matched on '{matched_on}') with height {current_measured_height}")
-                    except (ValueError, TypeError) as e:
-                        logger.debug(f"Error converting measured_height '{measured_height_str}' to float: {str(e)}")
-                        continue
-    
-    if lowest_height_wire_details:
-        # Unpack the details for the wire at its lowest point
-        _section_data, wire_at_lowest, trace_info_at_lowest = lowest_height_wire_details
-        
-        # If the wire itself is marked as 'proposed' in traces, its "proposed height" is its measured height
-        if trace_info_at_lowest.get("proposed", False):
-            logger.debug(f"Wire is marked as proposed, returning existing height for '{attacher_name}'")
-            return format_height_feet_inches(lowest_height_for_attacher)
-        
-        # Check for moves on this specific wire annotation
-        mr_move_str = wire_at_lowest.get("mr_move", "0") # Default to "0" if missing
-        effective_moves_dict = wire_at_lowest.get("_effective_moves", {})
-        
-        total_move_inches = 0.0
-        try:
-            if isinstance(mr_move_str, str):
-                mr_move_str = float(mr_move_str)
-            total_move_inches += float(mr_move_str)
-            logger.debug(f"mr_move for '{attacher_name}': {mr_move_str}")
-        except (ValueError, TypeError) as e:
-            logger.debug(f"Error converting mr_move '{mr_move_str}' to float: {str(e)}")
-            # mr_move might be invalid, treat as 0
-
-        if isinstance(effective_moves_dict, dict):
-            for move_key, move_val_str in effective_moves_dict.items():
-                try:
-                    if isinstance(move_val_str, str):
-                        move_val_str = float(move_val_str)
-                    move_val_float = float(move_val_str)
-                    
-                    if move_val_float > 0:
-                        move_contribution = math.ceil(move_val_float / 2.0)
-                    elif move_val_float < 0:
-                        move_contribution = math.floor(move_val_float / 2.0)
-                    else:
-                        move_contribution = 0
-                        
-                    total_move_inches += move_contribution
-                    logger.debug(f"effective_move for '{attacher_name}' key '{move_key}': {move_val_float} (contribution: {move_contribution})")
-                except (ValueError, TypeError) as e:
-                    logger.debug(f"Error processing effective_move '{move_val_str}': {str(e)}")
-                    continue
-        
-        # If there's a significant total move, calculate and return proposed height
-        if abs(total_move_inches) > 0.01: # Using a small epsilon for float comparison
-            proposed_height_val = lowest_height_for_attacher + total_move_inches
-            proposed_height_formatted = format_height_feet_inches(proposed_height_val)
-            logger.debug(f"Calculated proposed height for '{attacher_name}': {proposed_height_formatted} (base: {lowest_height_for_attacher}, move: {total_move_inches})")
-            return proposed_height_formatted
-        else:
-            # No significant move, so no "proposed height" distinct from existing
-            logger.debug(f"No significant moves found for '{attacher_name}', total move: {total_move_inches}")
-            return "" 
-    else:
-        logger.debug(f"No matching wire found for attacher '{attacher_name}' in connection {connection_id}")        
+        return None
+
+    return get_span_profile(job_index, connection_id).proposed_height_inches(attacher_name)
+
+
+@timed("get_midspan_proposed_heights")
+def get_midspan_proposed_heights(job_index, connection_id, attacher_name):
+    """
+    Get the formatted proposed height for a specific attacher in the connection's span
+    (see get_midspan_proposed_height_value).
     
-    return "" # Attacher not found in any section, or error
+    Returns:
+        str: Formatted proposed height or empty string if no changes / not applicable
+    """
+    return format_height_feet_inches(get_midspan_proposed_height_value(job_index, connection_id, attacher_name))
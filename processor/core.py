@@ -2,61 +2,169 @@
 Core processing functions for Katapult JSON data.
 """
 
+import os
 import json
 import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
 from .data_extraction import (
-    extract_pole_tag, extract_scid, extract_location, extract_span_length,
+    extract_pole_tag, extract_scid, extract_location,
     extract_connection_type, extract_mr_status, extract_pole_owner,
     extract_pole_structure, extract_pla_percentage, extract_construction_grade,
     extract_proposed_riser, extract_proposed_guy, determine_attachment_action
 )
 from .node_processing import get_attachers_for_node
-from .connection_processing import get_lowest_heights_for_connection, get_midspan_proposed_heights
+from .connection_processing import get_lowest_height_values, get_midspan_proposed_heights
+from .height_utils import format_heights, get_pole_primary_neutral_values
 from .movement_processing import get_movement_summary, generate_remedy_description
 from .excel_generator import create_output_excel
+from .job_index import JobIndex, as_job_index
+from .geometry import get_span_lengths
+from .spidacalc_index import join_spidacalc, get_spidacalc_location
+from .report_tables import build_report_tables, compute_statistics
+from .incremental import IncrementalRun, IncrementalStore, job_key
+from .streaming_ingest import load_katapult_stream, REQUIRED_KEYS, NOT_KATAPULT_MESSAGE
+from . import json_backend
+from . import instrumentation
 
 
-def process_katapult_json(katapult_json_path, output_excel_path, spidacalc_json_path=None):
+def load_katapult_data(katapult_json, streaming=False):
+    """
+    Load Katapult job data from a path, a raw bytes buffer, or an already-parsed dict.
+    
+    Args:
+        katapult_json (str | bytes | dict): Path to the Katapult JSON file, its raw
+            contents, or the parsed job data
+        streaming (bool): Parse incrementally and keep only the fields the processor
+            reads (see streaming_ingest). Defaults to False.
+        
+    Returns:
+        dict: The parsed Katapult job data (the same object if a dict was passed)
+    """
+    if isinstance(katapult_json, dict):
+        return katapult_json
+    if streaming:
+        return load_katapult_stream(katapult_json)
+    if isinstance(katapult_json, (bytes, bytearray, memoryview)):
+        return json_backend.loads(katapult_json)
+    return json_backend.load(katapult_json)
+
+
+def validate_katapult_data(katapult_data):
+    """
+    Check that parsed data looks like a Katapult job export.
+    
+    Raises:
+        ValueError: If the data is missing the 'nodes' or 'connections' keys
+    """
+    if not isinstance(katapult_data, dict) or not all(key in katapult_data for key in REQUIRED_KEYS):
+        raise ValueError(NOT_KATAPULT_MESSAGE)
+
+
+def process_katapult_json(katapult_json_path, output_excel_path, spidacalc_json_path=None,
+                          progress_callback=None, streaming=False, extraction_workers=1, profile=False,
+                          incremental=False):
     """
     Main function to process Katapult JSON (and optionally SPIDAcalc JSON) 
     and generate an Excel report.
     
     Args:
-        katapult_json_path (str): Path to the Katapult JSON file
+        katapult_json_path (str | bytes | dict): Path to the Katapult JSON file. Callers that
+            already hold the file contents can pass the raw bytes or the parsed dict instead
+            so the JSON is not parsed a second time.
         output_excel_path (str): Path where the Excel report will be saved
         spidacalc_json_path (str, optional): Path to the SPIDAcalc JSON file. Defaults to None.
+        progress_callback (callable, optional): Called as progress_callback(stage, fraction)
+            when each processing stage starts, e.g. ("processing", 0.3). Defaults to None.
+        streaming (bool, optional): Load the Katapult JSON with the streaming parser, which
+            keeps only the fields the report needs. Defaults to False.
+        extraction_workers (int, optional): Worker processes used by process_data; 1 extracts
+            serially, None or 0 uses one per CPU. Defaults to 1.
+        profile (bool, optional): Time each stage (load, index, process_data, Excel, statistics)
+            and the hot extraction helpers, and return the breakdown under stats["timings"].
+            Defaults to False (no timing overhead).
+        incremental (bool, optional): Reuse the records of poles that did not change since
+            the previous run of the same job (see incremental), and store this run's records
+            for the next one. Reuse counts are returned under stats["incremental"].
+            Defaults to False.
         
     Returns:
         dict: Statistics about the processing
     """
     start_time = time.time()
     
+    def report_progress(stage, fraction):
+        if progress_callback:
+            progress_callback(stage, fraction)
+    
+    with instrumentation.collect(profile) as stage_profile:
+        stats = _run_report(katapult_json_path, output_excel_path, spidacalc_json_path,
+                            report_progress, streaming, extraction_workers, incremental)
+    
+    if stage_profile is not None:
+        stage_profile.add_time("total", time.time() - start_time)
+        stats["timings"] = stage_profile.as_dict()
+    return stats
+
+
+def _run_report(katapult_json_path, output_excel_path, spidacalc_json_path, report_progress,
+                streaming, extraction_workers, incremental):
+    """Body of process_katapult_json; each stage is timed when a profile is being collected."""
+    start_time = time.time()
+    
     try:
-        # Load the Katapult JSON file
-        print(f"Loading Katapult JSON file from {katapult_json_path}...")
-        with open(katapult_json_path, 'r', encoding='utf-8') as file:
-            katapult_data = json.load(file)
-        print(f"Katapult JSON file loaded successfully.")
-
-        spidacalc_data = None
-        if spidacalc_json_path:
-            try:
-                print(f"Loading SPIDAcalc JSON file from {spidacalc_json_path}...")
-                with open(spidacalc_json_path, 'r', encoding='utf-8') as file:
-                    spidacalc_data = json.load(file)
-                print(f"SPIDAcalc JSON file loaded successfully.")
-            except FileNotFoundError:
-                print(f"Warning: SPIDAcalc JSON file not found at {spidacalc_json_path}. Proceeding without SPIDAcalc data.")
-            except json.JSONDecodeError as e:
-                print(f"Warning: Error decoding SPIDAcalc JSON from {spidacalc_json_path}: {e}. Proceeding without SPIDAcalc data.")
-            except Exception as e:
-                print(f"Warning: An unexpected error occurred while loading SPIDAcalc JSON from {spidacalc_json_path}: {e}. Proceeding without SPIDAcalc data.")
+        report_progress("loading", 0.05)
+        with instrumentation.stage("load"):
+            # Load the Katapult JSON file (skipped if the caller already parsed it)
+            if isinstance(katapult_json_path, dict):
+                print("Using pre-parsed Katapult JSON data.")
+            else:
+                source = katapult_json_path if isinstance(katapult_json_path, str) else "in-memory buffer"
+                print(f"Loading Katapult JSON file from {source}...")
+            katapult_data = load_katapult_data(katapult_json_path, streaming=streaming)
+            print(f"Katapult JSON file loaded successfully.")
+
+            spidacalc_data = None
+            if spidacalc_json_path:
+                try:
+                    print(f"Loading SPIDAcalc JSON file from {spidacalc_json_path}...")
+                    spidacalc_data = json_backend.load(spidacalc_json_path)
+                    print(f"SPIDAcalc JSON file loaded successfully.")
+                except FileNotFoundError:
+                    print(f"Warning: SPIDAcalc JSON file not found at {spidacalc_json_path}. Proceeding without SPIDAcalc data.")
+                except json.JSONDecodeError as e:
+                    print(f"Warning: Error decoding SPIDAcalc JSON from {spidacalc_json_path}: {e}. Proceeding without SPIDAcalc data.")
+                except Exception as e:
+                    print(f"Warning: An unexpected error occurred while loading SPIDAcalc JSON from {spidacalc_json_path}: {e}. Proceeding without SPIDAcalc data.")
+
+        # Build the lookup index once; every extraction step below reuses it
+        with instrumentation.stage("build_index"):
+            job_index = JobIndex(katapult_data)
+
+        # Records of the previous run of this job, when re-processing incrementally
+        incremental_run = None
+        if incremental:
+            incremental_key = job_key(katapult_data)
+            if incremental_key:
+                incremental_store = IncrementalStore()
+                incremental_run = IncrementalRun(incremental_store.load(incremental_key))
+            else:
+                print("Job has no id or name; processing all poles.")
 
         # Process the data
+        report_progress("processing", 0.3)
         print("Processing data...")
-        df = process_data(katapult_data, spidacalc_data, None)  # No GeoJSON for now
+        with instrumentation.stage("process_data"):
+            df, tables = process_data(job_index, spidacalc_data, None, workers=extraction_workers,
+                                      return_tables=True, incremental=incremental_run)  # No GeoJSON for now
+        
+        if incremental_run is not None and incremental_run.state is not None:
+            try:
+                incremental_store.save(incremental_key, incremental_run.state)
+            except Exception as e:
+                print(f"Warning: Could not store incremental state: {e}")
         
         if df.empty:
             print("ERROR: No data could be extracted from the Katapult JSON file.")
@@ -68,44 +176,38 @@ def process_katapult_json(katapult_json_path, output_excel_path, spidacalc_json_
         print(f"Data processed successfully. Generated {len(df)} records.")
             
         # Create Excel file
+        report_progress("writing_excel", 0.7)
         print(f"Creating Excel file at {output_excel_path}...")
-        create_output_excel(output_excel_path, df, katapult_data) # Pass katapult_data for now for excel generation context
+        with instrumentation.stage("create_output_excel"):
+            create_output_excel(output_excel_path, df, job_index, tables=tables)
         print(f"Excel file created successfully at {output_excel_path}.")
         
         # Gather statistics
+        report_progress("statistics", 0.95)
         processing_time = round(time.time() - start_time, 2)
         
-        # Count unique poles, connections, and attachers
-        pole_count = 0
-        if 'node_id_1' in df.columns and not df['node_id_1'].empty:
-            pole_count = len(set(df['node_id_1'].tolist()))
-        connection_count = len(df)
+        with instrumentation.stage("statistics"):
+            # Counts and per-owner / per-attacher breakdowns from the report tables
+            # (each pole's attachers are counted once, however many spans it has)
+            statistics = compute_statistics(tables)
         
-        # Count attachers and proposed attachments
-        attacher_count = 0
-        proposed_count = 0
-        
-        # Gather all attachers for statistics
-        if 'node_id_1' in df.columns:
-            for _, record in df.iterrows():
-                node_id = record['node_id_1']
-                if node_id: # Ensure node_id is not None or empty
-                    # TODO: Update get_attachers_for_node to potentially use spidacalc_data if needed for stats
-                    attachers = get_attachers_for_node(katapult_data, node_id)
-                    main_attachers = attachers.get('main_attachers', [])
-                    
-                    attacher_count += len(main_attachers)
-                    for attacher in main_attachers:
-                        if attacher.get('is_proposed', False):
-                            proposed_count += 1
+        attacher_cache = job_index.attachers_memo.stats()
+        instrumentation.count("records", statistics["connection_count"])
+        instrumentation.count("attacher_cache_hits", attacher_cache["hits"])
+        instrumentation.count("attacher_cache_misses", attacher_cache["misses"])
+        photofirst_cache = job_index.photofirst.stats()
+        instrumentation.count("photofirst_cache_hits", photofirst_cache["hits"])
+        instrumentation.count("photofirst_cache_misses", photofirst_cache["misses"])
         
         return {
             "status": "success",
             "processing_time": processing_time,
-            "pole_count": pole_count,
-            "connection_count": connection_count,
-            "attacher_count": attacher_count,
-            "proposed_count": proposed_count
+            **statistics,
+            "attacher_cache_hits": attacher_cache["hits"],
+            "attacher_cache_misses": attacher_cache["misses"],
+            "photofirst_cache": photofirst_cache,
+            "spidacalc_matches": job_index.spidacalc.match_counts if job_index.spidacalc is not None else None,
+            "incremental": incremental_run.stats() if incremental_run is not None else None
         }
         
     except Exception as e:
@@ -115,145 +217,318 @@ def process_katapult_json(katapult_json_path, output_excel_path, spidacalc_json_
         }
 
 
-def process_data(katapult_data, spidacalc_data, geojson_path):
+# Column order of the DataFrame returned by process_data
+PROCESSED_COLUMNS = [
+    'operation_number', 'attachment_action', 'pole_owner', 'pole_number', 
+    'pole_structure', 'proposed_riser', 'proposed_guy', 'pla_percentage',
+    'construction_grade', 'node_id_1', 'node_id_2', 'connection_id', 
+    'span_length', 'pole_tag_1', 'pole_tag_2', 'latitude_1', 'longitude_1', 
+    'latitude_2', 'longitude_2', 'lowest_com_height', 'lowest_cps_height'
+]
+
+# Columns of the DataFrame holding heights, formatted as feet-inches text
+DISPLAY_HEIGHT_COLUMNS = ['lowest_com_height', 'lowest_cps_height']
+
+# Jobs with fewer connections than this are always extracted serially; below it
+# starting worker processes costs more than it saves
+PARALLEL_MIN_CONNECTIONS = 200
+
+# Number of work units per worker process in parallel mode (smooths out uneven poles)
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+
+def plan_connections(job_index):
+    """
+    List the connections process_data turns into records, in job order.
+    
+    Args:
+        job_index (JobIndex): Index over the Katapult job
+        
+    Returns:
+        list: (conn_id, first_for_pole) tuples; first_for_pole is True for the first
+            connection of each node_id_1, which carries the pole-level attributes
+    """
+    plan = []
+    seen_poles = set()
+    for conn_id, conn_data in job_index.connections.items():
+        node_id_1 = conn_data.get('node_id_1')
+        
+        # Skip invalid connections
+        if not node_id_1 or node_id_1 not in job_index.nodes:
+            continue
+        
+        plan.append((conn_id, node_id_1 not in seen_poles))
+        seen_poles.add(node_id_1)
+    return plan
+
+
+def build_connection_record(job_index, conn_id, first_for_pole):
+    """
+    Extract the report record for one connection.
+    
+    Only reads the job, so records for different poles can be built in any order
+    (or in different processes); operation numbers are assigned afterwards.
+    
+    Args:
+        job_index (JobIndex): Index over the Katapult job
+        conn_id (str): The connection to extract
+        first_for_pole (bool): Whether this is the first connection of its node_id_1
+            (only that record carries the pole-level attributes)
+        
+    Returns:
+        dict: The connection record (operation_number is left as None). Heights are
+            inches (None when not measured); they are formatted for output only.
+    """
+    nodes_data = job_index.nodes
+    conn_data = job_index.connection(conn_id)
+    node_id_1 = conn_data.get('node_id_1')
+    node_id_2 = conn_data.get('node_id_2')
+    
+    # Get detailed node information
+    node1_data = nodes_data.get(node_id_1, {})
+    node2_data = nodes_data.get(node_id_2, {}) if node_id_2 else {}
+    
+    # Extract pole tags
+    pole_tag_1 = extract_pole_tag(node1_data)
+    pole_tag_2 = extract_pole_tag(node2_data) if node_id_2 else "N/A"
+    
+    # Extract SCIDs (e.g., work order or operation IDs)
+    scid_1 = extract_scid(node1_data)
+    scid_2 = extract_scid(node2_data) if node_id_2 else "N/A"
+    
+    # Extract location data
+    lat1, lon1 = extract_location(node1_data)
+    lat2, lon2 = extract_location(node2_data) if node_id_2 else (None, None)
+    
+    # Get span length (measured from the coordinates where none is recorded)
+    span_lengths = get_span_lengths(job_index)
+    span_length, span_length_source = span_lengths.span_length(conn_id)
+    
+    # Get connection type
+    connection_type = extract_connection_type(conn_data)
+    
+    # Get MR status
+    mr_status = extract_mr_status(node1_data)
+    
+    # Get lowest heights for communications and electrical
+    # TODO: Update get_lowest_height_values to potentially use spidacalc_data
+    lowest_com, lowest_cps = get_lowest_height_values(job_index, conn_id)
+    
+    # Get pole-specific attributes for node1
+    if first_for_pole:
+        # PLA and construction grade come from the pole's SPIDAcalc location when it has one
+        spidacalc_location = get_spidacalc_location(job_index, node_id_1)
+        pole_owner = extract_pole_owner(node1_data)
+        pole_structure = extract_pole_structure(node1_data)
+        pla_percentage = extract_pla_percentage(node1_data, spidacalc_location)
+        construction_grade = extract_construction_grade(node1_data, spidacalc_location)
+        proposed_riser = extract_proposed_riser(node1_data)
+        proposed_guy = extract_proposed_guy(node_id_1, job_index)
+        attachment_action = determine_attachment_action(node1_data, job_index)
+        pole_heights = get_pole_primary_neutral_values(node_id_1, job_index)
+    else:
+        # For already processed poles, use placeholder values
+        pole_owner = ""
+        pole_structure = ""
+        pla_percentage = ""
+        construction_grade = ""
+        proposed_riser = ""
+        proposed_guy = ""
+        attachment_action = ""
+        pole_heights = {'primary_height': None, 'neutral_height': None}
+    
+    # Get attacher data for node1
+    # TODO: Update get_attachers_for_node to potentially use spidacalc_data
+    attachers_data = get_attachers_for_node(job_index, node_id_1)
+    main_attachers = attachers_data.get('main_attachers', [])
+    
+    # Determine if this is an underground connection
+    is_underground = connection_type.lower() == "underground cable"
+    
+    # Generate movement summary and remedy description
+    # TODO: Update movement/remedy functions if they need spidacalc_data
+    movement_summary = get_movement_summary(main_attachers)
+    remedy_description = generate_remedy_description(main_attachers, is_underground)
+    
+    # Create the record
+    return {
+        'operation_number': None,  # Assigned in job order by process_data
+        'attachment_action': attachment_action,
+        'pole_owner': pole_owner,
+        'pole_number': pole_tag_1,
+        'pole_structure': pole_structure,
+        'proposed_riser': proposed_riser,
+        'proposed_guy': proposed_guy, 
+        'pla_percentage': pla_percentage,
+        'construction_grade': construction_grade,
+        'node_id_1': node_id_1,
+        'node_id_2': node_id_2,
+        'connection_id': conn_id,
+        'span_length': span_length,
+        'span_length_source': span_length_source,
+        'measured_span_length': span_lengths.measured_length(conn_id),
+        'span_length_flagged': span_lengths.is_flagged(conn_id),
+        'pole_tag_1': pole_tag_1,
+        'pole_tag_2': pole_tag_2,
+        'latitude_1': lat1,
+        'longitude_1': lon1,
+        'latitude_2': lat2,
+        'longitude_2': lon2,
+        'lowest_com_height': lowest_com,
+        'lowest_cps_height': lowest_cps,
+        'primary_height': pole_heights['primary_height'],
+        'neutral_height': pole_heights['neutral_height'],
+        'scid_1': scid_1,
+        'scid_2': scid_2,
+        'connection_type': connection_type,
+        'mr_status': mr_status,
+        'movement_summary': movement_summary,
+        'remedy_description': remedy_description,
+        'attachers_data': attachers_data  # Store for later use in Excel generation
+    }
+
+
+# Job index shared with extraction worker processes (set by _init_extraction_worker)
+_worker_job_index = None
+
+
+def _init_extraction_worker(job_index):
+    global _worker_job_index
+    _worker_job_index = job_index
+
+
+def _extract_chunk(tasks):
+    """Worker entry point: build the records for a list of (position, conn_id, first_for_pole)."""
+    return [(position, build_connection_record(_worker_job_index, conn_id, first_for_pole))
+            for position, conn_id, first_for_pole in tasks]
+
+
+def _resolve_worker_count(workers):
+    """Normalize a workers setting: None or 0 means one per CPU."""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def _build_records_parallel(job_index, plan, workers):
+    """
+    Build the records for plan across a process pool.
+    
+    Poles are split into contiguous groups so every connection of a pole is handled
+    by the same worker (its attacher lookups stay memoized there). The job index is
+    handed to the workers once: inherited copy-on-write where fork is available,
+    pickled once per worker otherwise. Records come back tagged with their position
+    in plan, so the merged order is exactly the serial order.
+    """
+    poles = list(dict.fromkeys(job_index.connection(conn_id).get('node_id_1') for conn_id, _ in plan))
+    chunk_count = min(len(poles), workers * PARALLEL_CHUNKS_PER_WORKER)
+    pole_chunk = {node_id: i * chunk_count // len(poles) for i, node_id in enumerate(poles)}
+    
+    chunks = [[] for _ in range(chunk_count)]
+    for position, (conn_id, first_for_pole) in enumerate(plan):
+        node_id_1 = job_index.connection(conn_id).get('node_id_1')
+        chunks[pole_chunk[node_id_1]].append((position, conn_id, first_for_pole))
+    
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    
+    records = [None] * len(plan)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_extraction_worker, initargs=(job_index,)) as executor:
+        for chunk_records in executor.map(_extract_chunk, chunks):
+            for position, record in chunk_records:
+                records[position] = record
+    
+    # Seed the parent's memo so later steps (Excel, statistics) don't recompute attachers
+    for record in records:
+        job_index.attachers_memo.get_or_compute(record['node_id_1'], lambda: record['attachers_data'])
+    return records
+
+
+def process_data(katapult_data, spidacalc_data, geojson_path, workers=1, return_tables=False,
+                 incremental=None):
     """
     Process Katapult job data (and optionally SPIDAcalc data and geojson) 
     into a DataFrame with comprehensive pole and connection information.
     Structures data to match the required Excel output format.
     
     Args:
-        katapult_data (dict): The loaded Katapult JSON data
+        katapult_data (JobIndex | dict): Index over the loaded Katapult JSON data, or the raw data
         spidacalc_data (dict, optional): The loaded SPIDAcalc JSON data
         geojson_path (str, optional): Path to a GeoJSON file with additional data
+        workers (int, optional): Worker processes for extraction. 1 (default) extracts
+            serially; None or 0 uses one per CPU. Small jobs, and processes that may not
+            start children (daemonic processes), always extract serially.
+        return_tables (bool, optional): Also return the pole, connection and attacher
+            tables (see report_tables.build_report_tables). Defaults to False.
+        incremental (IncrementalRun, optional): Reuse the records of unchanged poles from
+            the previous run and extract only the rest; the records of this run are then
+            remembered in it. Defaults to None (extract every connection).
         
     Returns:
-        pd.DataFrame: Processed data with all relevant connection and pole information
+        pd.DataFrame: Processed data with all relevant connection and pole information,
+            or (DataFrame, ReportTables) if return_tables is True
     """
-    columns = [
-        'operation_number', 'attachment_action', 'pole_owner', 'pole_number', 
-        'pole_structure', 'proposed_riser', 'proposed_guy', 'pla_percentage',
-        'construction_grade', 'node_id_1', 'node_id_2', 'connection_id', 
-        'span_length', 'pole_tag_1', 'pole_tag_2', 'latitude_1', 'longitude_1', 
-        'latitude_2', 'longitude_2', 'lowest_com_height', 'lowest_cps_height'
-    ]
+    columns = PROCESSED_COLUMNS
     
-    processed_records = []
-    operation_counter = 1
+    job_index = as_job_index(katapult_data)
     
-    # Track processed poles to avoid duplicates in operation numbering
-    processed_poles = set()
+    # Join the poles to their SPIDAcalc locations once, before any worker processes are started
+    if spidacalc_data:
+        spidacalc_matches = join_spidacalc(job_index, spidacalc_data)
+        print(f"Matched {len(job_index.spidacalc_locations)} of {len(job_index.nodes)} poles to "
+              f"{spidacalc_matches['locations']} SPIDAcalc locations "
+              f"({spidacalc_matches['by_label']} by label, {spidacalc_matches['by_coordinates']} by coordinates).")
     
-    if katapult_data and "connections" in katapult_data:
-        nodes_data = katapult_data.get("nodes", {})
+    processed_records = []
+    if "connections" in job_index.job_data:
+        plan = plan_connections(job_index)
         
-        for conn_id, conn_data in katapult_data.get("connections", {}).items():
-            node_id_1 = conn_data.get('node_id_1')
-            node_id_2 = conn_data.get('node_id_2')
-            
-            # Skip invalid connections
-            if not node_id_1 or node_id_1 not in nodes_data:
-                continue
-                
-            # Get detailed node information
-            node1_data = nodes_data.get(node_id_1, {})
-            node2_data = nodes_data.get(node_id_2, {}) if node_id_2 else {}
-            
-            # Extract pole tags
-            pole_tag_1 = extract_pole_tag(node1_data)
-            pole_tag_2 = extract_pole_tag(node2_data) if node_id_2 else "N/A"
-            
-            # Extract SCIDs (e.g., work order or operation IDs)
-            scid_1 = extract_scid(node1_data)
-            scid_2 = extract_scid(node2_data) if node_id_2 else "N/A"
-            
-            # Extract location data
-            lat1, lon1 = extract_location(node1_data)
-            lat2, lon2 = extract_location(node2_data) if node_id_2 else (None, None)
-            
-            # Get span length
-            span_length = extract_span_length(conn_data)
-            
-            # Get connection type
-            connection_type = extract_connection_type(conn_data)
-            
-            # Get MR status
-            mr_status = extract_mr_status(node1_data)
-            
-            # Get lowest heights for communications and electrical
-            # TODO: Update get_lowest_heights_for_connection to potentially use spidacalc_data
-            lowest_com, lowest_cps = get_lowest_heights_for_connection(katapult_data, conn_id)
-            
-            # Get pole-specific attributes for node1
-            if node_id_1 not in processed_poles:
-                # TODO: These extraction functions might need to consider spidacalc_data
-                pole_owner = extract_pole_owner(node1_data)
-                pole_structure = extract_pole_structure(node1_data)
-                pla_percentage = extract_pla_percentage(node1_data)
-                construction_grade = extract_construction_grade(node1_data)
-                proposed_riser = extract_proposed_riser(node1_data)
-                proposed_guy = extract_proposed_guy(node_id_1, katapult_data)
-                attachment_action = determine_attachment_action(node1_data, katapult_data)
-                
+        # Measure every span once, before any worker processes are started
+        span_lengths = get_span_lengths(job_index)
+        flagged_spans = int(span_lengths.flagged.sum())
+        if flagged_spans:
+            print(f"{flagged_spans} recorded span length(s) differ from the pole coordinates.")
+        workers = _resolve_worker_count(workers)
+        
+        if workers > 1 and multiprocessing.current_process().daemon:
+            print("Parallel extraction is not available in a daemonic process; extracting serially.")
+            workers = 1
+        
+        # Only the connections of changed poles are extracted when re-processing incrementally
+        if incremental is not None:
+            processed_records, pending = incremental.reuse(job_index, plan)
+            print(f"Reusing {incremental.reused} of {len(plan)} records from the previous run.")
+        else:
+            processed_records, pending = [None] * len(plan), range(len(plan))
+        pending_plan = [plan[position] for position in pending]
+        
+        if workers > 1 and len(pending_plan) >= PARALLEL_MIN_CONNECTIONS:
+            print(f"Extracting {len(pending_plan)} connections with {workers} worker processes...")
+            built_records = _build_records_parallel(job_index, pending_plan, workers)
+        else:
+            built_records = [build_connection_record(job_index, conn_id, first_for_pole)
+                             for conn_id, first_for_pole in pending_plan]
+        for position, record in zip(pending, built_records):
+            processed_records[position] = record
+        
+        # Assign operation numbers in job order, so they are the same however the
+        # records were built. Track processed poles to avoid duplicates in numbering.
+        operation_counter = 1
+        processed_poles = set()
+        for record, (_, first_for_pole) in zip(processed_records, plan):
+            node_id_1 = record['node_id_1']
+            if first_for_pole:
                 processed_poles.add(node_id_1)
-            else:
-                # For already processed poles, use placeholder values
-                pole_owner = ""
-                pole_structure = ""
-                pla_percentage = ""
-                construction_grade = ""
-                proposed_riser = ""
-                proposed_guy = ""
-                attachment_action = ""
-            
-            # Get attacher data for node1
-            # TODO: Update get_attachers_for_node to potentially use spidacalc_data
-            attachers_data = get_attachers_for_node(katapult_data, node_id_1)
-            main_attachers = attachers_data.get('main_attachers', [])
-            
-            # Determine if this is an underground connection
-            is_underground = connection_type.lower() == "underground cable"
-            
-            # Generate movement summary and remedy description
-            # TODO: Update movement/remedy functions if they need spidacalc_data
-            movement_summary = get_movement_summary(main_attachers)
-            remedy_description = generate_remedy_description(main_attachers, is_underground)
-            
-            # Create the record
-            record = {
-                'operation_number': operation_counter if node_id_1 not in processed_poles else None,
-                'attachment_action': attachment_action,
-                'pole_owner': pole_owner,
-                'pole_number': pole_tag_1,
-                'pole_structure': pole_structure,
-                'proposed_riser': proposed_riser,
-                'proposed_guy': proposed_guy, 
-                'pla_percentage': pla_percentage,
-                'construction_grade': construction_grade,
-                'node_id_1': node_id_1,
-                'node_id_2': node_id_2,
-                'connection_id': conn_id,
-                'span_length': span_length,
-                'pole_tag_1': pole_tag_1,
-                'pole_tag_2': pole_tag_2,
-                'latitude_1': lat1,
-                'longitude_1': lon1,
-                'latitude_2': lat2,
-                'longitude_2': lon2,
-                'lowest_com_height': lowest_com,
-                'lowest_cps_height': lowest_cps,
-                'scid_1': scid_1,
-                'scid_2': scid_2,
-                'connection_type': connection_type,
-                'mr_status': mr_status,
-                'movement_summary': movement_summary,
-                'remedy_description': remedy_description,
-                'attachers_data': attachers_data  # Store for later use in Excel generation
-            }
-            
-            processed_records.append(record)
+            record['operation_number'] = operation_counter if node_id_1 not in processed_poles else None
             if node_id_1 not in processed_poles: # Check against processed_poles before incrementing
                 operation_counter += 1
-
+        
+        if incremental is not None:
+            incremental.remember(job_index, plan, processed_records)
+    
     # Create DataFrame and ensure all columns exist
     if processed_records:
         df = pd.DataFrame(processed_records)
@@ -261,10 +536,18 @@ def process_data(katapult_data, spidacalc_data, geojson_path):
         for col in columns: # Use the predefined columns list
             if col not in df.columns:
                 df[col] = None # Or pd.NA or suitable default
-        # Order columns as defined and fill NaN with empty string for Excel output
-        return df[columns].fillna("")
+        # Order columns as defined, format the heights (kept numeric in the records)
+        # and fill NaN with empty string for Excel output
+        df = df[columns]
+        for col in DISPLAY_HEIGHT_COLUMNS:
+            df[col] = format_heights(df[col].to_numpy(dtype=float, na_value=float('nan')))
+        df = df.fillna("")
     else:
-        return pd.DataFrame(columns=columns)
+        df = pd.DataFrame(columns=columns)
+    
+    if return_tables:
+        return df, build_report_tables(processed_records)
+    return df
 
 
 # Example usage (optional, for testing)
@@ -353,9 +636,14 @@ if __name__ == '__main__':
             "label": "Lead 1",
             "locations": [{
                 "label": "Pole A", # Matches pole_tag from Katapult for potential matching
+                "latitude": 34.05221, "longitude": -118.24371, # Within a few feet of nodeA
                 "designs": [{
                     "label": "Measured Design",
                     "structure": {"pole": {"clientItem": {"height": {"unit": "METRE", "value": 12.192}}}}
+                }],
+                "poleResults": [{
+                    "component": "Pole", "analysisType": "STRESS", "actual": 42.55, "allowable": 100.0,
+                    "unit": "PERCENT", "loadInfo": "Light - Grade C", "designLabel": "Measured Design"
                 }]
             }]
         }]
@@ -4,6 +4,7 @@ Functions for extracting data from Katapult JSON structures.
 
 from .utils import get_nested_value
 from .height_utils import format_height_feet_inches
+from .job_index import as_job_index, find_main_photo_id
 
 def extract_pole_tag(node_data):
     """Extract pole tag from node data, prioritizing documented fields."""
@@ -282,8 +283,22 @@ def extract_pole_structure(node_data):
     return structure_str if structure_str else ""
 
 
-def extract_pla_percentage(node_data):
-    """Extract PLA (Percent Loading Allowance) percentage from node data."""
+def extract_pla_percentage(node_data, spidacalc_location=None):
+    """
+    Extract PLA (Percent Loading Allowance) percentage.
+    
+    The governing pole stress of the node's SPIDAcalc location is used when there
+    is one (see spidacalc_index); otherwise the Katapult capacity attributes.
+    
+    Args:
+        node_data (dict): The Katapult node
+        spidacalc_location (SpidacalcLocation, optional): The node's SPIDAcalc location
+        
+    Returns:
+        str: The percentage, e.g. "42.55%" ("" if unknown)
+    """
+    if spidacalc_location is not None and spidacalc_location.pla_percentage is not None:
+        return f"{spidacalc_location.pla_percentage:.2f}%"
     if not node_data:
         return ""
     attrs = node_data.get('attributes', {})
@@ -336,8 +351,22 @@ def extract_pla_percentage(node_data):
     return ""
 
 
-def extract_construction_grade(node_data):
-    """Extract construction grade from node data."""
+def extract_construction_grade(node_data, spidacalc_location=None):
+    """
+    Extract construction grade.
+    
+    The grade of the SPIDAcalc load case that governs the node's PLA is used when
+    there is one; otherwise the Katapult analysis attribute or the pole class.
+    
+    Args:
+        node_data (dict): The Katapult node
+        spidacalc_location (SpidacalcLocation, optional): The node's SPIDAcalc location
+        
+    Returns:
+        str: The construction grade, e.g. "C" ("" if unknown)
+    """
+    if spidacalc_location is not None and spidacalc_location.construction_grade:
+        return spidacalc_location.construction_grade
     if not node_data:
         return ""
     attrs = node_data.get('attributes', {})
@@ -403,32 +432,29 @@ def extract_proposed_riser(node_data):
     return "NO"
 
 
-def extract_proposed_guy(node_id, job_data):
+def extract_proposed_guy(node_id, job_index):
     """Extract proposed guy information for a node"""
-    if not node_id or not job_data:
+    if not node_id or not job_index:
         return "NO"
     
     count = 0
-    connections = job_data.get('connections', {})
-    nodes = job_data.get('nodes', {})
-    
-    # Check connections for anchor/guy connections
-    for conn_data in connections.values():
-        if conn_data.get('button') == 'anchor':
-            # Check if this connection is connected to our node
-            if conn_data.get('node_id_1') == node_id or conn_data.get('node_id_2') == node_id:
-                # Identify the anchor node
-                anchor_node_id = conn_data.get('node_id_1') if conn_data.get('node_id_1') != node_id else conn_data.get('node_id_2')
-                
-                if not anchor_node_id or anchor_node_id not in nodes:
-                    continue
-                
-                # Check if anchor is new/proposed
-                anchor_node_data = nodes[anchor_node_id]
-                anchor_type = get_nested_value(anchor_node_data, ['attributes', 'node_type', 'button_added'])
-                
-                if anchor_type and 'new' in str(anchor_type).lower():
-                    count += 1
+    job_index = as_job_index(job_index)
+    nodes = job_index.nodes
+    
+    # Check the node's anchor/guy connections
+    for _, conn_data in job_index.anchor_connections_for_node(node_id):
+        # Identify the anchor node
+        anchor_node_id = conn_data.get('node_id_1') if conn_data.get('node_id_1') != node_id else conn_data.get('node_id_2')
+        
+        if not anchor_node_id or anchor_node_id not in nodes:
+            continue
+        
+        # Check if anchor is new/proposed
+        anchor_node_data = nodes[anchor_node_id]
+        anchor_type = get_nested_value(anchor_node_data, ['attributes', 'node_type', 'button_added'])
+        
+        if anchor_type and 'new' in str(anchor_type).lower():
+            count += 1
     
     # Check MR notes for guy mentions
     node_data = nodes.get(node_id, {})
@@ -442,7 +468,7 @@ def extract_proposed_guy(node_id, job_data):
     return f"YES ({count})" if count > 0 else "NO"
 
 
-def determine_attachment_action(node_data, job_data):
+def determine_attachment_action(node_data, job_index):
     """Determine the attachment action (Installing/Removing/Existing)"""
     if not node_data:
         return "(E)xisting"
@@ -474,20 +500,19 @@ def determine_attachment_action(node_data, job_data):
     # Check if the node has any proposed attachments in photofirst data
     node_id = node_data.get('id')
     if node_id:
-        node_photos = node_data.get('photos', {})
-        main_photo_id = next((pid for pid, pdata in node_photos.items() 
-                             if pdata.get('association') == 'main'), None)
+        job_index = as_job_index(job_index)
+        main_photo_id = find_main_photo_id(node_data.get('photos', {}))
         
         if main_photo_id:
-            photo_data = get_nested_value(job_data, ['photos', main_photo_id], {})
+            photo_data = job_index.photos.get(main_photo_id, {})
             photofirst_data = photo_data.get('photofirst_data', {})
             
             # Check wire data for proposed flags
             for wire in photofirst_data.get('wire', {}).values():
                 trace_id = wire.get('_trace')
                 if trace_id:
-                    trace_data = get_nested_value(job_data, ['traces', 'trace_data', trace_id], {})
-                    if trace_data.get('proposed', False):
+                    trace = job_index.trace_class(trace_id)
+                    if trace is not None and trace.is_proposed:
                         action = "(I)nstalling"
                         break
     
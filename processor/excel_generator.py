@@ -3,14 +3,69 @@ Functions for generating Excel report output.
 """
 
 import pandas as pd
+import numpy as np
 import math
+from collections import namedtuple
+from copy import copy
 from datetime import datetime
-from .connection_processing import get_midspan_proposed_heights
+from .connection_processing import get_midspan_proposed_height_value
 from .utils import calculate_bearing
-from .height_utils import get_pole_primary_neutral_heights, get_attacher_ground_clearance # Added
-# format_height_feet_inches is also in height_utils but not directly used here, it's used by the other two.
+from .height_utils import format_heights, get_attacher_ground_clearance_value
+from .job_index import as_job_index
+from .report_tables import build_report_tables
 
-def create_output_excel(output_excel_path, df, job_data):
+# Number of columns (A-X) in the Make Ready Report sheet
+MAIN_SHEET_COLUMNS = 24
+
+# Make Ready Report header: row 1 (categories), row 2 (sub-headers) and merged ranges
+MAIN_HEADER_ROW_1 = {
+    1: "Connection ID", 2: "Operation Number", 3: "Attachment Action:", 4: "Pole Owner",
+    5: "Pole #", 6: "SCID", 7: "Pole Structure", 8: "Proposed Riser (Yes/No)",
+    9: "Proposed Guy (Yes/No)", 10: "PLA (%) with proposed attachment",
+    11: "Construction Grade of Analysis", 12: "Existing Mid-Span Data",
+    14: "Make Ready Data", 21: "Movement Information",
+}
+MAIN_HEADER_ROW_2 = {
+    3: "(I)nstalling\n(R)emoving\n(E)xisting", 12: "Height Lowest Com", 13: "Height Lowest CPS Electrical",
+    14: "Attacher Name", 15: "Existing Height", 16: "Proposed Height", 17: "Mid-Span Proposed",
+    18: "Ground Clearance", 19: "Neutral Height", 20: "Primary Height",
+    21: "Move Distance", 22: "Direction", 23: "Span Sag", 24: "Notes",
+}
+MAIN_HEADER_MERGES = [
+    'A1:A2', 'B1:B2', 'D1:D2', 'E1:E2', 'F1:F2', 'G1:G2', 'H1:H2', 'I1:I2', 'J1:J2', 'K1:K2',
+    'L1:M1', 'N1:T1', 'U1:X1',
+]
+
+# Column widths for all 24 columns
+MAIN_SHEET_COLUMN_WIDTHS = {
+    'A': 15,  # Connection ID
+    'B': 15,  # Operation Number
+    'C': 15,  # Attachment Action
+    'D': 12,  # Pole Owner
+    'E': 12,  # Pole #
+    'F': 12,  # SCID
+    'G': 15,  # Pole Structure
+    'H': 18,  # Proposed Riser
+    'I': 18,  # Proposed Guy
+    'J': 22,  # PLA Percentage
+    'K': 22,  # Construction Grade
+    'L': 18,  # Height Lowest Com
+    'M': 22,  # Height Lowest CPS Electrical
+    'N': 25,  # Attacher Description
+    'O': 15,  # Existing Height
+    'P': 15,  # Proposed Height
+    'Q': 15,  # Mid-Span Proposed
+    'R': 15,  # Ground Clearance
+    'S': 15,  # Neutral Height
+    'T': 15,  # Primary Height
+    'U': 12,  # Move Distance
+    'V': 10,  # Direction
+    'W': 12,  # Span Sag
+    'X': 20,  # Notes
+}
+
+
+def create_output_excel(output_excel_path, df, job_index, streaming=True, tables=None):
     """
     Create a well-formatted Excel report from the processed data with enhanced formatting.
     Follows the format with multiple rows per pole (one for each attacher) and organized by pole pairs.
@@ -18,7 +73,12 @@ def create_output_excel(output_excel_path, df, job_data):
     Args:
         output_excel_path (str): Path where the Excel file will be saved
         df (pd.DataFrame): The processed data to include in the report
-        job_data (dict): The original Katapult JSON data
+        job_index (JobIndex): Index over the original Katapult JSON data (a raw job dict is also accepted)
+        streaming (bool, optional): Write rows in a single pass through openpyxl write-only
+            worksheets (constant memory). Set to False to build the workbook in memory.
+            Both produce the same report. Defaults to True.
+        tables (ReportTables, optional): The pole, connection and attacher tables from
+            process_data(..., return_tables=True). Built from df and job_index if omitted.
         
     Returns:
         None
@@ -27,10 +87,20 @@ def create_output_excel(output_excel_path, df, job_data):
         print("No data available to create Excel report")
         return
     
+    job_index = as_job_index(job_index)
+    if tables is None:
+        tables = build_report_tables(df.to_dict('records'), job_index)
+    
+    if streaming:
+        try:
+            _write_report_streaming(output_excel_path, tables, job_index)
+            print(f"Excel report successfully created: {output_excel_path}")
+            return
+        except Exception as e:
+            print(f"Error in streaming Excel writer: {str(e)}. Falling back to the in-memory writer.")
+    
     try:
         import openpyxl
-        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, Protection
-        from openpyxl.utils import get_column_letter
         
         # Create Excel writer with openpyxl engine
         with pd.ExcelWriter(output_excel_path, engine='openpyxl') as writer:
@@ -41,23 +111,8 @@ def create_output_excel(output_excel_path, df, job_data):
             workbook.create_sheet("Make Ready Report")
             main_sheet = workbook["Make Ready Report"]
             
-            # ----- Define Excel Styles -----
-            header_font = Font(name='Arial', size=11, bold=True, color='000000')
-            header_font_white = Font(name='Arial', size=11, bold=True, color='FFFFFF')
-            
-            # Custom color fills as per requirements
-            section_header_fill = PatternFill(start_color='B7DEE8', end_color='B7DEE8', fill_type='solid')  # Light blue
-            subheader_fill = PatternFill(start_color='DAEEF3', end_color='DAEEF3', fill_type='solid')  # Lighter blue
-            underground_fill = PatternFill(start_color='F2DCDB', end_color='F2DCDB', fill_type='solid')  # Light red
-            backspan_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')  # Blue-gray
-            reference_fill = PatternFill(start_color='E2EFD9', end_color='E2EFD9', fill_type='solid')  # Light green
-            thin_border = Border(
-                left=Side(style='thin'),
-                right=Side(style='thin'),
-                top=Side(style='thin'),
-                bottom=Side(style='thin')
-            )
-            centered_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+            # ----- Register Excel Styles (once per workbook) -----
+            styles = ReportStyleRegistry(workbook)
             
             # ----- Create Multi-Level Header -----
             # Create the top-level header row (merged cells for categories)
@@ -132,71 +187,26 @@ def create_output_excel(output_excel_path, df, job_data):
             main_sheet.cell(row=2, column=24).value = "Notes"
             
             # Apply header styles - section headers (Row 1)
-            for row in [1]:
-                for col in range(1, 25):  # Apply to all 24 columns
-                    cell = main_sheet.cell(row=row, column=col)
-                    cell.font = header_font
-                    cell.fill = section_header_fill
-                    cell.border = thin_border
-                    cell.alignment = centered_alignment
+            for col in range(1, 25):  # Apply to all 24 columns
+                styles.apply(main_sheet.cell(row=1, column=col), 'header')
             
             # Apply subheader styles (Row 2)
-            for row in [2]:
-                for col in range(1, 25):  # Apply to all 24 columns
-                    cell = main_sheet.cell(row=row, column=col)
-                    cell.font = header_font
-                    cell.fill = subheader_fill
-                    cell.border = thin_border
-                    cell.alignment = centered_alignment
-            
-            # Process data by node/connection pairs
-            current_row = 3  # Start after the header rows
+            for col in range(1, 25):  # Apply to all 24 columns
+                styles.apply(main_sheet.cell(row=2, column=col), 'subheader')
             
-            # Group by node_id_1 to handle each pole separately
-            grouped_by_node = df.groupby('node_id_1')
+            # Process data pole by pole
+            current_row = 3  # Start after the header rows
             
-            for node_id, node_group in grouped_by_node:
-                # For each pole, process its first connection only (if we've already processed this pole, skip it)
-                if node_group.empty:
-                    continue
-                
-                # Get the first record for this node
-                first_record = node_group.iloc[0]
-                current_node_id = first_record.get('node_id_1') # Get current node_id for height lookups
-
-                # Get pole-specific primary and neutral heights once per pole
-                pole_specific_heights = {}
-                if current_node_id and job_data:
-                    pole_specific_heights = get_pole_primary_neutral_heights(current_node_id, job_data)
-                
-                pole_primary_h_str = pole_specific_heights.get('primary_height', '')
-                pole_neutral_h_str = pole_specific_heights.get('neutral_height', '')
-                
-                # Write basic pole information
-                operation_number = first_record.get('operation_number')
-                attachment_action = first_record.get('attachment_action', '(E)xisting')
-                pole_owner = first_record.get('pole_owner', '')
-                pole_number = first_record.get('pole_tag_1', '')
-                pole_structure = first_record.get('pole_structure', '')
-                proposed_riser = first_record.get('proposed_riser', 'NO')
-                proposed_guy = first_record.get('proposed_guy', 'NO')
-                pla_percentage = first_record.get('pla_percentage', '')
-                construction_grade = first_record.get('construction_grade', '')
-                lowest_com = first_record.get('lowest_com_height', '')
-                lowest_cps = first_record.get('lowest_cps_height', '')
-                pole_tag_1 = first_record.get('pole_tag_1', '')
-                pole_tag_2 = first_record.get('pole_tag_2', '')
+            for block in _pole_blocks(tables, job_index):
+                pole_tag_1 = block.pole_tag_1
+                pole_tag_2 = block.pole_tag_2
                 
                 # Insert "From Pole" header row
                 from_pole_row = current_row
                 main_sheet.cell(row=from_pole_row, column=10).value = "From Pole"
                 main_sheet.merge_cells(f'J{from_pole_row}:K{from_pole_row}')
-                main_sheet.cell(row=from_pole_row, column=10).font = header_font
-                main_sheet.cell(row=from_pole_row, column=10).fill = section_header_fill
-                main_sheet.cell(row=from_pole_row, column=10).alignment = centered_alignment
-                main_sheet.cell(row=from_pole_row, column=10).border = thin_border
-                main_sheet.cell(row=from_pole_row, column=11).fill = section_header_fill
-                main_sheet.cell(row=from_pole_row, column=11).border = thin_border
+                styles.apply(main_sheet.cell(row=from_pole_row, column=10), 'header')
+                styles.apply(main_sheet.cell(row=from_pole_row, column=11), 'section_fill')
                 
                 # Add pole tag info in the next row
                 tag_row = from_pole_row + 1
@@ -205,24 +215,17 @@ def create_output_excel(output_excel_path, df, job_data):
                 
                 # If we have a valid connection, insert the reference direction
                 if pole_tag_2:
-                    # Get the connection data
-                    connection_id = first_record.get('connection_id')
                     reference_row = from_pole_row + 2
                     
                     # Insert the reference direction row with proper reference formatting (light green)
                     main_sheet.cell(row=reference_row, column=12).value = f"Reference or Other_pole [cardinal direction] to {pole_tag_2}"
                     main_sheet.merge_cells(f'L{reference_row}:O{reference_row}')
-                    main_sheet.cell(row=reference_row, column=12).font = header_font
-                    main_sheet.cell(row=reference_row, column=12).fill = reference_fill
-                    main_sheet.cell(row=reference_row, column=12).alignment = centered_alignment
-                    main_sheet.cell(row=reference_row, column=12).border = thin_border
+                    styles.apply(main_sheet.cell(row=reference_row, column=12), 'reference_title')
 
                     # Apply reference formatting to the whole row
                     for col in range(1, 16):
                         if col not in range(12, 16):  # Skip the already merged cells
-                            cell = main_sheet.cell(row=reference_row, column=col)
-                            cell.fill = reference_fill
-                            cell.border = thin_border
+                            styles.apply(main_sheet.cell(row=reference_row, column=col), 'reference_fill')
                     
                     # Start processing attachers after the reference row
                     attacher_start_row = reference_row + 1
@@ -230,146 +233,46 @@ def create_output_excel(output_excel_path, df, job_data):
                     # If no connection, start processing attachers right after the tag row
                     attacher_start_row = tag_row + 1
                 
-                # Get the attacher data for this pole
-                attachers_data = first_record.get('attachers_data', {})
-                main_attachers = attachers_data.get('main_attachers', [])
-                
                 # If there are no attachers, add at least one row with the basic pole data
-                if not main_attachers:
-                    # Write basic pole data to all 24 columns
+                if not block.attacher_rows:
                     row = attacher_start_row
-                    connection_id = first_record.get('connection_id', '')
-                    scid = first_record.get('scid_1', '')
-
-                    # First section - identification columns
-                    main_sheet.cell(row=row, column=1).value = connection_id
-                    main_sheet.cell(row=row, column=2).value = operation_number
-                    main_sheet.cell(row=row, column=3).value = attachment_action
-                    main_sheet.cell(row=row, column=4).value = pole_owner
-                    main_sheet.cell(row=row, column=5).value = pole_number
-                    main_sheet.cell(row=row, column=6).value = scid
-                    main_sheet.cell(row=row, column=7).value = pole_structure
-                    main_sheet.cell(row=row, column=8).value = proposed_riser
-                    main_sheet.cell(row=row, column=9).value = proposed_guy
-                    main_sheet.cell(row=row, column=10).value = pla_percentage
-                    main_sheet.cell(row=row, column=11).value = construction_grade
-                    main_sheet.cell(row=row, column=12).value = lowest_com
-                    main_sheet.cell(row=row, column=13).value = lowest_cps
+                    for column, value in block.pole_values.items():
+                        main_sheet.cell(row=row, column=column).value = value
                     
                     # Apply borders and styling to all cells in the row
                     for col in range(1, 25):
-                        cell = main_sheet.cell(row=row, column=col)
-                        cell.border = thin_border
-                        cell.alignment = centered_alignment  # Center all cells
+                        styles.apply(main_sheet.cell(row=row, column=col), 'body')  # Bordered, centered
                     
                     # Move to next row
                     current_row = row + 1
                 else:
                     # Add multiple rows - one for each attacher
-                    for idx, attacher in enumerate(main_attachers):
+                    for idx, (row_style, attacher_values) in enumerate(block.attacher_rows):
                         row = attacher_start_row + idx
-                        attacher_name = attacher.get('name', '')
-                        existing_height = attacher.get('existing_height', '')
-                        proposed_height = attacher.get('proposed_height', '')
-                        
-                        # Get midspan height for this attacher
-                        midspan_height = ""
-                        if first_record.get('connection_id') and job_data: # ensure job_data is available
-                            midspan_height = get_midspan_proposed_heights(job_data, first_record['connection_id'], attacher_name)
-                        
-                        # Get attacher specific ground clearance
-                        attacher_gc_str = ""
-                        if current_node_id and attacher_name and job_data:
-                             attacher_gc_str = get_attacher_ground_clearance(current_node_id, attacher_name, job_data)
-
-                        # Check for special row types - underground, backspan, or reference
-                        connection_type = first_record.get('connection_type', '').lower()
-                        is_underground = 'underground' in connection_type
-                        is_backspan = attacher.get('is_backspan', False)
-                        is_reference = attacher.get('is_reference', False)
-                        
-                        # Apply special formatting based on row type
-                        row_fill = None
-                        if is_underground:
-                            row_fill = underground_fill  # Light red
-                        elif is_backspan:
-                            row_fill = backspan_fill     # Blue-gray
-                        elif is_reference:
-                            row_fill = reference_fill    # Light green
-                        
-                        # Prepare data for movement columns
-                        move_distance = ""
-                        move_direction = ""
-                        if existing_height and proposed_height and existing_height != proposed_height:
-                            try:
-                                # Parse heights from feet-inches format (e.g., "45'-6"")
-                                existing_parts = existing_height.replace('"', '').split("'")
-                                proposed_parts = proposed_height.replace('"', '').split("'")
-                                existing_inches = (int(existing_parts[0]) * 12) + (int(existing_parts[1]) if len(existing_parts) > 1 else 0)
-                                proposed_inches = (int(proposed_parts[0]) * 12) + (int(proposed_parts[1]) if len(proposed_parts) > 1 else 0)
-                                
-                                # Calculate movement information
-                                move_distance = f"{abs(proposed_inches - existing_inches)}\""
-                                move_direction = "Up" if proposed_inches > existing_inches else "Down"
-                            except:
-                                pass  # Ignore if parsing fails
                         
                         # Write basic pole data (only for the first attacher row)
                         if idx == 0:
-                            connection_id = first_record.get('connection_id', '')
-                            scid = first_record.get('scid_1', '')
-                            
-                            main_sheet.cell(row=row, column=1).value = connection_id
-                            main_sheet.cell(row=row, column=2).value = operation_number
-                            main_sheet.cell(row=row, column=3).value = attachment_action
-                            main_sheet.cell(row=row, column=4).value = pole_owner
-                            main_sheet.cell(row=row, column=5).value = pole_number
-                            main_sheet.cell(row=row, column=6).value = scid
-                            main_sheet.cell(row=row, column=7).value = pole_structure
-                            main_sheet.cell(row=row, column=8).value = proposed_riser
-                            main_sheet.cell(row=row, column=9).value = proposed_guy
-                            main_sheet.cell(row=row, column=10).value = pla_percentage
-                            main_sheet.cell(row=row, column=11).value = construction_grade
-                            main_sheet.cell(row=row, column=12).value = lowest_com
-                            main_sheet.cell(row=row, column=13).value = lowest_cps
-                        
-                        # Write attacher data
-                        main_sheet.cell(row=row, column=14).value = attacher_name # Attacher Name
-                        main_sheet.cell(row=row, column=15).value = existing_height # Existing Height
-                        main_sheet.cell(row=row, column=16).value = proposed_height # Proposed Height
-                        main_sheet.cell(row=row, column=17).value = midspan_height # Mid-Span Proposed
-                        main_sheet.cell(row=row, column=18).value = attacher_gc_str # Ground Clearance
-                        main_sheet.cell(row=row, column=19).value = pole_neutral_h_str # Neutral Height (for the pole)
-                        main_sheet.cell(row=row, column=20).value = pole_primary_h_str # Primary Height (for the pole)
+                            for column, value in block.pole_values.items():
+                                main_sheet.cell(row=row, column=column).value = value
                         
-                        # Write movement information
-                        main_sheet.cell(row=row, column=21).value = move_distance
-                        main_sheet.cell(row=row, column=22).value = move_direction
+                        # Write attacher and movement data (columns N-V)
+                        for column, value in enumerate(attacher_values, 14):
+                            main_sheet.cell(row=row, column=column).value = value
                         
                         # Apply borders, centering, and special fill to all cells in the row
                         for col in range(1, 25):
-                            cell = main_sheet.cell(row=row, column=col)
-                            cell.border = thin_border
-                            cell.alignment = centered_alignment  # Center all cells as required
-                            
-                            # Apply special background color if this is a special row type
-                            if row_fill:
-                                cell.fill = row_fill
+                            styles.apply(main_sheet.cell(row=row, column=col), row_style)
                     
                     # Update current row for next pole
-                    current_row = attacher_start_row + len(main_attachers)
+                    current_row = attacher_start_row + len(block.attacher_rows)
                 
                 # Add a 'To Pole' section if this is the end of processing for this pole
                 if pole_tag_2:
                     to_pole_row = current_row
                     main_sheet.cell(row=to_pole_row, column=10).value = "To Pole"
                     main_sheet.merge_cells(f'J{to_pole_row}:K{to_pole_row}')
-                    main_sheet.cell(row=to_pole_row, column=10).font = header_font
-                    main_sheet.cell(row=to_pole_row, column=10).fill = section_header_fill
-                    main_sheet.cell(row=to_pole_row, column=10).alignment = centered_alignment
-                    main_sheet.cell(row=to_pole_row, column=10).border = thin_border
-                    main_sheet.cell(row=to_pole_row, column=11).fill = section_header_fill
-                    main_sheet.cell(row=to_pole_row, column=11).border = thin_border
+                    styles.apply(main_sheet.cell(row=to_pole_row, column=10), 'header')
+                    styles.apply(main_sheet.cell(row=to_pole_row, column=11), 'section_fill')
                     
                     # Add pole tags for To Pole
                     to_tag_row = to_pole_row + 1
@@ -383,34 +286,7 @@ def create_output_excel(output_excel_path, df, job_data):
                 current_row += 1
             
             # Set column widths for all 24 columns
-            column_widths = {
-                'A': 15,  # Connection ID
-                'B': 15,  # Operation Number
-                'C': 15,  # Attachment Action
-                'D': 12,  # Pole Owner
-                'E': 12,  # Pole #
-                'F': 12,  # SCID
-                'G': 15,  # Pole Structure
-                'H': 18,  # Proposed Riser
-                'I': 18,  # Proposed Guy
-                'J': 22,  # PLA Percentage
-                'K': 22,  # Construction Grade
-                'L': 18,  # Height Lowest Com
-                'M': 22,  # Height Lowest CPS Electrical
-                'N': 25,  # Attacher Description
-                'O': 15,  # Existing Height
-                'P': 15,  # Proposed Height
-                'Q': 15,  # Mid-Span Proposed
-                'R': 15,  # Ground Clearance
-                'S': 15,  # Neutral Height
-                'T': 15,  # Primary Height
-                'U': 12,  # Move Distance
-                'V': 10,  # Direction
-                'W': 12,  # Span Sag
-                'X': 20,  # Notes
-            }
-            
-            for col, width in column_widths.items():
+            for col, width in MAIN_SHEET_COLUMN_WIDTHS.items():
                 main_sheet.column_dimensions[col].width = width
             
             # Freeze the header rows
@@ -420,44 +296,12 @@ def create_output_excel(output_excel_path, df, job_data):
             for row in range(3, current_row):
                 if row % 2 == 0:
                     for col in range(1, 25):  # Apply to all 24 columns
-                        cell = main_sheet.cell(row=row, column=col)
-                        if cell.fill.start_color.index == '00000000':  # Only apply if no fill already set
-                            cell.fill = PatternFill(start_color='E9EDF1', end_color='E9EDF1', fill_type='solid')
+                        # Only applied if no fill is already set
+                        styles.apply_alternate(main_sheet.cell(row=row, column=col))
             
             # ----- Create Summary Sheet -----
             
-            # Get job information
-            job_name = job_data.get("job_name", "Unknown Job")
-            creation_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Count statistics
-            pole_count = len(df['node_id_1'].dropna().unique()) if 'node_id_1' in df.columns else 0
-            connection_count = len(df)
-            
-            # Count proposed items
-            proposed_count = sum(1 for action in df['attachment_action'] if action == "(I)nstalling") if 'attachment_action' in df.columns else 0
-            proposed_riser_count = sum(1 for riser in df['proposed_riser'] if riser.startswith("YES")) if 'proposed_riser' in df.columns else 0
-            proposed_guy_count = sum(1 for guy in df['proposed_guy'] if guy.startswith("YES")) if 'proposed_guy' in df.columns else 0
-            
-            # Create summary data
-            summary_data = [
-                ["Make Ready Report Summary", ""],
-                ["", ""],
-                ["Job Information", ""],
-                ["Job Name", job_name],
-                ["Report Created", creation_date],
-                ["", ""],
-                ["Statistics", ""],
-                ["Total Poles", str(pole_count)],
-                ["Total Connections", str(connection_count)],
-                ["Poles with Proposed Attachments", str(proposed_count)],
-                ["Poles with Proposed Risers", str(proposed_riser_count)],
-                ["Poles with Proposed Guys", str(proposed_guy_count)],
-                ["", ""],
-                ["Notes", ""],
-                ["1. This report was generated from Katapult JSON data", ""],
-                ["2. Format matches the user-specified Excel format with rows per attacher", ""],
-            ]
+            summary_data = _summary_rows(tables, job_index)
             
             # Create a new sheet for the summary
             summary_sheet = workbook.create_sheet("Summary", 0)  # Make it the first sheet
@@ -473,36 +317,25 @@ def create_output_excel(output_excel_path, df, job_data):
             summary_sheet.column_dimensions['B'].width = 50
             
             # Format title
-            title_cell = summary_sheet.cell(row=1, column=1)
-            title_cell.font = Font(name='Arial', size=16, bold=True)
+            styles.apply(summary_sheet.cell(row=1, column=1), 'summary_title')
             
             # Format headers with the same section header color as the main sheet
             header_rows = [3, 7, 14]  # Rows with section headers
             for row_num in header_rows:
-                cell = summary_sheet.cell(row=row_num, column=1)
-                cell.font = Font(name='Arial', size=12, bold=True)
-                cell.fill = section_header_fill  # Use the same light blue as main sheet
+                # Same light blue as the main sheet's section headers
+                styles.apply(summary_sheet.cell(row=row_num, column=1), 'summary_section')
                 
                 # Also merge the header cells across the two columns for visual consistency
                 summary_sheet.merge_cells(f'A{row_num}:B{row_num}')
-                cell.alignment = centered_alignment
             
             # Format data rows
             data_row_ranges = [(4, 5), (8, 12), (15, 16)]  # Ranges of data rows
             for start_row, end_row in data_row_ranges:
                 for row_num in range(start_row, end_row + 1):
-                    # Make the label cell bold
-                    summary_sheet.cell(row=row_num, column=1).font = Font(name='Arial', size=11, bold=True)
-                    
-                    # Style the value cell
-                    value_cell = summary_sheet.cell(row=row_num, column=2)
-                    value_cell.font = Font(name='Arial', size=11)
-                    
-                    # Add alternating row colors
-                    if row_num % 2 == 0:
-                        for col in range(1, 3):
-                            summary_sheet.cell(row=row_num, column=col).fill = PatternFill(
-                                start_color='E9EDF1', end_color='E9EDF1', fill_type='solid')
+                    # Bold label, plain value, with alternating row colors
+                    suffix = '_alt' if row_num % 2 == 0 else ''
+                    styles.apply(summary_sheet.cell(row=row_num, column=1), f'summary_label{suffix}')
+                    styles.apply(summary_sheet.cell(row=row_num, column=2), f'summary_value{suffix}')
             
             # Make "Summary" the active sheet when opening
             workbook.active = 0
@@ -514,64 +347,26 @@ def create_output_excel(output_excel_path, df, job_data):
         print(f"Error creating Excel report: {str(e)}")
         # If error occurs, create a basic report without formatting
         try:
-            # Create a simpler format that follows the layout but with minimal formatting
-            pole_data = []
-            attacher_data = []
-            
-            for _, row in df.iterrows():
-                # Get basic pole data
-                pole_info = {
-                    'operation_number': row.get('operation_number'),
-                    'attachment_action': row.get('attachment_action', '(E)xisting'),
-                    'pole_owner': row.get('pole_owner', ''),
-                    'pole_number': row.get('pole_tag_1', ''),
-                    'pole_structure': row.get('pole_structure', ''),
-                    'proposed_riser': row.get('proposed_riser', 'NO'),
-                    'proposed_guy': row.get('proposed_guy', 'NO'),
-                    'pla_percentage': row.get('pla_percentage', ''),
-                    'construction_grade': row.get('construction_grade', ''),
-                    'lowest_com_height': row.get('lowest_com_height', ''),
-                    'lowest_cps_height': row.get('lowest_cps_height', ''),
-                    'pole_tag_1': row.get('pole_tag_1', ''),
-                    'pole_tag_2': row.get('pole_tag_2', ''),
-                    'connection_id': row.get('connection_id')
-                }
-                
-                pole_data.append(pole_info)
-                
-                # Get attacher data for this pole
-                attachers_data = row.get('attachers_data', {})
-                main_attachers = attachers_data.get('main_attachers', [])
-                
-                if main_attachers:
-                    for attacher in main_attachers:
-                        attacher_name = attacher.get('name', '')
-                        existing_height = attacher.get('existing_height', '')
-                        proposed_height = attacher.get('proposed_height', '')
-                        
-                        # Get midspan height for this attacher
-                        midspan_height = ""
-                        if row.get('connection_id'):
-                            midspan_height = get_midspan_proposed_heights(job_data, row['connection_id'], attacher_name)
-                        
-                        attacher_info = pole_info.copy()
-                        attacher_info['Attacher Description'] = attacher_name
-                        attacher_info['Existing'] = existing_height
-                        attacher_info['Proposed'] = proposed_height
-                        attacher_info['Mid-Span Proposed'] = midspan_height
-                        
-                        attacher_data.append(attacher_info)
-            
-            # Create a new dataframe with the expanded attacher data
-            if attacher_data:
-                output_df = pd.DataFrame(attacher_data)
-            else:
-                output_df = pd.DataFrame(pole_data)
-            
-            # Add attacher columns if they don't exist
-            for col in ['Attacher Description', 'Existing', 'Proposed', 'Mid-Span Proposed']:
-                if col not in output_df.columns:
-                    output_df[col] = ""
+            # Create a simpler format that follows the layout but with minimal formatting:
+            # one row per attacher (or per pole without attachers), straight from the tables
+            basic_columns = {
+                2: 'operation_number', 3: 'attachment_action', 4: 'pole_owner', 5: 'pole_number',
+                7: 'pole_structure', 8: 'proposed_riser', 9: 'proposed_guy', 10: 'pla_percentage',
+                11: 'construction_grade', 12: 'lowest_com_height', 13: 'lowest_cps_height',
+            }
+            basic_rows = []
+            for block in _pole_blocks(tables, job_index):
+                pole_info = {name: block.pole_values[column] for column, name in basic_columns.items()}
+                if not block.attacher_rows:
+                    basic_rows.append(pole_info)
+                for _, attacher_values in block.attacher_rows:
+                    attacher_info = pole_info.copy()
+                    attacher_info['Attacher Description'] = attacher_values[0]
+                    attacher_info['Existing'] = attacher_values[1]
+                    attacher_info['Proposed'] = attacher_values[2]
+                    attacher_info['Mid-Span Proposed'] = attacher_values[3]
+                    basic_rows.append(attacher_info)
+            output_df = pd.DataFrame(basic_rows)
             
             # Select columns in desired order
             col_order = [
@@ -594,9 +389,9 @@ def create_output_excel(output_excel_path, df, job_data):
                 summary_data = {
                     "Item": ["Job Name", "Total Poles", "Total Connections"],
                     "Value": [
-                        job_data.get("job_name", "Unknown Job"),
-                        len(df['node_id_1'].dropna().unique()) if 'node_id_1' in df.columns else 0,
-                        len(df)
+                        job_index.get("job_name", "Unknown Job"),
+                        len(tables.poles),
+                        len(tables.connections)
                     ]
                 }
                 pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
@@ -604,3 +399,479 @@ def create_output_excel(output_excel_path, df, job_data):
             print(f"Basic Excel report created due to formatting error: {output_excel_path}")
         except Exception as backup_error:
             print(f"Failed to create even basic Excel report: {str(backup_error)}")
+
+
+# One pole of the Make Ready Report: cell values of columns A-M for its first row,
+# its pole tags, and (row style, values of columns N-V) for each attacher row
+PoleBlock = namedtuple("PoleBlock", "pole_values pole_tag_1 pole_tag_2 attacher_rows")
+
+
+def _cell_value(value):
+    """Cell value of a table entry; missing values (None, NaN, NA) are written as ""."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return value
+
+
+def _move_distance_text(move_inches):
+    """Move Distance column text (e.g. '6"') of whole-inch moves ("" where there is no move)."""
+    text = np.full(len(move_inches), "", dtype=object)
+    present = ~np.isnan(move_inches)
+    text[present] = [f"{inches}\"" for inches in np.abs(move_inches[present]).astype(np.int64).tolist()]
+    return text
+
+
+def _pole_blocks(tables, job_index):
+    """
+    Yield the PoleBlock of every pole, ordered by node ID.
+    
+    Heights stay numeric in the tables and are formatted here, a column at a
+    time (format_heights). Midspan proposed heights and ground clearances are
+    looked up in inches from the per-span and per-pole caches on job_index and
+    formatted the same way.
+    """
+    poles, connections, attachers = tables
+    
+    # Poles in node ID order, each with the span attributes of its first connection
+    order = np.argsort(poles['node_id'].to_numpy(), kind='stable')
+    poles = poles.iloc[order].reset_index(drop=True)
+    first_spans = connections.drop_duplicates('connection_id').set_index('connection_id')
+    pole_spans = first_spans.reindex(poles['connection_id']).reset_index(drop=True)
+    pole_text = pd.DataFrame({
+        'lowest_com': format_heights(pole_spans['lowest_com_height']),
+        'lowest_cps': format_heights(pole_spans['lowest_cps_height']),
+        'neutral': format_heights(poles['neutral_height']),
+        'primary': format_heights(poles['primary_height']),
+    })
+    
+    # Midspan proposed height (over the pole's first connection) and ground clearance of each attacher
+    first_connection = dict(zip(poles['node_id'], poles['connection_id']))
+    midspan_heights = []
+    ground_clearances = []
+    for node_id, name in zip(attachers['node_id'].tolist(), attachers['name'].tolist()):
+        connection_id = first_connection.get(node_id)
+        midspan_heights.append(
+            get_midspan_proposed_height_value(job_index, connection_id, name) if connection_id else None)
+        ground_clearances.append(
+            get_attacher_ground_clearance_value(node_id, name, job_index) if node_id and name else None)
+    
+    # Attacher rows with their display text, grouped by pole (highest attacher first)
+    move = attachers['move_inches'].to_numpy(dtype=np.float64)
+    attacher_text = pd.DataFrame({
+        'node_id': attachers['node_id'],
+        'name': attachers['name'],
+        'existing': format_heights(attachers['existing_height']),
+        'proposed': format_heights(attachers['proposed_height']),
+        'midspan': format_heights(np.array(midspan_heights, dtype=np.float64)),
+        'ground_clearance': format_heights(np.array(ground_clearances, dtype=np.float64)),
+        'move_distance': _move_distance_text(move),
+        'move_direction': np.select([move > 0, move < 0], ["Up", "Down"], ""),
+        'style': np.select([attachers['is_backspan'], attachers['is_reference']],
+                           ['body_backspan', 'body_reference'], 'body'),
+    })
+    attachers_by_pole = {}
+    for row in attacher_text.itertuples(index=False):
+        attachers_by_pole.setdefault(row.node_id, []).append(row)
+    
+    spans = pole_spans[['pole_tag_1', 'pole_tag_2', 'connection_type']]
+    for pole, span, text in zip(poles.itertuples(index=False), spans.itertuples(index=False),
+                                pole_text.itertuples(index=False)):
+        pole_tag_1 = _cell_value(span.pole_tag_1)
+        pole_tag_2 = _cell_value(span.pole_tag_2)
+        pole_values = {
+            1: _cell_value(pole.connection_id),
+            2: _cell_value(pole.operation_number),
+            3: _cell_value(pole.attachment_action),
+            4: _cell_value(pole.pole_owner),
+            5: pole_tag_1,
+            6: _cell_value(pole.scid),
+            7: _cell_value(pole.pole_structure),
+            8: _cell_value(pole.proposed_riser),
+            9: _cell_value(pole.proposed_guy),
+            10: _cell_value(pole.pla_percentage),
+            11: _cell_value(pole.construction_grade),
+            12: text.lowest_com,
+            13: text.lowest_cps,
+        }
+        is_underground = 'underground' in str(_cell_value(span.connection_type)).lower()
+        
+        attacher_rows = []
+        for attacher in attachers_by_pole.get(pole.node_id, ()):
+            # Underground spans override the backspan / reference row colors
+            row_style = 'body_underground' if is_underground else attacher.style
+            attacher_rows.append((row_style, [
+                attacher.name, attacher.existing, attacher.proposed, attacher.midspan,
+                attacher.ground_clearance, text.neutral, text.primary,
+                attacher.move_distance, attacher.move_direction,
+            ]))
+        
+        yield PoleBlock(pole_values, pole_tag_1, pole_tag_2, attacher_rows)
+
+
+def _summary_rows(tables, job_index):
+    """Build the [label, value] rows of the Summary sheet."""
+    # Get job information
+    job_name = job_index.get("job_name", "Unknown Job")
+    creation_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # Count statistics
+    poles = tables.poles
+    pole_count = len(poles)
+    connection_count = len(tables.connections)
+    
+    # Count proposed items (pole-level attributes are only set on the pole table)
+    proposed_count = int((poles['attachment_action'] == "(I)nstalling").sum())
+    proposed_riser_count = int(poles['proposed_riser'].astype(str).str.startswith("YES").sum())
+    proposed_guy_count = int(poles['proposed_guy'].astype(str).str.startswith("YES").sum())
+    
+    return [
+        ["Make Ready Report Summary", ""],
+        ["", ""],
+        ["Job Information", ""],
+        ["Job Name", job_name],
+        ["Report Created", creation_date],
+        ["", ""],
+        ["Statistics", ""],
+        ["Total Poles", str(pole_count)],
+        ["Total Connections", str(connection_count)],
+        ["Poles with Proposed Attachments", str(proposed_count)],
+        ["Poles with Proposed Risers", str(proposed_riser_count)],
+        ["Poles with Proposed Guys", str(proposed_guy_count)],
+        ["", ""],
+        ["Notes", ""],
+        ["1. This report was generated from Katapult JSON data", ""],
+        ["2. Format matches the user-specified Excel format with rows per attacher", ""],
+    ]
+
+
+def _report_style_specs():
+    """
+    Cell styles of the report, by name (see ReportStyleRegistry).
+    
+    Every style without a fill also gets an '<name>_alt' variant carrying the
+    alternating row fill, plus a bare 'alt' style for otherwise unstyled cells.
+    """
+    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+    
+    header_font = Font(name='Arial', size=11, bold=True, color='000000')
+    section_header_fill = PatternFill(start_color='B7DEE8', end_color='B7DEE8', fill_type='solid')  # Light blue
+    subheader_fill = PatternFill(start_color='DAEEF3', end_color='DAEEF3', fill_type='solid')  # Lighter blue
+    underground_fill = PatternFill(start_color='F2DCDB', end_color='F2DCDB', fill_type='solid')  # Light red
+    backspan_fill = PatternFill(start_color='D9E1F2', end_color='D9E1F2', fill_type='solid')  # Blue-gray
+    reference_fill = PatternFill(start_color='E2EFD9', end_color='E2EFD9', fill_type='solid')  # Light green
+    alternate_fill = PatternFill(start_color='E9EDF1', end_color='E9EDF1', fill_type='solid')
+    thin_border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+    centered_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    
+    specs = {
+        'header': dict(font=header_font, fill=section_header_fill, border=thin_border, alignment=centered_alignment),
+        'subheader': dict(font=header_font, fill=subheader_fill, border=thin_border, alignment=centered_alignment),
+        'section_fill': dict(fill=section_header_fill, border=thin_border),
+        'reference_title': dict(font=header_font, fill=reference_fill, border=thin_border, alignment=centered_alignment),
+        'reference_fill': dict(fill=reference_fill, border=thin_border),
+        'body': dict(border=thin_border, alignment=centered_alignment),
+        'body_underground': dict(fill=underground_fill, border=thin_border, alignment=centered_alignment),
+        'body_backspan': dict(fill=backspan_fill, border=thin_border, alignment=centered_alignment),
+        'body_reference': dict(fill=reference_fill, border=thin_border, alignment=centered_alignment),
+        'summary_title': dict(font=Font(name='Arial', size=16, bold=True)),
+        'summary_section': dict(font=Font(name='Arial', size=12, bold=True), fill=section_header_fill,
+                                alignment=centered_alignment),
+        'summary_label': dict(font=Font(name='Arial', size=11, bold=True)),
+        'summary_value': dict(font=Font(name='Arial', size=11)),
+    }
+    for name, spec in list(specs.items()):
+        if 'fill' not in spec:
+            specs[f'{name}_alt'] = dict(spec, fill=alternate_fill)
+    specs['alt'] = dict(fill=alternate_fill)
+    return specs
+
+
+class ReportStyleRegistry:
+    """
+    Named cell styles of the report (header, section header, reference row,
+    backspan row, alternating fill, ...).
+    
+    Each style is registered with the workbook once as an openpyxl NamedStyle,
+    so its font, fill, border and alignment are deduplicated into the styles
+    table a single time. Cells then get a style by name, which only copies the
+    style's precomputed index array, instead of receiving fresh Font/PatternFill/
+    Border objects that openpyxl has to look up and dedupe cell by cell.
+    """
+    
+    # Prefix of the report's styles in Excel's cell style gallery
+    NAME_PREFIX = "Make Ready "
+    
+    def __init__(self, workbook):
+        from openpyxl.styles import NamedStyle
+        from openpyxl.styles.fonts import DEFAULT_FONT
+        from openpyxl.styles.borders import DEFAULT_BORDER
+        
+        self._arrays = {}
+        self._names_by_xf = {}
+        self._filled = set()
+        for name, spec in _report_style_specs().items():
+            # Unset attributes fall back to the workbook defaults, like an unstyled cell's
+            attributes = dict(font=DEFAULT_FONT, border=DEFAULT_BORDER)
+            attributes.update(spec)
+            named_style = NamedStyle(name=f"{self.NAME_PREFIX}{name}", **attributes)
+            workbook.add_named_style(named_style)
+            style_array = named_style.as_tuple()
+            self._arrays[name] = style_array
+            self._names_by_xf[style_array.xfId] = name
+            if 'fill' in spec:
+                self._filled.add(name)
+    
+    def alternate(self, name):
+        """Name of the style to use for name on an alternating (shaded) row."""
+        if name in self._filled:
+            return name
+        return f'{name}_alt' if name else 'alt'
+    
+    def apply(self, cell, name):
+        """Give cell the named style."""
+        cell._style = copy(self._arrays[name])
+    
+    def apply_alternate(self, cell):
+        """Add the alternating row fill to cell, unless its style already has a fill."""
+        name = self._names_by_xf.get(cell._style.xfId) if cell.has_style else None
+        if name not in self._filled:
+            self.apply(cell, self.alternate(name))
+
+
+class _StreamingSheetWriter:
+    """Appends rows to a write-only worksheet, styling cells through a ReportStyleRegistry."""
+    
+    def __init__(self, sheet, styles, first_alternating_row=None):
+        from openpyxl.cell import WriteOnlyCell
+        
+        self.sheet = sheet
+        self.styles = styles
+        self.row = 1
+        self.first_alternating_row = first_alternating_row
+        self._cell_class = WriteOnlyCell
+        self._merges = []
+    
+    def _cell(self, value, style):
+        cell = self._cell_class(self.sheet, value)
+        self.styles.apply(cell, style)
+        return cell
+    
+    def write(self, cells=None, merges=()):
+        """
+        Append the next row.
+        
+        Args:
+            cells (dict, optional): {column: (value, style name or None)}; missing columns stay empty
+            merges (iterable, optional): Column letter pairs to merge on this row, e.g. [('J', 'K')]
+        
+        Returns:
+            int: The row number that was written
+        """
+        cells = cells or {}
+        row_number = self.row
+        alternating = (self.first_alternating_row is not None and row_number >= self.first_alternating_row
+                       and row_number % 2 == 0)
+        # Alternating rows are filled across every report column, like the in-memory writer does
+        last_column = MAIN_SHEET_COLUMNS if alternating else max(cells, default=0)
+        
+        values = []
+        for column in range(1, last_column + 1):
+            value, style = cells.get(column, (None, None))
+            if alternating:
+                style = self.styles.alternate(style)
+            values.append(self._cell(value, style) if style else value)
+        self.sheet.append(values)
+        
+        for start, end in merges:
+            self.merge(f'{start}{row_number}:{end}{row_number}')
+        self.row += 1
+        return row_number
+    
+    def merge(self, cell_range):
+        """Record a merged range, e.g. 'A1:A2'."""
+        self._merges.append(cell_range)
+    
+    def close(self):
+        """Attach the recorded merged ranges to the sheet (call before saving the workbook)."""
+        from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+        
+        # Built in one go: MultiCellRange.add() checks containment against every
+        # existing range, which is quadratic over a report's per-pole merges
+        self.sheet.merged_cells = MultiCellRange([CellRange(cell_range) for cell_range in self._merges])
+
+
+def _pole_tag_rows(writer, title, pole_tag_1, pole_tag_2):
+    """Write a 'From Pole' / 'To Pole' header row and the pole tag row beneath it."""
+    writer.write({10: (title, 'header'), 11: (None, 'section_fill')}, merges=[('J', 'K')])
+    writer.write({10: (pole_tag_1, None), 11: (pole_tag_2, None)})
+
+
+def _write_main_sheet_streaming(writer, tables, job_index):
+    """Stream the Make Ready Report rows (header, then one block per pole) through writer."""
+    # ----- Multi-Level Header -----
+    writer.write({column: (MAIN_HEADER_ROW_1.get(column), 'header') for column in range(1, MAIN_SHEET_COLUMNS + 1)})
+    writer.write({column: (MAIN_HEADER_ROW_2.get(column), 'subheader') for column in range(1, MAIN_SHEET_COLUMNS + 1)})
+    for cell_range in MAIN_HEADER_MERGES:
+        writer.merge(cell_range)
+    
+    for block in _pole_blocks(tables, job_index):
+        _pole_tag_rows(writer, "From Pole", block.pole_tag_1, block.pole_tag_2)
+        
+        # Reference direction row (light green) if we have a valid connection
+        if block.pole_tag_2:
+            reference_cells = {column: (None, 'reference_fill') for column in range(1, 12)}
+            reference_cells[12] = (f"Reference or Other_pole [cardinal direction] to {block.pole_tag_2}", 'reference_title')
+            writer.write(reference_cells, merges=[('L', 'O')])
+        
+        if not block.attacher_rows:
+            # One row with the basic pole data
+            cells = {column: (None, 'body') for column in range(1, MAIN_SHEET_COLUMNS + 1)}
+            for column, value in block.pole_values.items():
+                cells[column] = (value, 'body')
+            writer.write(cells)
+        
+        # One row per attacher
+        for idx, (row_style, attacher_values) in enumerate(block.attacher_rows):
+            cells = {column: (None, row_style) for column in range(1, MAIN_SHEET_COLUMNS + 1)}
+            # Basic pole data only on the first attacher row
+            if idx == 0:
+                for column, value in block.pole_values.items():
+                    cells[column] = (value, row_style)
+            for column, value in enumerate(attacher_values, 14):
+                cells[column] = (value, row_style)
+            writer.write(cells)
+        
+        if block.pole_tag_2:
+            _pole_tag_rows(writer, "To Pole", block.pole_tag_1, block.pole_tag_2)
+        
+        # Blank row after each pole's data for better readability
+        writer.write()
+
+
+def _write_summary_sheet_streaming(writer, summary_data):
+    """Stream the Summary sheet rows through writer."""
+    section_rows = {3, 7, 14}
+    data_rows = set(range(4, 6)) | set(range(8, 13)) | set(range(15, 17))
+    
+    for row_num, (label, value) in enumerate(summary_data, 1):
+        if row_num == 1:
+            writer.write({1: (label, 'summary_title'), 2: (value, None)})
+        elif row_num in section_rows:
+            # The value cell is covered by the A:B merge
+            writer.write({1: (label, 'summary_section')}, merges=[('A', 'B')])
+        elif row_num in data_rows:
+            suffix = '_alt' if row_num % 2 == 0 else ''
+            writer.write({1: (label, f'summary_label{suffix}'), 2: (value, f'summary_value{suffix}')})
+        else:
+            writer.write({1: (label, None), 2: (value, None)})
+
+
+def _write_report_streaming(output_excel_path, tables, job_index):
+    """
+    Write the report with openpyxl write-only worksheets.
+    
+    Rows are produced in order and flushed to disk as they are appended, so
+    memory stays flat regardless of the number of attacher rows. Column widths
+    and frozen panes are set before the first row, as write-only sheets require.
+    """
+    import openpyxl
+    
+    workbook = openpyxl.Workbook(write_only=True)
+    styles = ReportStyleRegistry(workbook)
+    
+    # ----- Summary Sheet (first sheet, active when opening) -----
+    summary_sheet = workbook.create_sheet("Summary")
+    summary_sheet.column_dimensions['A'].width = 30
+    summary_sheet.column_dimensions['B'].width = 50
+    summary_writer = _StreamingSheetWriter(summary_sheet, styles)
+    _write_summary_sheet_streaming(summary_writer, _summary_rows(tables, job_index))
+    summary_writer.close()
+    
+    # ----- Make Ready Report Sheet -----
+    main_sheet = workbook.create_sheet("Make Ready Report")
+    for col, width in MAIN_SHEET_COLUMN_WIDTHS.items():
+        main_sheet.column_dimensions[col].width = width
+    # Freeze the header rows
+    main_sheet.freeze_panes = 'A3'
+    main_writer = _StreamingSheetWriter(main_sheet, styles, first_alternating_row=3)
+    _write_main_sheet_streaming(main_writer, tables, job_index)
+    main_writer.close()
+    
+    workbook.save(output_excel_path)
+
+
+def benchmark_style_registry(rows=20000, columns=MAIN_SHEET_COLUMNS, repeat=1):
+    """
+    Micro-benchmark: per-cell Font/PatternFill/Border/Alignment objects vs ReportStyleRegistry.
+    
+    Builds the same bordered, centered, alternately shaded grid both ways in an
+    in-memory workbook and times styling and saving separately.
+    
+    Args:
+        rows (int): Number of rows to style
+        columns (int): Number of columns per row
+        repeat (int): Runs per approach; the best time is kept
+    
+    Returns:
+        dict: {'per_cell': {...}, 'registry': {...}} with 'style_seconds' and 'save_seconds' each
+    """
+    import os
+    import time
+    import tempfile
+    import openpyxl
+    from openpyxl.styles import PatternFill, Border, Side, Alignment
+    
+    def per_cell(sheet, workbook):
+        for row in range(1, rows + 1):
+            for col in range(1, columns + 1):
+                cell = sheet.cell(row=row, column=col, value=f"{row}-{col}")
+                cell.border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                                     top=Side(style='thin'), bottom=Side(style='thin'))
+                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                if row % 2 == 0:
+                    cell.fill = PatternFill(start_color='E9EDF1', end_color='E9EDF1', fill_type='solid')
+    
+    def registry(sheet, workbook):
+        styles = ReportStyleRegistry(workbook)
+        for row in range(1, rows + 1):
+            style = 'body_alt' if row % 2 == 0 else 'body'
+            for col in range(1, columns + 1):
+                styles.apply(sheet.cell(row=row, column=col, value=f"{row}-{col}"), style)
+    
+    results = {}
+    for name, apply_styles in (('per_cell', per_cell), ('registry', registry)):
+        best = None
+        for _ in range(max(1, repeat)):
+            workbook = openpyxl.Workbook()
+            start = time.perf_counter()
+            apply_styles(workbook.active, workbook)
+            styled = time.perf_counter()
+            handle, path = tempfile.mkstemp(suffix='.xlsx')
+            os.close(handle)
+            try:
+                workbook.save(path)
+            finally:
+                os.remove(path)
+            saved = time.perf_counter()
+            timing = {'style_seconds': styled - start, 'save_seconds': saved - styled}
+            if best is None or sum(timing.values()) < sum(best.values()):
+                best = timing
+        results[name] = best
+    return results
+
+
+if __name__ == '__main__':
+    # Style registry micro-benchmark, e.g. `python -m processor.excel_generator 20000`
+    import sys
+    
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    timings = benchmark_style_registry(rows=row_count)
+    print(f"{row_count} rows x {MAIN_SHEET_COLUMNS} columns")
+    for approach, timing in timings.items():
+        print(f"{approach:10} style {timing['style_seconds']:7.2f}s  save {timing['save_seconds']:7.2f}s  "
+              f"total {timing['style_seconds'] + timing['save_seconds']:7.2f}s")
@@ -0,0 +1,413 @@
+"""
+Batched bearings and span lengths computed from job coordinates.
+
+get_reference_attachers and get_backspan_attachers used to call
+utils.calculate_bearing one connection at a time and averaged bearings in
+Python loops, for every pole. JobGeometry parses the coordinates of every
+node (its main photo) and every connection midpoint (its middle section) into
+NumPy arrays once per job, computes the bearing of every (node, connection
+midpoint) pair in one vectorized pass and selects each node's backspan with
+array operations. It is built lazily per job (get_job_geometry).
+
+Many connections carry no recorded span length. SpanLengths measures every
+connection along its polyline (pole 1, its sections, pole 2) with one
+haversine pass over the whole job, supplies the length where none is
+recorded and flags recorded lengths that disagree with the measured one
+(get_span_lengths).
+"""
+
+import logging
+import numpy as np
+
+from .data_extraction import extract_location, extract_span_length
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Cardinal directions by 45-degree sector, starting at north
+CARDINAL_DIRECTIONS = np.array(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW'])
+
+# Connection buttons that can never be a backspan
+NON_BACKSPAN_BUTTONS = ("anchor", "ug_poly_path")
+
+# Decimals of degrees kept when comparing angular distances to the mean bearing
+DISTANCE_DECIMALS = 9
+
+# Mean Earth radius in feet (span lengths are reported in feet)
+EARTH_RADIUS_FEET = 20_902_231.0
+
+# A recorded span length is flagged when it differs from the measured length by more
+# than this fraction of the measured length and by more than SPAN_LENGTH_MIN_DEVIATION feet
+SPAN_LENGTH_TOLERANCE = 0.15
+SPAN_LENGTH_MIN_DEVIATION = 10.0
+
+# Span length sources
+SPAN_LENGTH_RECORDED = "recorded"
+SPAN_LENGTH_COMPUTED = "computed"
+
+
+def bearings(lat1, lon1, lat2, lon2):
+    """
+    Initial bearings from points 1 to points 2 (vectorized utils.calculate_bearing).
+
+    Args:
+        lat1, lon1, lat2, lon2 (array-like): Coordinates in degrees
+
+    Returns:
+        np.ndarray: Bearings in degrees, in [0, 360)
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(values, dtype=np.float64)) for values in (lat1, lon1, lat2, lon2))
+    d_lon = lon2 - lon1
+    y = np.sin(d_lon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(d_lon)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
+
+def haversine_feet(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distances between points 1 and points 2.
+
+    Args:
+        lat1, lon1, lat2, lon2 (array-like): Coordinates in degrees
+
+    Returns:
+        np.ndarray: Distances in feet (NaN where a coordinate is NaN)
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(values, dtype=np.float64)) for values in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_FEET * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cardinal_directions(degrees):
+    """Cardinal direction ('N', 'NE', ...) of each bearing in degrees."""
+    sectors = np.round(np.asarray(degrees, dtype=np.float64) / 45).astype(np.int64) % 8
+    return CARDINAL_DIRECTIONS[sectors]
+
+
+def _coordinate(value):
+    """Coordinate as a float, NaN when missing (absent, empty, zero) or not numeric."""
+    if not value:
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _location_value(value):
+    """Coordinate as a float (0 included), NaN when missing or not numeric."""
+    if value is None or value == "":
+        return np.nan
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _node_location(job_index, node_id):
+    """(lat, lon) of a node's main photo, read from the top-level photos first."""
+    main_photo_id = job_index.node_main_photo_id(node_id)
+    if not main_photo_id:
+        return np.nan, np.nan
+    photo_data = job_index.photos.get(main_photo_id, {})
+    if not photo_data:
+        photo_data = job_index.node(node_id).get("photos", {}).get(main_photo_id, {})
+    return _coordinate(photo_data.get("latitude")), _coordinate(photo_data.get("longitude"))
+
+
+def _mid_section(conn_data):
+    """(section_id, lat, lon) of the middle section of a connection (None, NaN, NaN without sections)."""
+    sections = conn_data.get("sections", {})
+    if not sections:
+        return None, np.nan, np.nan
+    section_ids = list(sections.keys())
+    mid_section_id = section_ids[len(section_ids) // 2]
+    mid_section = sections[mid_section_id]
+    return mid_section_id, _coordinate(mid_section.get("latitude")), _coordinate(mid_section.get("longitude"))
+
+
+def _is_marked_backspan(conn_data):
+    """True if the connection_type attribute marks the connection as a backspan."""
+    connection_type = conn_data.get("attributes", {}).get("connection_type", {})
+    if isinstance(connection_type, dict):
+        return any(isinstance(value, str) and "back" in value.lower() for value in connection_type.values())
+    return isinstance(connection_type, str) and "back" in connection_type.lower()
+
+
+def _first_per_group(groups, keys):
+    """Position of the first entry of each group after ordering by keys (ties keep input order)."""
+    order = np.lexsort((np.arange(len(groups)),) + tuple(reversed(keys)) + (groups,))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    return sorted_groups[starts], order[starts]
+
+
+class JobGeometry:
+    """
+    Bearings from every node to the midpoints of its connections, and each node's backspan.
+
+    Attributes:
+        node_ids (list): Node IDs with a located main photo
+        node_lat, node_lon (np.ndarray): Their coordinates in degrees
+        conn_ids (list): Connection IDs with a located middle section
+        mid_section_ids (list): The middle section ID of each connection
+        mid_lat, mid_lon (np.ndarray): Coordinates of the middle sections in degrees
+        pair_node, pair_conn (np.ndarray): Positions in node_ids / conn_ids of each
+            (node, connection) pair, grouped by node in job order
+        pair_bearing (np.ndarray): Bearing in degrees from the node to the connection midpoint
+        pair_cardinal (np.ndarray): Cardinal direction of each pair bearing
+    """
+
+    def __init__(self, job_index):
+        # ----- Coordinates, parsed once -----
+        located_nodes = []
+        for node_id in job_index.nodes:
+            lat, lon = _node_location(job_index, node_id)
+            if not (np.isnan(lat) or np.isnan(lon)):
+                located_nodes.append((node_id, lat, lon))
+        self.node_ids = [node_id for node_id, _, _ in located_nodes]
+        self.node_lat = np.array([lat for _, lat, _ in located_nodes], dtype=np.float64)
+        self.node_lon = np.array([lon for _, _, lon in located_nodes], dtype=np.float64)
+
+        located_mids = []
+        backspan_candidate = []
+        for conn_id, conn_data in job_index.connections.items():
+            mid_section_id, lat, lon = _mid_section(conn_data)
+            if np.isnan(lat) or np.isnan(lon):
+                continue
+            located_mids.append((conn_id, mid_section_id, lat, lon))
+            backspan_candidate.append((
+                str(conn_data.get("button", "") or "").lower() not in NON_BACKSPAN_BUTTONS,
+                _is_marked_backspan(conn_data),
+            ))
+        self.conn_ids = [conn_id for conn_id, _, _, _ in located_mids]
+        self.mid_section_ids = [section_id for _, section_id, _, _ in located_mids]
+        self.mid_lat = np.array([lat for _, _, lat, _ in located_mids], dtype=np.float64)
+        self.mid_lon = np.array([lon for _, _, _, lon in located_mids], dtype=np.float64)
+        self._node_positions = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self._conn_positions = {conn_id: i for i, conn_id in enumerate(self.conn_ids)}
+
+        # ----- (node, connection midpoint) pairs, grouped by node -----
+        pair_node = []
+        pair_conn = []
+        pair_backspan_candidate = []
+        pair_marked = []
+        for node_position, node_id in enumerate(self.node_ids):
+            for conn_id, conn_data in job_index.connections_for_node(node_id):
+                conn_position = self._conn_positions.get(conn_id)
+                if conn_position is None:
+                    continue
+                pair_node.append(node_position)
+                pair_conn.append(conn_position)
+                # Backspans run to another pole of the job
+                other_node_id = conn_data.get("node_id_2") if conn_data.get("node_id_1") == node_id else conn_data.get("node_id_1")
+                is_candidate, is_marked = backspan_candidate[conn_position]
+                pair_backspan_candidate.append(is_candidate and bool(other_node_id) and other_node_id in job_index.nodes)
+                pair_marked.append(is_marked)
+        self.pair_node = np.array(pair_node, dtype=np.int64)
+        self.pair_conn = np.array(pair_conn, dtype=np.int64)
+
+        # ----- Bearings, in one pass -----
+        self.pair_bearing = bearings(self.node_lat[self.pair_node], self.node_lon[self.pair_node],
+                                     self.mid_lat[self.pair_conn], self.mid_lon[self.pair_conn])
+        self.pair_cardinal = cardinal_directions(self.pair_bearing)
+        self._pair_positions = {
+            (self.node_ids[node], self.conn_ids[conn]): i
+            for i, (node, conn) in enumerate(zip(self.pair_node.tolist(), self.pair_conn.tolist()))
+        }
+
+        self._backspans = self._select_backspans(np.array(pair_backspan_candidate, dtype=bool),
+                                                 np.array(pair_marked, dtype=bool))
+        logger.debug(f"Built job geometry: {len(self.node_ids)} located nodes, {len(self.conn_ids)} located spans, "
+                     f"{len(self.pair_bearing)} bearings, {len(self._backspans)} backspans")
+
+    def _select_backspans(self, candidate, marked):
+        """
+        Choose the backspan pair of every node.
+
+        A connection marked as a backspan wins (the first one in job order);
+        otherwise the candidate closest to the circular mean bearing of the
+        node's candidates (the first one on ties).
+
+        Returns:
+            dict: node position -> pair position
+        """
+        candidates = np.flatnonzero(candidate)
+        if not len(candidates):
+            return {}
+        groups = self.pair_node[candidates]
+        radians = np.radians(self.pair_bearing[candidates])
+
+        # Circular mean bearing of each node's candidates
+        group_ids, group_index = np.unique(groups, return_inverse=True)
+        counts = np.bincount(group_index)
+        avg_sin = np.bincount(group_index, weights=np.sin(radians)) / counts
+        avg_cos = np.bincount(group_index, weights=np.cos(radians)) / counts
+        avg_bearing = (np.degrees(np.arctan2(avg_sin, avg_cos)) + 360) % 360
+        distance = np.abs(((self.pair_bearing[candidates] - avg_bearing[group_index] + 180) % 360) - 180)
+        # Two spans symmetric about the mean are a tie; round away floating-point noise so the first wins
+        distance = np.round(distance, DISTANCE_DECIMALS)
+
+        # Marked candidates first, then the smallest angular distance
+        unmarked = (~marked[candidates]).astype(np.int64)
+        distance = np.where(unmarked == 0, 0.0, distance)
+        nodes, firsts = _first_per_group(groups, (unmarked, distance))
+        return dict(zip(nodes.tolist(), candidates[firsts].tolist()))
+
+    def bearing(self, node_id, conn_id):
+        """
+        Bearing from a node to the midpoint of one of its connections.
+
+        Returns:
+            tuple: (degrees, cardinal direction), or None if either is not located
+        """
+        position = self._pair_positions.get((node_id, conn_id))
+        if position is None:
+            return None
+        return float(self.pair_bearing[position]), str(self.pair_cardinal[position])
+
+    def backspan(self, node_id):
+        """
+        The backspan chosen for a node.
+
+        Returns:
+            dict: {'conn_id', 'mid_section_id', 'bearing', 'cardinal'}, or None if the
+                node is not located or has no candidate connection
+        """
+        node_position = self._node_positions.get(node_id)
+        position = self._backspans.get(node_position) if node_position is not None else None
+        if position is None:
+            return None
+        conn_position = int(self.pair_conn[position])
+        return {
+            'conn_id': self.conn_ids[conn_position],
+            'mid_section_id': self.mid_section_ids[conn_position],
+            'bearing': float(self.pair_bearing[position]),
+            'cardinal': str(self.pair_cardinal[position]),
+        }
+
+
+def get_job_geometry(job_index):
+    """
+    Return the JobGeometry of a job, building it on first use.
+
+    Args:
+        job_index (JobIndex): Index over the Katapult JSON data
+
+    Returns:
+        JobGeometry: The geometry cached on the job index
+    """
+    if job_index.geometry is None:
+        job_index.geometry = JobGeometry(job_index)
+    return job_index.geometry
+
+
+class SpanLengths:
+    """
+    Measured and recorded lengths of every connection of a job.
+
+    Attributes:
+        conn_ids (list): Connection IDs, in job order
+        recorded (np.ndarray): Recorded span length in feet (NaN where none is recorded)
+        measured (np.ndarray): Polyline length in feet from the coordinates (NaN where
+            either pole is not located)
+        flagged (np.ndarray): True where the recorded length deviates from the measured
+            one beyond the tolerance
+    """
+
+    def __init__(self, job_index, tolerance=SPAN_LENGTH_TOLERANCE, min_deviation=SPAN_LENGTH_MIN_DEVIATION):
+        self.conn_ids = list(job_index.connections)
+        self._positions = {conn_id: i for i, conn_id in enumerate(self.conn_ids)}
+        node_locations = {}
+
+        def node_location(node_id):
+            if node_id not in node_locations:
+                lat, lon = extract_location(job_index.nodes.get(node_id)) if node_id in job_index.nodes else (None, None)
+                node_locations[node_id] = (_location_value(lat), _location_value(lon))
+            return node_locations[node_id]
+
+        # ----- Polyline vertices of every connection, flattened -----
+        recorded = []
+        vertex_conn = []
+        vertex_lat = []
+        vertex_lon = []
+        for position, conn_data in enumerate(job_index.connections.values()):
+            span_length = extract_span_length(conn_data)
+            recorded.append(np.nan if span_length is None else span_length)
+            start = node_location(conn_data.get("node_id_1"))
+            end = node_location(conn_data.get("node_id_2"))
+            if np.isnan(start).any() or np.isnan(end).any():
+                continue
+            points = [start]
+            for section in conn_data.get("sections", {}).values():
+                point = (_location_value(section.get("latitude")), _location_value(section.get("longitude")))
+                if not np.isnan(point).any():
+                    points.append(point)
+            points.append(end)
+            vertex_conn.extend([position] * len(points))
+            vertex_lat.extend(lat for lat, _ in points)
+            vertex_lon.extend(lon for _, lon in points)
+        self.recorded = np.array(recorded, dtype=np.float64)
+
+        # ----- Segment lengths in one pass, summed per connection -----
+        vertex_conn = np.array(vertex_conn, dtype=np.int64)
+        vertex_lat = np.array(vertex_lat, dtype=np.float64)
+        vertex_lon = np.array(vertex_lon, dtype=np.float64)
+        same_span = vertex_conn[1:] == vertex_conn[:-1]
+        segments = haversine_feet(vertex_lat[:-1][same_span], vertex_lon[:-1][same_span],
+                                  vertex_lat[1:][same_span], vertex_lon[1:][same_span])
+        self.measured = np.full(len(self.conn_ids), np.nan)
+        located = np.unique(vertex_conn)
+        self.measured[located] = np.bincount(vertex_conn[1:][same_span], weights=segments,
+                                             minlength=len(self.conn_ids))[located]
+
+        # ----- Recorded lengths that disagree with the coordinates -----
+        with np.errstate(invalid="ignore"):
+            deviation = np.abs(self.recorded - self.measured)
+            self.flagged = (deviation > tolerance * self.measured) & (deviation > min_deviation)
+
+        logger.debug(f"Measured {len(located)} of {len(self.conn_ids)} spans, "
+                     f"{int(self.flagged.sum())} recorded lengths flagged")
+
+    def span_length(self, conn_id):
+        """
+        Length of a connection: the recorded one, else the measured one.
+
+        Returns:
+            tuple: (length in feet or None, source: "recorded", "computed" or "")
+        """
+        position = self._positions.get(conn_id)
+        if position is None:
+            return None, ""
+        if not np.isnan(self.recorded[position]):
+            return float(self.recorded[position]), SPAN_LENGTH_RECORDED
+        if not np.isnan(self.measured[position]):
+            return round(float(self.measured[position]), 1), SPAN_LENGTH_COMPUTED
+        return None, ""
+
+    def measured_length(self, conn_id):
+        """Measured length of a connection in feet, rounded to 0.1 ft (None if not located)."""
+        position = self._positions.get(conn_id)
+        if position is None or np.isnan(self.measured[position]):
+            return None
+        return round(float(self.measured[position]), 1)
+
+    def is_flagged(self, conn_id):
+        """True if the recorded length of a connection deviates from its measured length."""
+        position = self._positions.get(conn_id)
+        return position is not None and bool(self.flagged[position])
+
+
+def get_span_lengths(job_index):
+    """
+    Return the SpanLengths of a job, measuring them on first use.
+
+    Args:
+        job_index (JobIndex): Index over the Katapult JSON data
+
+    Returns:
+        SpanLengths: The span lengths cached on the job index
+    """
+    if job_index.span_lengths is None:
+        job_index.span_lengths = SpanLengths(job_index)
+    return job_index.span_lengths
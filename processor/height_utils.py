@@ -4,7 +4,12 @@ Utility functions for working with height measurements.
 
 import math
 import logging
-from .photo_data_utils import get_photofirst_data, get_utility_company_names
+import functools
+from collections import namedtuple
+import numpy as np
+from .trace_classification import UNKNOWN_TRACE
+from .job_index import as_job_index
+from .instrumentation import timed
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -19,82 +24,214 @@ def format_height_feet_inches(height_float):
     Returns:
         str: Formatted height in feet-inches format (e.g., "10'-6\"")
     """
-    if not isinstance(height_float, (int, float)) or height_float is None or math.isnan(height_float):
+    if not isinstance(height_float, (int, float, np.integer, np.floating)) or math.isnan(height_float):
         return ""
-    total_inches = round(height_float)
-    feet = total_inches // 12
-    inches = total_inches % 12
-    return f"{feet}'-{inches}\""
+    return _feet_inches(int(round(height_float)))
 
-def get_pole_primary_neutral_heights(node_id, job_data, utility_company_name="CPS ENERGY"):
+
+@functools.lru_cache(maxsize=None)
+def _feet_inches(total_inches):
+    """Feet-inches text of a whole number of inches (reports only use a few hundred distinct values)."""
+    return f"{total_inches // 12}'-{total_inches % 12}\""
+
+
+def format_heights(heights):
+    """
+    Convert an array of heights from inches to feet-inches format.
+
+    Each distinct whole-inch value is formatted once, so formatting a column
+    of attacher heights costs a rounding pass plus a lookup.
+
+    Args:
+        heights (array-like): Heights in inches (NaN / None for missing)
+
+    Returns:
+        np.ndarray: Object array of "X'-Y\"" strings, "" where the height is missing
+    """
+    heights = np.asarray(heights, dtype=np.float64)
+    text = np.full(heights.shape, "", dtype=object)
+    present = np.isfinite(heights)
+    if present.any():
+        whole_inches, inverse = np.unique(np.round(heights[present]).astype(np.int64), return_inverse=True)
+        labels = np.array([_feet_inches(int(value)) for value in whole_inches], dtype=object)
+        text[present] = labels[inverse]
+    return text
+
+
+# One wire measured on a pole photo. trace is its TraceClass (UNKNOWN_TRACE when
+# the trace is not defined in trace_data) and height is in inches.
+PoleWire = namedtuple("PoleWire", "photo_id trace_id trace height mr_move")
+
+
+class PoleWireTable:
+    """
+    Every measured wire of one pole, collected in a single pass over its photos.
+
+    The pole height helpers used to re-resolve each photo and re-scan its wires
+    on every call (once per attacher row for ground clearance). The table is
+    built the first time a node is asked about; primary/neutral minima are
+    computed with it and ground clearances are cached per attacher name.
+
+    Attributes:
+        node_id (str): The pole the table describes
+        wires (list): PoleWire rows in photo / wire order
+        min_primary (float): Lowest utility primary height in inches (inf if none)
+        min_neutral (float): Lowest utility neutral height in inches (inf if none)
+        main_photo_neutral_heights (list): Utility neutral heights on the node's main photo, in wire order
+    """
+
+    def __init__(self, job_index, node_id):
+        self.node_id = node_id
+        self.wires = []
+        self.min_primary = float('inf')
+        self.min_neutral = float('inf')
+        self.main_photo_neutral_heights = []
+        # (company, cable_type) -> (TraceClass, lowest height) of the wires with that trace description
+        self._lowest_by_description = {}
+        # Stripped attacher name -> ground clearance in inches (None when no wire matches)
+        self._clearances = {}
+        self._build(job_index)
+
+    def _build(self, job_index):
+        main_photo_id = job_index.node_main_photo_id(self.node_id)
+
+        try:
+            photos = job_index.node(self.node_id).get('photos', {})
+
+            for photo_id, photo_details in photos.items():
+                photofirst_data = job_index.photofirst_data(photo_id, photo_details)
+
+                for wire_id, wire_data in photofirst_data.get('wire', {}).items():
+                    measured_height = wire_data.get('_measured_height')
+                    trace_id = wire_data.get('_trace')
+
+                    if measured_height is None or trace_id is None:
+                        continue
+
+                    # Try to convert measured_height to float if it's a string
+                    try:
+                        if isinstance(measured_height, str):
+                            measured_height = float(measured_height)
+                    except (ValueError, TypeError):
+                        logger.debug(f"Could not convert measured_height '{measured_height}' to float for wire {wire_id}")
+                        continue
+                    if not isinstance(measured_height, (int, float)):
+                        continue
+
+                    trace = job_index.trace_class(trace_id) or UNKNOWN_TRACE
+                    self.wires.append(PoleWire(photo_id, trace_id, trace, measured_height, wire_data.get('mr_move')))
+
+                    description = (trace.company, trace.cable_type)
+                    lowest = self._lowest_by_description.get(description)
+                    if lowest is None:
+                        # Start from inf like the running minima so a NaN height is never kept
+                        self._lowest_by_description[description] = (trace, min(float('inf'), measured_height))
+                    else:
+                        self._lowest_by_description[description] = (lowest[0], min(lowest[1], measured_height))
+
+                    if not trace.is_utility:
+                        continue
+                    if trace.is_primary:
+                        self.min_primary = min(self.min_primary, measured_height)
+                    elif trace.is_neutral:
+                        self.min_neutral = min(self.min_neutral, measured_height)
+                        if photo_id == main_photo_id and trace_id and trace is not UNKNOWN_TRACE:
+                            self.main_photo_neutral_heights.append(float(measured_height))
+        except Exception as e:
+            logger.error(f"Error building wire table for node {self.node_id}: {str(e)}")
+
+        logger.debug(f"Built wire table for node {self.node_id}: {len(self.wires)} wires")
+
+    def ground_clearance_inches(self, attacher_name):
+        """
+        Lowest height of the wires matching attacher_name, computed once per name.
+
+        Args:
+            attacher_name (str): Stripped, non-empty attacher name
+
+        Returns:
+            float: Height in inches, or None if no wire matches
+        """
+        if attacher_name in self._clearances:
+            return self._clearances[attacher_name]
+
+        attacher_name_upper = attacher_name.upper()
+        min_attacher_height_inches = float('inf')
+        for trace, height in self._lowest_by_description.values():
+            # Match on company, company + cable type, or either name contained in the other
+            if (attacher_name_upper == trace.company_upper or
+                attacher_name_upper in trace.attacher_name_upper or
+                trace.company_upper in attacher_name_upper):
+                min_attacher_height_inches = min(min_attacher_height_inches, height)
+
+        clearance = min_attacher_height_inches if min_attacher_height_inches != float('inf') else None
+        self._clearances[attacher_name] = clearance
+        return clearance
+
+    def ground_clearance(self, attacher_name):
+        """Formatted ground clearance of attacher_name ("X'-Y\"" or "" if no wire matches)."""
+        return format_height_feet_inches(self.ground_clearance_inches(attacher_name))
+
+
+def get_pole_wire_table(job_index, node_id):
+    """
+    Return the PoleWireTable of a node, building it on first use.
+
+    Args:
+        job_index (JobIndex): Index over the full JSON data (a raw job dict is also accepted)
+        node_id (str): The ID of the pole (node)
+
+    Returns:
+        PoleWireTable: The table cached on the job index
+    """
+    job_index = as_job_index(job_index)
+    table = job_index.pole_wire_tables.get(node_id)
+    if table is None:
+        table = job_index.pole_wire_tables[node_id] = PoleWireTable(job_index, node_id)
+    return table
+
+def get_pole_primary_neutral_values(node_id, job_index):
+    """
+    Lowest utility "Primary" and "Neutral" wire heights of a pole in inches.
+
+    Args:
+        node_id (str): The ID of the pole (node).
+        job_index (JobIndex): Index over the full JSON data (a raw job dict is also accepted).
+
+    Returns:
+        dict: {'primary_height': float, 'neutral_height': float}, None where not found.
+    """
+    table = get_pole_wire_table(job_index, node_id)
+    return {
+        'primary_height': table.min_primary if table.min_primary != float('inf') else None,
+        'neutral_height': table.min_neutral if table.min_neutral != float('inf') else None,
+    }
+
+@timed("get_pole_primary_neutral_heights")
+def get_pole_primary_neutral_heights(node_id, job_index, utility_company_name="CPS ENERGY"):
     """
     Extracts the lowest "Primary" and "Neutral" wire heights for a given pole.
 
     Args:
         node_id (str): The ID of the pole (node).
-        job_data (dict): The full JSON data.
+        job_index (JobIndex): Index over the full JSON data (a raw job dict is also accepted).
         utility_company_name (str, optional): The name of the utility company. Defaults to "CPS ENERGY".
 
     Returns:
         dict: {'primary_height': "X'-Y\"", 'neutral_height': "X'-Y\""}
               Values are formatted strings or empty if not found.
     """
-    min_primary_inches = float('inf')
-    min_neutral_inches = float('inf')
-    
-    # Get all possible utility company name formats
-    utility_company_names = get_utility_company_names()
-
-    try:
-        node_data = job_data.get('nodes', {}).get(node_id, {})
-        photos = node_data.get('photos', {})
-
-        for photo_id, photo_details in photos.items():
-            # Use the enhanced photofirst_data extraction function
-            photofirst_data = get_photofirst_data(photo_id, photo_details, job_data)
-            wires = photofirst_data.get('wire', {})
-            
-            for wire_id, wire_data in wires.items():
-                measured_height = wire_data.get('_measured_height')
-                trace_id = wire_data.get('_trace')
-
-                if measured_height is None or trace_id is None:
-                    continue
-
-                # Try to convert measured_height to float if it's a string
-                try:
-                    if isinstance(measured_height, str):
-                        measured_height = float(measured_height)
-                except (ValueError, TypeError):
-                    logger.debug(f"Could not convert measured_height '{measured_height}' to float for wire {wire_id}")
-                    continue
-
-                trace_details = job_data.get('traces', {}).get('trace_data', {}).get(trace_id, {})
-                company = trace_details.get('company', '').strip()
-                cable_type = trace_details.get('cable_type', '').strip()
-
-                # Check if company matches any of the utility company name formats
-                company_match = any(company.upper() == util_name.upper() for util_name in utility_company_names)
-                
-                if company_match:
-                    if cable_type.upper() == "PRIMARY":
-                        min_primary_inches = min(min_primary_inches, measured_height)
-                        logger.debug(f"Found primary wire: {trace_id}, height: {measured_height}")
-                    elif cable_type.upper() == "NEUTRAL":
-                        min_neutral_inches = min(min_neutral_inches, measured_height)
-                        logger.debug(f"Found neutral wire: {trace_id}, height: {measured_height}")
-    except Exception as e:
-        logger.error(f"Error in get_pole_primary_neutral_heights: {str(e)}")
-
-    primary_height_str = format_height_feet_inches(min_primary_inches if min_primary_inches != float('inf') else None)
-    neutral_height_str = format_height_feet_inches(min_neutral_inches if min_neutral_inches != float('inf') else None)
+    heights = get_pole_primary_neutral_values(node_id, job_index)
+    primary_height_str = format_height_feet_inches(heights['primary_height'])
+    neutral_height_str = format_height_feet_inches(heights['neutral_height'])
 
     logger.debug(f"Primary height for node {node_id}: {primary_height_str}")
     logger.debug(f"Neutral height for node {node_id}: {neutral_height_str}")
 
     return {'primary_height': primary_height_str, 'neutral_height': neutral_height_str}
 
-def get_attacher_ground_clearance(node_id, attacher_name, job_data):
+@timed("get_attacher_ground_clearance_value")
+def get_attacher_ground_clearance_value(node_id, attacher_name, job_index):
     """
     Extracts the lowest wire height for a specific attacher on a given pole.
     This is reported as "Ground Clearance" for that attacher on the pole.
@@ -102,72 +239,27 @@ def get_attacher_ground_clearance(node_id, attacher_name, job_data):
     Args:
         node_id (str): The ID of the pole.
         attacher_name (str): The name of the attacher company.
-        job_data (dict): The full JSON data.
+        job_index (JobIndex): Index over the full JSON data (a raw job dict is also accepted).
 
     Returns:
-        str: "X'-Y\"" representing the attacher's lowest height, or empty string if not found.
+        float: The attacher's lowest height in inches, or None if not found.
     """
-    min_attacher_height_inches = float('inf')
     attacher_name = attacher_name.strip() if attacher_name else ""
     
     if not attacher_name:
-        return ""
+        return None
 
-    try:
-        node_data = job_data.get('nodes', {}).get(node_id, {})
-        photos = node_data.get('photos', {})
-
-        for photo_id, photo_details in photos.items():
-            # Use the enhanced photofirst_data extraction function
-            photofirst_data = get_photofirst_data(photo_id, photo_details, job_data)
-            wires = photofirst_data.get('wire', {})
-
-            for wire_id, wire_data in wires.items():
-                measured_height = wire_data.get('_measured_height')
-                trace_id = wire_data.get('_trace')
-
-                if measured_height is None or trace_id is None:
-                    continue
-                
-                # Try to convert measured_height to float if it's a string
-                try:
-                    if isinstance(measured_height, str):
-                        measured_height = float(measured_height)
-                except (ValueError, TypeError):
-                    logger.debug(f"Could not convert measured_height '{measured_height}' to float for wire {wire_id}")
-                    continue
-                
-                trace_details = job_data.get('traces', {}).get('trace_data', {}).get(trace_id, {})
-                company = trace_details.get('company', '').strip()
-                cable_type = trace_details.get('cable_type', '').strip()
-                
-                # Create the full attacher name as it would appear in various formats
-                full_attacher = company
-                if cable_type:
-                    full_attacher = f"{company} {cable_type}"
-                
-                # Do a more flexible matching on attacher name
-                attacher_match = False
-                if attacher_name.upper() == company.upper():
-                    # Match just on company name
-                    attacher_match = True
-                elif full_attacher.upper() == attacher_name.upper():
-                    # Match on full company + cable type
-                    attacher_match = True
-                elif attacher_name.upper() in full_attacher.upper():
-                    # Partial match (attacher name is part of full attacher description)
-                    attacher_match = True
-                elif company.upper() in attacher_name.upper():
-                    # Partial match (company is part of attacher name)
-                    attacher_match = True
-                
-                if attacher_match:
-                    min_attacher_height_inches = min(min_attacher_height_inches, measured_height)
-                    logger.debug(f"Found attacher wire: {trace_id}, attacher: {full_attacher}, height: {measured_height}")
-    except Exception as e:
-        logger.error(f"Error in get_attacher_ground_clearance: {str(e)}")
-        
-    clearance = format_height_feet_inches(min_attacher_height_inches if min_attacher_height_inches != float('inf') else None)
+    clearance = get_pole_wire_table(job_index, node_id).ground_clearance_inches(attacher_name)
     logger.debug(f"Ground clearance for attacher '{attacher_name}' on node {node_id}: {clearance}")
     
     return clearance
+
+@timed("get_attacher_ground_clearance")
+def get_attacher_ground_clearance(node_id, attacher_name, job_index):
+    """
+    Formatted ground clearance of an attacher on a pole (see get_attacher_ground_clearance_value).
+
+    Returns:
+        str: "X'-Y\"" representing the attacher's lowest height, or empty string if not found.
+    """
+    return format_height_feet_inches(get_attacher_ground_clearance_value(node_id, attacher_name, job_index))
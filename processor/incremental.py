@@ -0,0 +1,319 @@
+"""
+Incremental re-processing of jobs that were processed before.
+
+A job is usually uploaded again after a handful of poles were edited, and
+every upload used to extract every connection again. Each pole gets a
+fingerprint of everything its records are extracted from: its own subtree
+(attributes, photos and their photofirst_data, the traces that data
+references; pole heights read every photo of a node, not only the main one),
+the subtree of every connection touching it (attributes and sections with
+their main-photo photofirst_data and traces), the subtrees of the neighbouring
+nodes and its SPIDAcalc match. The records extracted for each pole
+are stored with its fingerprint, keyed by job; on the next upload of the job
+only poles whose fingerprint changed are extracted again, and the stored
+records of every other pole are reused before the report is written.
+
+State is kept in INCREMENTAL_DIR (one file per job, removed after
+INCREMENTAL_MAX_AGE_DAYS) and is ignored when the processor version changed.
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+
+from .result_cache import processor_version
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Reuse the records of unchanged poles from the previous upload of a job
+INCREMENTAL_PROCESSING = os.environ.get('INCREMENTAL_PROCESSING', 'False').lower() == 'true'
+
+# Folder holding the per-job state (next to the app's uploads)
+INCREMENTAL_DIR = os.environ.get(
+    'INCREMENTAL_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads', 'incremental')
+)
+
+# State of jobs not uploaded for this long is removed
+INCREMENTAL_MAX_AGE_DAYS = float(os.environ.get('INCREMENTAL_MAX_AGE_DAYS', 30))
+
+STATE_SUFFIX = ".pkl"
+
+
+def _digest(value):
+    """SHA-256 of a JSON-like value, independent of key order."""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _referenced_traces(photofirst_data, trace_ids):
+    """Add the '_trace' ids found anywhere in photofirst_data to trace_ids."""
+    if isinstance(photofirst_data, dict):
+        trace_id = photofirst_data.get("_trace")
+        if isinstance(trace_id, str):
+            trace_ids.add(trace_id)
+        for value in photofirst_data.values():
+            if isinstance(value, (dict, list)):
+                _referenced_traces(value, trace_ids)
+    elif isinstance(photofirst_data, list):
+        for value in photofirst_data:
+            _referenced_traces(value, trace_ids)
+    return trace_ids
+
+
+def _photo_subtree(job_index, photo_id, photofirst_data):
+    """Top-level photo entry, photofirst_data and referenced traces of a photo."""
+    trace_ids = sorted(_referenced_traces(photofirst_data, set()))
+    return {
+        "photo": job_index.photos.get(photo_id) if photo_id else None,
+        "photofirst_data": photofirst_data,
+        "traces": {trace_id: job_index.trace(trace_id) for trace_id in trace_ids},
+    }
+
+
+def node_fingerprint(job_index, node_id):
+    """
+    Fingerprint of a node's subtree (its data, every photo and its SPIDAcalc match).
+
+    Args:
+        job_index (JobIndex): Index over the Katapult job
+        node_id (str): The node ID
+
+    Returns:
+        str: Hex digest (the same for a missing node in every job)
+    """
+    if node_id not in job_index.nodes:
+        return _digest(None)
+    location = job_index.spidacalc_locations.get(node_id)
+    node_data = job_index.node(node_id)
+    photos = {}
+    for photo_id, photo_entry in (node_data.get("photos", {}) or {}).items():
+        photos[photo_id] = _photo_subtree(job_index, photo_id, job_index.photofirst_data(photo_id, photo_entry))
+    return _digest({
+        "node": node_data,
+        "photos": photos,
+        "spidacalc": (location.label, location.pla_percentage, location.construction_grade)
+                     if location is not None else None,
+    })
+
+
+def connection_fingerprint(job_index, conn_id):
+    """
+    Fingerprint of a connection's subtree (its data and the main photo of each section).
+
+    Args:
+        job_index (JobIndex): Index over the Katapult job
+        conn_id (str): The connection ID
+
+    Returns:
+        str: Hex digest
+    """
+    conn_data = job_index.connection(conn_id)
+    sections = {}
+    for section_id in (conn_data.get("sections", {}) or {}):
+        sections[section_id] = _photo_subtree(job_index, job_index.section_main_photo_id(conn_id, section_id),
+                                              job_index.section_main_photofirst_data(conn_id, section_id))
+    return _digest({"connection": conn_data, "sections": sections})
+
+
+def pole_fingerprints(job_index, node_ids):
+    """
+    Fingerprint of everything the records of each pole are extracted from.
+
+    Combines the pole's own fingerprint with, for every connection touching it
+    in job order, the connection's fingerprint and that of the node at its
+    other end.
+
+    Args:
+        job_index (JobIndex): Index over the Katapult job
+        node_ids (iterable): The poles to fingerprint
+
+    Returns:
+        dict: node_id -> hex digest
+    """
+    node_fingerprints = {}
+    connection_fingerprints = {}
+
+    def node_fp(node_id):
+        if node_id not in node_fingerprints:
+            node_fingerprints[node_id] = node_fingerprint(job_index, node_id)
+        return node_fingerprints[node_id]
+
+    fingerprints = {}
+    for node_id in node_ids:
+        parts = [node_fp(node_id)]
+        for conn_id, conn_data in job_index.connections_for_node(node_id):
+            if conn_id not in connection_fingerprints:
+                connection_fingerprints[conn_id] = connection_fingerprint(job_index, conn_id)
+            other_node_id = conn_data.get("node_id_2") if conn_data.get("node_id_1") == node_id else conn_data.get("node_id_1")
+            parts.append((conn_id, connection_fingerprints[conn_id], node_fp(other_node_id)))
+        fingerprints[node_id] = _digest(parts)
+    return fingerprints
+
+
+class IncrementalRun:
+    """
+    Decides which records of a job can be reused from its previous run.
+
+    Attributes:
+        previous (dict): node_id -> (fingerprint, [(conn_id, first_for_pole), ...], records)
+            from the previous run (empty when there is none or it was made by other code)
+        reused (int): Records taken from the previous run
+        recomputed (int): Records extracted again
+        state (bytes): Pickled state of this run, set by remember()
+    """
+
+    def __init__(self, previous_state=None):
+        self.previous = {}
+        if previous_state and previous_state.get("version") == processor_version():
+            self.previous = previous_state.get("poles", {})
+        elif previous_state:
+            logger.info("Ignoring incremental state written by another processor version")
+        self.reused = 0
+        self.recomputed = 0
+        self.state = None
+        self._fingerprints = {}
+
+    @staticmethod
+    def _pole_plans(job_index, plan):
+        """node_id_1 -> [(position, conn_id, first_for_pole), ...] in plan order."""
+        pole_plans = {}
+        for position, (conn_id, first_for_pole) in enumerate(plan):
+            node_id_1 = job_index.connection(conn_id).get("node_id_1")
+            pole_plans.setdefault(node_id_1, []).append((position, conn_id, first_for_pole))
+        return pole_plans
+
+    def reuse(self, job_index, plan):
+        """
+        Take the records of unchanged poles from the previous run.
+
+        A pole is reused as a whole, when its fingerprint and its entries in the
+        plan are the same as in the previous run. The attacher memo is seeded
+        with the reused poles.
+
+        Args:
+            job_index (JobIndex): Index over the Katapult job
+            plan (list): (conn_id, first_for_pole) tuples from plan_connections
+
+        Returns:
+            tuple: (records, pending) where records has the reused record at each
+                position of plan (None elsewhere) and pending lists the positions
+                still to be extracted, in plan order
+        """
+        pole_plans = self._pole_plans(job_index, plan)
+        self._fingerprints = pole_fingerprints(job_index, pole_plans)
+
+        records = [None] * len(plan)
+        for node_id, entries in pole_plans.items():
+            previous = self.previous.get(node_id)
+            if previous is None:
+                continue
+            fingerprint, previous_entries, previous_records = previous
+            if fingerprint != self._fingerprints[node_id] or \
+                    previous_entries != [(conn_id, first_for_pole) for _, conn_id, first_for_pole in entries]:
+                continue
+            for (position, _, _), record in zip(entries, previous_records):
+                records[position] = record
+            job_index.attachers_memo.get_or_compute(node_id, lambda: previous_records[0]['attachers_data'])
+
+        pending = [position for position, record in enumerate(records) if record is None]
+        self.reused = len(plan) - len(pending)
+        self.recomputed = len(pending)
+        return records, pending
+
+    def remember(self, job_index, plan, records):
+        """
+        Store the records of this run with their pole fingerprints (pickled in self.state).
+
+        Args:
+            job_index (JobIndex): Index over the Katapult job
+            plan (list): (conn_id, first_for_pole) tuples the records were built from
+            records (list): The record for each entry of plan
+        """
+        poles = {}
+        for node_id, entries in self._pole_plans(job_index, plan).items():
+            poles[node_id] = (self._fingerprints[node_id],
+                              [(conn_id, first_for_pole) for _, conn_id, first_for_pole in entries],
+                              [records[position] for position, _, _ in entries])
+        # Pickled now, before the report is written, so nothing later can change the stored records
+        self.state = pickle.dumps({"version": processor_version(), "poles": poles},
+                                  protocol=pickle.HIGHEST_PROTOCOL)
+
+    def stats(self):
+        """Return {'reused': int, 'recomputed': int}."""
+        return {"reused": self.reused, "recomputed": self.recomputed}
+
+
+def job_key(job_data):
+    """
+    Identify a job across uploads.
+
+    Uses the Katapult job id (top level, or that of the first trace) and falls
+    back to the job name.
+
+    Args:
+        job_data (dict): The loaded Katapult JSON data
+
+    Returns:
+        str: The key, or None if the job cannot be identified
+    """
+    job_id = job_data.get("job_id")
+    if not job_id:
+        trace_data = job_data.get("traces", {}).get("trace_data", {}) or {}
+        for trace_info in trace_data.values():
+            if isinstance(trace_info, dict) and trace_info.get("job_id"):
+                job_id = trace_info["job_id"]
+                break
+    if job_id:
+        return f"id:{job_id}"
+    job_name = job_data.get("job_name")
+    return f"name:{job_name}" if job_name else None
+
+
+class IncrementalStore:
+    """Per-job incremental state as pickle files in a local folder."""
+
+    def __init__(self, directory=INCREMENTAL_DIR, max_age_days=INCREMENTAL_MAX_AGE_DAYS):
+        self.directory = directory
+        self.max_age = max_age_days * 24 * 3600
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + STATE_SUFFIX)
+
+    def load(self, key):
+        """The state stored for a job, or None."""
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read incremental state for {key}: {e}")
+            return None
+
+    def save(self, key, state):
+        """Store the pickled state of a job (atomically), then remove expired states."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(state)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Remove states older than max_age; returns how many were removed."""
+        now = time.time()
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(STATE_SUFFIX) and now - entry.stat().st_mtime > self.max_age:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
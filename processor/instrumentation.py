@@ -0,0 +1,122 @@
+"""
+Lightweight stage timers and counters for report generation.
+
+Timing is off unless a profile is being collected:
+
+    with instrumentation.collect() as profile:
+        with instrumentation.stage("load"):
+            ...
+    stats["timings"] = profile.as_dict()
+
+Hot helpers are wrapped with @timed(name). When no profile is active the
+wrapper only checks a context variable and calls straight through, so the
+instrumentation costs nothing measurable when it is turned off. Work done in
+other processes (e.g. parallel extraction workers) is not captured.
+"""
+
+import time
+import functools
+import contextvars
+from contextlib import contextmanager
+
+# Profile collecting timings in the current context, or None when profiling is off
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+
+class Profile:
+    """Accumulated stage/helper timings and named counters."""
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+
+    def add_time(self, name, seconds):
+        entry = self.timings.get(name)
+        if entry is None:
+            self.timings[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add_count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def as_dict(self):
+        """
+        Return the collected data in a JSON-serializable form.
+
+        Returns:
+            dict: {'timings': {name: {'seconds': float, 'calls': int}}, 'counters': {name: int}}
+        """
+        return {
+            "timings": {
+                name: {"seconds": round(seconds, 4), "calls": calls}
+                for name, (seconds, calls) in self.timings.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+
+def is_enabled():
+    """True if a profile is being collected in the current context."""
+    return _active_profile.get() is not None
+
+
+@contextmanager
+def collect(enabled=True):
+    """
+    Collect timings and counters for the enclosed block.
+
+    Args:
+        enabled (bool): If False, nothing is collected and None is yielded
+
+    Yields:
+        Profile: The profile being filled (None when disabled)
+    """
+    if not enabled:
+        yield None
+        return
+    profile = Profile()
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block under name (no-op when profiling is off)."""
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_time(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator timing every call of the wrapped function under name (no-op when profiling is off)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _active_profile.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    """Increment a named counter (no-op when profiling is off)."""
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.add_count(name, amount)
@@ -0,0 +1,217 @@
+"""
+Pre-built lookup index over a Katapult job.
+
+The processing functions used to scan every entry in job_data["connections"]
+(and re-resolve photo data) for each pole they looked at, which made report
+generation quadratic in the number of poles. A JobIndex is built once per job
+and answers those questions with dictionary lookups instead.
+"""
+import logging
+from collections import OrderedDict
+from .photo_data_utils import PhotofirstResolver
+from .trace_classification import classify_traces
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Upper bound on the number of per-node results kept by a job's memo caches
+NODE_MEMO_MAX_SIZE = 4096
+
+
+def find_main_photo_id(photos_dict):
+    """Return the id of the photo with association 'main', or None if there is none."""
+    if not photos_dict:
+        return None
+    return next((pid for pid, p_entry in photos_dict.items() if p_entry.get("association") == "main"), None)
+
+
+class BoundedMemo:
+    """
+    Small LRU memo with hit/miss counters.
+
+    Used for per-job caches whose values are expensive to compute but are
+    requested many times (e.g. once per connection of the same pole).
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=NODE_MEMO_MAX_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() and storing its result on a miss."""
+        value = self._entries.get(key, self._MISSING)
+        if value is not self._MISSING:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = compute()
+        self._entries[key] = value
+        if self.maxsize is not None and len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return {'hits': int, 'misses': int, 'size': int}."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class JobIndex:
+    """
+    Read-only index over a loaded Katapult job.
+
+    Attributes:
+        job_data (dict): The raw Katapult JSON data the index was built from
+        nodes (dict): job_data["nodes"]
+        connections (dict): job_data["connections"]
+        photos (dict): job_data["photos"] (top-level photo entries)
+        trace_data (dict): job_data["traces"]["trace_data"]
+        trace_classes (dict): trace_id -> TraceClass for every trace in trace_data
+        attachers_memo (BoundedMemo): Per-node results of get_attachers_for_node for this job
+        photofirst (PhotofirstResolver): Per-photo photofirst_data cache with path-hit statistics
+        span_profiles (dict): conn_id -> SpanProfile, filled lazily by connection_processing.get_span_profile
+        pole_wire_tables (dict): node_id -> PoleWireTable, filled lazily by height_utils.get_pole_wire_table
+        geometry (JobGeometry): Coordinates and bearings of the job, built lazily by geometry.get_job_geometry
+        span_lengths (SpanLengths): Recorded and measured span lengths, built lazily by geometry.get_span_lengths
+        spidacalc (SpidacalcIndex): Index over the job's SPIDAcalc export (None without one)
+        spidacalc_locations (dict): node_id -> SpidacalcLocation, filled by spidacalc_index.join_spidacalc
+    """
+
+    def __init__(self, job_data, memo_size=NODE_MEMO_MAX_SIZE):
+        self.job_data = job_data or {}
+        self.nodes = self.job_data.get("nodes", {}) or {}
+        self.connections = self.job_data.get("connections", {}) or {}
+        self.photos = self.job_data.get("photos", {}) or {}
+        self.trace_data = self.job_data.get("traces", {}).get("trace_data", {}) or {}
+        self.trace_classes = classify_traces(self.trace_data)
+
+        # node_id -> [conn_id, ...] in the order connections appear in the job
+        self._connections_by_node = {}
+        # node_id -> [conn_id, ...] restricted to anchor connections
+        self._anchor_connections_by_node = {}
+        self._node_main_photo_ids = {}
+        self._section_main_photo_ids = {}
+        self.photofirst = PhotofirstResolver(self.job_data)
+        self.attachers_memo = BoundedMemo(memo_size)
+        self.span_profiles = {}
+        self.pole_wire_tables = {}
+        self.geometry = None
+        self.span_lengths = None
+        self.spidacalc = None
+        self.spidacalc_locations = {}
+
+        self._build()
+
+    def _build(self):
+        """Single pass over nodes and connections to populate the lookup tables."""
+        for node_id, node_data in self.nodes.items():
+            self._node_main_photo_ids[node_id] = find_main_photo_id(node_data.get("photos", {}))
+
+        for conn_id, conn_data in self.connections.items():
+            is_anchor = conn_data.get("button") == "anchor"
+            for node_id in {conn_data.get("node_id_1"), conn_data.get("node_id_2")}:
+                if not node_id:
+                    continue
+                self._connections_by_node.setdefault(node_id, []).append(conn_id)
+                if is_anchor:
+                    self._anchor_connections_by_node.setdefault(node_id, []).append(conn_id)
+
+            for section_id, section_data in (conn_data.get("sections", {}) or {}).items():
+                self._section_main_photo_ids[(conn_id, section_id)] = find_main_photo_id(section_data.get("photos", {}))
+
+        logger.debug(f"Built job index: {len(self.nodes)} nodes, {len(self.connections)} connections, "
+                     f"{len(self._section_main_photo_ids)} sections")
+
+    def get(self, key, default=None):
+        """Dictionary-style access to the underlying job data (e.g. 'job_name')."""
+        return self.job_data.get(key, default)
+
+    def node(self, node_id):
+        """Return the node dict for node_id, or an empty dict."""
+        return self.nodes.get(node_id, {})
+
+    def connection(self, conn_id):
+        """Return the connection dict for conn_id, or an empty dict."""
+        return self.connections.get(conn_id, {})
+
+    def trace(self, trace_id):
+        """Return the trace_data entry for trace_id, or None if it is not defined."""
+        return self.trace_data.get(trace_id)
+
+    def trace_class(self, trace_id):
+        """Return the TraceClass for trace_id, or None if the trace is not defined."""
+        return self.trace_classes.get(trace_id)
+
+    def connections_for_node(self, node_id):
+        """Yield (conn_id, conn_data) for every connection touching node_id, in job order."""
+        for conn_id in self._connections_by_node.get(node_id, ()):
+            yield conn_id, self.connections[conn_id]
+
+    def anchor_connections_for_node(self, node_id):
+        """Yield (conn_id, conn_data) for every anchor connection touching node_id, in job order."""
+        for conn_id in self._anchor_connections_by_node.get(node_id, ()):
+            yield conn_id, self.connections[conn_id]
+
+    def node_main_photo_id(self, node_id):
+        """Return the main photo id for a node, or None."""
+        return self._node_main_photo_ids.get(node_id)
+
+    def section_main_photo_id(self, conn_id, section_id):
+        """Return the main photo id for a connection section, or None."""
+        return self._section_main_photo_ids.get((conn_id, section_id))
+
+    def photofirst_data(self, photo_id, photo_entry):
+        """
+        Resolve photofirst_data for a photo once per job.
+
+        Args:
+            photo_id (str): The ID of the photo
+            photo_entry (dict): The photo entry from a node's or section's 'photos' dictionary
+
+        Returns:
+            dict: The photofirst_data dictionary, or an empty dictionary if not found
+        """
+        return self.photofirst.resolve(photo_id, photo_entry)
+
+    def node_main_photofirst_data(self, node_id):
+        """Return the resolved photofirst_data of a node's main photo, or an empty dict."""
+        main_photo_id = self.node_main_photo_id(node_id)
+        if not main_photo_id:
+            return {}
+        photo_entry = self.node(node_id).get("photos", {}).get(main_photo_id, {})
+        return self.photofirst_data(main_photo_id, photo_entry)
+
+    def section_main_photofirst_data(self, conn_id, section_id):
+        """Return the resolved photofirst_data of a section's main photo, or an empty dict."""
+        main_photo_id = self.section_main_photo_id(conn_id, section_id)
+        if not main_photo_id:
+            return {}
+        section = self.connection(conn_id).get("sections", {}).get(section_id, {})
+        photo_entry = section.get("photos", {}).get(main_photo_id, {})
+        return self.photofirst_data(main_photo_id, photo_entry)
+
+
+def as_job_index(job):
+    """
+    Return a JobIndex for job, building one if a raw job dict was passed.
+
+    Callers that process a whole job should build the index once and pass it
+    around; this helper keeps one-off calls with raw job_data working.
+    """
+    if isinstance(job, JobIndex):
+        return job
+    return JobIndex(job)
@@ -0,0 +1,335 @@
+"""
+Background job queue for report generation.
+
+Uploads are recorded as jobs in a local SQLite database and picked up by a
+small pool of worker processes, so the web request returns immediately
+instead of running process_katapult_json inside the gunicorn worker.
+No external services are needed; SQLite's write lock makes claiming a job
+atomic across every process that shares the database file.
+"""
+
+import os
+import json
+import atexit
+import time
+import uuid
+import sqlite3
+import logging
+import multiprocessing
+from contextlib import contextmanager, closing
+from datetime import datetime
+
+from . import storage
+from .result_cache import cache_report
+from .core import load_katapult_data, validate_katapult_data, process_katapult_json
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Job states
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCESS = "success"
+STATUS_ERROR = "error"
+
+# Seconds an idle worker waits before polling the queue again
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Parse uploads with the streaming loader (keeps only the fields the report reads)
+STREAMING_INGEST = os.environ.get('STREAMING_INGEST', 'True').lower() == 'true'
+
+# Extraction processes per job (see process_data)
+EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', 1))
+
+# Record per-stage timings in each job's stats
+PROFILE_STAGES = os.environ.get('PROFILE_STAGES', 'False').lower() == 'true'
+
+# Reuse the records of poles unchanged since the previous upload of the same job
+INCREMENTAL_PROCESSING = os.environ.get('INCREMENTAL_PROCESSING', 'False').lower() == 'true'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    excel_filename TEXT NOT NULL,
+    delete_input INTEGER NOT NULL DEFAULT 1,
+    content_hash TEXT,
+    stats TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of report generation jobs.
+
+    Each method opens its own short-lived connection, so a JobQueue can be
+    shared freely between threads and passed to worker processes.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+            # Databases created before the report cache lack the content_hash column
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, input_path, output_path, excel_filename, delete_input=True, content_hash=None):
+        """
+        Add a job to the queue.
+
+        Args:
+            input_path (str): Storage path of the uploaded Katapult JSON
+            output_path (str): Local path the Excel report will be written to
+            excel_filename (str): File name offered to the user on download
+            delete_input (bool): Remove the uploaded JSON once the job finishes
+            content_hash (str, optional): SHA-256 of the upload; the finished report is
+                added to the report cache under it
+
+        Returns:
+            str: The new job id
+        """
+        job_id = uuid.uuid4().hex
+        now = _now()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, stage, progress, input_path, output_path, excel_filename, "
+                "delete_input, content_hash, created_at, updated_at) VALUES (?, ?, ?, 0, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, STATUS_QUEUED, input_path, output_path, excel_filename,
+                 int(bool(delete_input)), content_hash, now, now)
+            )
+        logger.info(f"Queued job {job_id} for {input_path}")
+        return job_id
+
+    def claim_next(self, worker_pid=None):
+        """
+        Atomically move the oldest queued job to 'running'.
+
+        Returns:
+            dict: The claimed job, or None if the queue is empty
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at, rowid LIMIT 1", (STATUS_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, stage = ?, worker_pid = ?, updated_at = ? WHERE id = ?",
+                        (STATUS_RUNNING, "starting", worker_pid, _now(), row["id"])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["status"] = STATUS_RUNNING
+        return job
+
+    def update(self, job_id, **fields):
+        """Update columns of a job (e.g. stage, progress, status, error)."""
+        if "stats" in fields and not isinstance(fields["stats"], (str, type(None))):
+            fields["stats"] = json.dumps(fields["stats"])
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        """
+        Look up a job.
+
+        Returns:
+            dict: The job row with 'stats' decoded, or None if the id is unknown
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        return job
+
+    def requeue_stale(self):
+        """
+        Put 'running' jobs whose worker process no longer exists back on the queue.
+
+        Returns:
+            int: Number of jobs requeued
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = ?", (STATUS_RUNNING,)).fetchall()
+        requeued = 0
+        for row in rows:
+            if row["worker_pid"] and _pid_alive(row["worker_pid"]):
+                continue
+            self.update(row["id"], status=STATUS_QUEUED, stage=STATUS_QUEUED, progress=0, worker_pid=None)
+            requeued += 1
+        if requeued:
+            logger.warning(f"Requeued {requeued} job(s) left running by a dead worker")
+        return requeued
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def run_job(queue, job):
+    """
+    Execute a single claimed job: load and validate the upload, generate the report
+    and record the outcome on the job row.
+    """
+    job_id = job["id"]
+    input_path = job["input_path"]
+
+    def on_progress(stage, fraction):
+        queue.update(job_id, stage=stage, progress=fraction)
+
+    try:
+        on_progress("loading", 0.01)
+        try:
+            if STREAMING_INGEST:
+                # Stream from disk or S3 instead of reading the whole upload into memory
+                with closing(storage.open_file(input_path)) as input_file:
+                    katapult_data = load_katapult_data(input_file, streaming=True)
+            else:
+                katapult_data = load_katapult_data(storage.get_file(input_path))
+            validate_katapult_data(katapult_data)
+        except json.JSONDecodeError:
+            queue.update(job_id, status=STATUS_ERROR, stage="failed", error="The uploaded file is not valid JSON.")
+            return
+        except ValueError as e:
+            queue.update(job_id, status=STATUS_ERROR, stage="failed", error=f"Validation error: {str(e)}")
+            return
+
+        stats = process_katapult_json(katapult_data, job["output_path"], progress_callback=on_progress,
+                                      extraction_workers=EXTRACTION_WORKERS, profile=PROFILE_STAGES,
+                                      incremental=INCREMENTAL_PROCESSING)
+        del katapult_data
+
+        if stats.get("status") == "error":
+            queue.update(job_id, status=STATUS_ERROR, stage="failed",
+                         error=f'Processing error: {stats.get("message", "Unknown error")}')
+        else:
+            queue.update(job_id, status=STATUS_SUCCESS, stage="done", progress=1.0, stats=stats)
+            logger.info(f"Job {job_id} finished: {job['output_path']}")
+            cache_report(job.get("content_hash"), job["output_path"], stats)
+    except Exception as e:
+        logger.exception(f"Job {job_id} failed")
+        queue.update(job_id, status=STATUS_ERROR, stage="failed", error=f"An unexpected error occurred: {str(e)}")
+    finally:
+        if job.get("delete_input"):
+            storage.delete_file(input_path)
+
+
+def worker_loop(db_path, poll_interval=DEFAULT_POLL_INTERVAL, max_jobs=None):
+    """
+    Claim and run jobs until the process is terminated.
+
+    Args:
+        db_path (str): Path to the queue database
+        poll_interval (float): Seconds to sleep when the queue is empty
+        max_jobs (int, optional): Stop after this many jobs (None runs forever)
+    """
+    queue = JobQueue(db_path)
+    pid = os.getpid()
+    logger.info(f"Report worker {pid} started (queue: {db_path})")
+    completed = 0
+    while max_jobs is None or completed < max_jobs:
+        job = queue.claim_next(worker_pid=pid)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(queue, job)
+        completed += 1
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker processes draining a JobQueue.
+
+    The workers are not daemonic, so they can start their own extraction
+    processes (EXTRACTION_WORKERS); stop() is registered with atexit so they
+    are terminated when the web process exits.
+    """
+
+    def __init__(self, db_path, workers=1, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.db_path = db_path
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self._processes = []
+        self._owner_pid = None
+
+    def start(self):
+        """Start the worker processes (idempotent; dead workers are replaced)."""
+        if self._owner_pid != os.getpid():
+            # Workers belong to the process that started them (not to a fork of it)
+            self._processes = []
+            self._owner_pid = os.getpid()
+            atexit.register(self.stop)
+        self._processes = [p for p in self._processes if p.is_alive()]
+        if not self._processes:
+            JobQueue(self.db_path).requeue_stale()
+        while len(self._processes) < self.workers:
+            process = multiprocessing.Process(
+                target=worker_loop, args=(self.db_path, self.poll_interval), daemon=False
+            )
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def stop(self, timeout=5):
+        """Terminate the worker processes (killing any that do not exit within timeout)."""
+        if self._owner_pid != os.getpid():
+            return
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self._processes = []
+
+
+if __name__ == '__main__':
+    # Run a standalone worker, e.g. `python -m processor.job_queue uploads/jobs.sqlite3`
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    worker_loop(sys.argv[1] if len(sys.argv) > 1 else os.path.join("uploads", "jobs.sqlite3"))
@@ -0,0 +1,248 @@
+"""
+Pluggable JSON decoding for Katapult and SPIDAcalc files.
+
+Every load path (upload validation, Katapult and SPIDAcalc parsing) goes
+through loads()/load() here so the fastest installed decoder is used:
+orjson if present, then ujson (pinned in requirements.txt), then the
+standard library. Set JSON_BACKEND=orjson|ujson|json to force one.
+
+Run `python -m processor.json_backend [files...]` to compare parse time per MB
+of the available backends. Without files, a synthetic Katapult export of
+BENCHMARK_SYNTHETIC_MB is generated (see synthetic_job) so the timings are not
+dominated by noise.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def _orjson_backend():
+    import orjson
+    return orjson.loads
+
+
+def _ujson_backend():
+    import ujson
+    return ujson.loads
+
+
+def _stdlib_backend():
+    return json.loads
+
+
+# Backends in order of preference -> factory returning a loads(bytes | str) callable
+BACKENDS = {
+    "orjson": _orjson_backend,
+    "ujson": _ujson_backend,
+    "json": _stdlib_backend,
+}
+
+
+def available_backends():
+    """Return {name: loads} for every backend that can be imported, in order of preference."""
+    backends = {}
+    for name, factory in BACKENDS.items():
+        try:
+            backends[name] = factory()
+        except ImportError:
+            continue
+    return backends
+
+
+def _select_backend():
+    backends = available_backends()
+    requested = os.environ.get("JSON_BACKEND", "").strip().lower()
+    if requested:
+        if requested in backends:
+            return requested, backends[requested]
+        logger.warning(f"JSON_BACKEND={requested} is not available; using the fastest installed decoder")
+    name = next(iter(backends))
+    return name, backends[name]
+
+
+BACKEND_NAME, _fast_loads = _select_backend()
+
+
+def loads(data):
+    """
+    Decode a JSON document with the selected backend.
+
+    Args:
+        data (bytes | str): The raw JSON document
+
+    Returns:
+        The decoded Python object
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON, whichever backend is in use
+    """
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    if _fast_loads is json.loads:
+        return json.loads(data)
+    try:
+        return _fast_loads(data)
+    except (ValueError, OverflowError):
+        # The fast decoders reject a few inputs the stdlib accepts (NaN, very large
+        # integers); re-parse with json so those still load and real syntax errors
+        # surface as json.JSONDecodeError like they always have
+        return json.loads(data)
+
+
+def load(file):
+    """
+    Decode a JSON document from a path or an open file object.
+
+    Args:
+        file (str | file-like): Path to a JSON file, or a file object opened in text or binary mode
+
+    Returns:
+        The decoded Python object
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as handle:
+            return loads(handle.read())
+    return loads(file.read())
+
+
+# Size of the synthetic export the benchmark parses when no files are given
+BENCHMARK_SYNTHETIC_MB = float(os.environ.get("BENCHMARK_SYNTHETIC_MB", 20))
+
+# Files smaller than this parse too quickly for a meaningful ms/MB figure
+BENCHMARK_MIN_MB = 1.0
+
+# Approximate size of one pole (node, its photos and connections) in synthetic_job output
+_SYNTHETIC_BYTES_PER_POLE = 3150
+
+
+def synthetic_job(size_mb, seed=0):
+    """
+    Generate a Katapult-shaped job export of roughly size_mb, for benchmarking.
+
+    Poles are laid out along a line, each with attributes, a main photo whose
+    photofirst_data holds wire and guying measurements referencing traces, and
+    one to three connections with measured sections.
+
+    Args:
+        size_mb (float): Approximate size of the encoded JSON
+        seed (int, optional): Seed of the random generator (the output is deterministic)
+
+    Returns:
+        bytes: The encoded JSON document
+    """
+    rnd = random.Random(seed)
+    poles = max(1, int(size_mb * 1024 * 1024 / _SYNTHETIC_BYTES_PER_POLE))
+    companies = [("CPS Energy", "Neutral"), ("CPS Energy", "Primary"), ("AT&T", "Telco"),
+                 ("Charter", "CATV"), ("Crown Castle", "Fiber"), ("CPS Energy", "Down Guy")]
+    traces = {f"trace{i}": {"company": company, "cable_type": cable_type, "label": f"{company} {cable_type}"}
+              for i, (company, cable_type) in enumerate(companies)}
+
+    def photofirst_data():
+        data = {"wire": {}, "guying": {}, "equipment": {}}
+        for trace_id, trace in traces.items():
+            measurement = {"_trace": trace_id, "_measured_height": round(rnd.uniform(150, 420), 1),
+                           "_created": {"uid": "u1", "timestamp": rnd.randint(1600000000000, 1700000000000)}}
+            if rnd.random() < 0.3:
+                measurement["mr_move"] = str(rnd.choice([-12, -6, 6, 12]))
+            key = "guying" if "Guy" in trace["cable_type"] else "wire"
+            data[key][f"-M{rnd.getrandbits(48):012x}"] = measurement
+        return data
+
+    nodes, connections, photos = {}, {}, {}
+    for i in range(poles):
+        node_id, photo_id = f"-N{i:07d}", f"-P{i:07d}"
+        latitude, longitude = 29.4 + i * 0.0005, -98.5 + rnd.uniform(0, 0.001)
+        photos[photo_id] = {"photofirst_data": photofirst_data(), "latitude": latitude, "longitude": longitude,
+                            "camera": {"make": "Synthetic", "focal_length": 4.2}}
+        nodes[node_id] = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "photos": {photo_id: {"association": "main"}},
+            "attributes": {
+                "PoleNumber": {"-Imported": f"PL{i}"},
+                "scid": {"auto_button": str(i)},
+                "pole_tag": {"-Imported": {"company": "CPS Energy", "tagtext": f"T{i}"}},
+                "node_type": {"-Imported": "pole"},
+                "pole_height": {"one": rnd.choice([35, 40, 45])},
+                "pole_class": {"one": rnd.choice(["3", "4", "H1"])},
+                "final_passing_capacity_%": {"-Imported": f"{rnd.uniform(20, 110):.2f}"},
+                "kat_MR_notes": {"-Imported": rnd.choice(["", "Lower comm 6in", "Install new down guy"])},
+            },
+        }
+        for j in range(rnd.choice([1, 1, 2, 3]) if i + 1 < poles else 0):
+            section_photo_id = f"-S{i:07d}{j}"
+            photos[section_photo_id] = {"photofirst_data": photofirst_data()}
+            connections[f"-C{i:07d}{j}"] = {
+                "node_id_1": node_id,
+                "node_id_2": f"-N{min(poles - 1, i + 1 + j):07d}",
+                "attributes": {"connection_type": {"button_added": "aerial cable"},
+                               "span_length": {"-Imported": str(rnd.randint(50, 300))}},
+                "sections": {"midpoint_section": {"latitude": latitude + 0.00025, "longitude": longitude,
+                                                  "photos": {section_photo_id: {"association": "main"}}}},
+            }
+
+    job = {"job_name": "Synthetic benchmark job", "job_id": "-Jsynthetic", "nodes": nodes,
+           "connections": connections, "photos": photos, "traces": {"trace_data": traces}}
+    return json.dumps(job, separators=(",", ":")).encode("utf-8")
+
+
+def benchmark(paths, repeat=5):
+    """
+    Time every available backend on the given files.
+
+    Args:
+        paths (list): JSON files to parse, or (name, bytes) pairs of documents already in memory
+        repeat (int): Parses per file and backend; the best time is kept
+
+    Returns:
+        list: One dict per (file, backend) with 'file', 'backend', 'size_mb', 'seconds', 'seconds_per_mb'
+    """
+    results = []
+    backends = available_backends()
+    for path in paths:
+        if isinstance(path, tuple):
+            path, raw = path
+        else:
+            with open(path, "rb") as handle:
+                raw = handle.read()
+        size_mb = len(raw) / (1024 * 1024)
+        for name, backend_loads in backends.items():
+            best = None
+            for _ in range(max(1, repeat)):
+                start = time.perf_counter()
+                backend_loads(raw)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results.append({
+                "file": path,
+                "backend": name,
+                "size_mb": size_mb,
+                "seconds": best,
+                "seconds_per_mb": best / size_mb if size_mb else 0.0,
+            })
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    files = sys.argv[1:]
+    if not files:
+        print(f"Generating a {BENCHMARK_SYNTHETIC_MB:g} MB synthetic Katapult job...")
+        files = [("synthetic job", synthetic_job(BENCHMARK_SYNTHETIC_MB))]
+    print(f"Selected backend: {BACKEND_NAME}")
+    print(f"{'file':40} {'backend':8} {'MB':>8} {'ms':>10} {'ms/MB':>10}")
+    small_files = set()
+    for row in benchmark(files):
+        print(f"{os.path.basename(row['file'])[:40]:40} {row['backend']:8} {row['size_mb']:8.2f} "
+              f"{row['seconds'] * 1000:10.2f} {row['seconds_per_mb'] * 1000:10.2f}")
+        if row['size_mb'] < BENCHMARK_MIN_MB:
+            small_files.add(os.path.basename(row['file']))
+    if small_files:
+        print(f"Under {BENCHMARK_MIN_MB:g} MB, ms/MB is mostly timing noise: {', '.join(sorted(small_files))}")
@@ -0,0 +1,342 @@
+"""
+Filesystem-backed stand-in for S3, for running and benchmarking the S3 storage backend offline.
+
+LocalS3 answers the requests of a real boto3 S3 client from a local folder:
+it hooks the client's before-send event, so everything above the HTTP layer
+(signing, TransferConfig multipart splitting and concurrency, the connection
+pool settings, response parsing) runs exactly as it does against AWS. Objects
+are files under <root>/<bucket>/<key>; multipart parts are kept under
+<root>/.multipart until the upload is completed.
+
+Only the operations the processor uses are implemented: PutObject, the
+multipart upload calls, GetObject (with ranges), HeadObject, CopyObject,
+DeleteObject, DeleteObjects and ListObjectsV2. Select it with
+S3_ENDPOINT_URL=file:///path/to/folder (see storage.create_s3_client).
+"""
+
+import os
+import io
+import re
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.etree import ElementTree
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Endpoint the fake client is built with; requests never leave the process
+LOCAL_ENDPOINT = "http://local-s3.invalid"
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+# Bytes returned per read of a streamed GetObject body
+READ_CHUNK_SIZE = 1024 * 1024
+
+_CHUNK_HEADER = re.compile(rb"^([0-9a-fA-F]+)(;[^\r\n]*)?\r\n")
+
+
+class _Body:
+    """Response body in the shape botocore reads it from urllib3 (read, readinto and stream)."""
+
+    def __init__(self, file_object, length=None):
+        self._file_object = file_object
+        self._remaining = length
+
+    def read(self, amt=None):
+        if self._file_object.closed:
+            return b""
+        if self._remaining is not None:
+            amt = self._remaining if amt is None or amt < 0 else min(amt, self._remaining)
+        data = self._file_object.read(amt) if amt is not None else self._file_object.read()
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        if not data and amt != 0:
+            self.close()
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def stream(self, **kwargs):
+        while True:
+            data = self.read(READ_CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        self._file_object.close()
+
+
+def _decode_aws_chunked(data):
+    """Strip the aws-chunked framing (and checksum trailer) newer botocore versions send."""
+    decoded = []
+    position = 0
+    while True:
+        match = _CHUNK_HEADER.match(data, position)
+        if match is None:
+            raise ValueError("Malformed aws-chunked body")
+        size = int(match.group(1), 16)
+        position = match.end()
+        if size == 0:
+            return b"".join(decoded)
+        decoded.append(data[position:position + size])
+        position += size + 2  # Chunk data is followed by \r\n
+
+
+def _http_date(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+
+def _iso_date(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _xml(root_tag, children, namespace=S3_NAMESPACE):
+    """XML document in the S3 namespace; children are (tag, text or list of children) pairs."""
+    root = ElementTree.Element(root_tag, xmlns=namespace) if namespace else ElementTree.Element(root_tag)
+
+    def add(parent, items):
+        for tag, value in items:
+            element = ElementTree.SubElement(parent, tag)
+            if isinstance(value, list):
+                add(element, value)
+            else:
+                element.text = str(value)
+
+    add(root, children)
+    return ElementTree.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def _error(status_code, code, message):
+    # Error documents have no namespace
+    return status_code, {}, _xml("Error", [("Code", code), ("Message", message)], namespace=None)
+
+
+class LocalS3:
+    """
+    Serves S3 requests from a folder.
+
+    Attributes:
+        root (str): Folder holding one subfolder per bucket
+        requests (int): Requests answered so far (e.g. parts uploaded in a benchmark)
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.requests = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def create_client(self, config=None):
+        """
+        A boto3 S3 client whose requests are answered by this stand-in.
+
+        Args:
+            config (botocore.config.Config, optional): Client configuration (e.g. max_pool_connections).
+                Path-style addressing is used regardless.
+
+        Returns:
+            botocore.client.S3: The client
+        """
+        from botocore.config import Config
+
+        path_style = Config(s3={"addressing_style": "path"})
+        client = boto3.session.Session().client(
+            "s3",
+            endpoint_url=LOCAL_ENDPOINT,
+            region_name="us-east-1",
+            aws_access_key_id="local",
+            aws_secret_access_key="local",
+            config=config.merge(path_style) if config is not None else path_style,
+        )
+        client.meta.events.register("before-send.s3", self._handle)
+        return client
+
+    def _object_path(self, bucket, key):
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.join(self.root, bucket) + os.sep):
+            raise ValueError(f"Key escapes the bucket: {key}")
+        return path
+
+    def _handle(self, request, **kwargs):
+        with self._lock:
+            self.requests += 1
+        url = urlsplit(request.url)
+        bucket, _, key = url.path.lstrip("/").partition("/")
+        bucket, key = unquote(bucket), unquote(key)
+        query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        headers = {name.lower(): value.decode() if isinstance(value, bytes) else value
+                   for name, value in request.headers.items()}
+
+        body = request.body
+        if hasattr(body, "read"):
+            body = body.read()
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        body = body or b""
+        if "aws-chunked" in headers.get("content-encoding", ""):
+            body = _decode_aws_chunked(body)
+
+        status_code, response_headers, content = self._dispatch(request.method, bucket, key, query, headers, body)
+        if not hasattr(content, "read"):
+            response_headers.setdefault("Content-Length", str(len(content)))
+            content = _Body(io.BytesIO(content))
+        return AWSResponse(request.url, status_code, response_headers, content)
+
+    def _dispatch(self, method, bucket, key, query, headers, body):
+        if not key:
+            if method == "GET":
+                return self._list_objects(bucket, query)
+            if method == "POST" and "delete" in query:
+                return self._delete_objects(bucket, body)
+            return _error(501, "NotImplemented", f"{method} on a bucket is not supported")
+        if method == "PUT" and "uploadId" in query:
+            return self._upload_part(query["uploadId"], int(query["partNumber"]), body)
+        if method == "PUT" and "x-amz-copy-source" in headers:
+            return self._copy_object(bucket, key, headers["x-amz-copy-source"])
+        if method == "PUT":
+            return self._put_object(bucket, key, body)
+        if method == "POST" and "uploads" in query:
+            return self._create_multipart_upload(bucket, key)
+        if method == "POST" and "uploadId" in query:
+            return self._complete_multipart_upload(bucket, key, query["uploadId"])
+        if method == "DELETE" and "uploadId" in query:
+            shutil.rmtree(self._upload_dir(query["uploadId"]), ignore_errors=True)
+            return 204, {}, b""
+        if method == "DELETE":
+            try:
+                os.remove(self._object_path(bucket, key))
+            except FileNotFoundError:
+                pass
+            return 204, {}, b""
+        if method in ("GET", "HEAD"):
+            return self._get_object(bucket, key, headers, head=method == "HEAD")
+        return _error(501, "NotImplemented", f"{method} is not supported")
+
+    def _write_object(self, path, chunks):
+        """Write an object atomically; returns its ETag."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest = hashlib.md5()
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(temp_path, path)
+        return f'"{digest.hexdigest()}"'
+
+    def _put_object(self, bucket, key, body):
+        etag = self._write_object(self._object_path(bucket, key), [body])
+        return 200, {"ETag": etag}, b""
+
+    def _copy_object(self, bucket, key, copy_source):
+        source_bucket, _, source_key = unquote(copy_source).lstrip("/").partition("/")
+        source_path = self._object_path(source_bucket, source_key.split("?versionId=")[0])
+        if not os.path.exists(source_path):
+            return _error(404, "NoSuchKey", "The specified key does not exist.")
+        with open(source_path, "rb") as f:
+            etag = self._write_object(self._object_path(bucket, key), iter(lambda: f.read(READ_CHUNK_SIZE), b""))
+        modified = _iso_date(os.path.getmtime(self._object_path(bucket, key)))
+        return 200, {}, _xml("CopyObjectResult", [("LastModified", modified), ("ETag", etag)])
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, ".multipart", os.path.basename(upload_id))
+
+    def _create_multipart_upload(self, bucket, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return 200, {}, _xml("InitiateMultipartUploadResult",
+                             [("Bucket", bucket), ("Key", key), ("UploadId", upload_id)])
+
+    def _upload_part(self, upload_id, part_number, body):
+        upload_dir = self._upload_dir(upload_id)
+        if not os.path.isdir(upload_dir):
+            return _error(404, "NoSuchUpload", "The specified upload does not exist.")
+        etag = self._write_object(os.path.join(upload_dir, f"{part_number:05d}"), [body])
+        return 200, {"ETag": etag}, b""
+
+    def _complete_multipart_upload(self, bucket, key, upload_id):
+        upload_dir = self._upload_dir(upload_id)
+        if not os.path.isdir(upload_dir):
+            return _error(404, "NoSuchUpload", "The specified upload does not exist.")
+
+        def parts():
+            for name in sorted(os.listdir(upload_dir)):
+                with open(os.path.join(upload_dir, name), "rb") as f:
+                    yield from iter(lambda: f.read(READ_CHUNK_SIZE), b"")
+
+        etag = self._write_object(self._object_path(bucket, key), parts())
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return 200, {}, _xml("CompleteMultipartUploadResult",
+                             [("Location", f"{LOCAL_ENDPOINT}/{bucket}/{key}"), ("Bucket", bucket),
+                              ("Key", key), ("ETag", etag)])
+
+    def _get_object(self, bucket, key, headers, head=False):
+        path = self._object_path(bucket, key)
+        if not os.path.isfile(path):
+            return (404, {}, b"") if head else _error(404, "NoSuchKey", "The specified key does not exist.")
+        size = os.path.getsize(path)
+        start, end, status_code = 0, size - 1, 200
+        match = re.match(r"bytes=(\d*)-(\d*)$", headers.get("range", ""))
+        if match:
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(size - int(match.group(2)), 0)
+            status_code = 206
+        response_headers = {
+            "Content-Length": str(max(end - start + 1, 0)),
+            "Content-Type": "binary/octet-stream",
+            "Last-Modified": _http_date(os.path.getmtime(path)),
+            "ETag": f'"{size:x}-{int(os.path.getmtime(path) * 1e6):x}"',
+        }
+        if status_code == 206:
+            response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        if head:
+            return status_code, response_headers, b""
+        f = open(path, "rb")
+        f.seek(start)
+        return status_code, response_headers, _Body(f, end - start + 1)
+
+    def _list_objects(self, bucket, query):
+        prefix = query.get("prefix", "")
+        bucket_dir = os.path.join(self.root, bucket)
+        contents = []
+        for directory, _, names in os.walk(bucket_dir):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, bucket_dir).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    stat = os.stat(path)
+                    contents.append(("Contents", [("Key", key), ("LastModified", _iso_date(stat.st_mtime)),
+                                                  ("ETag", '""'), ("Size", stat.st_size),
+                                                  ("StorageClass", "STANDARD")]))
+        contents.sort(key=lambda item: item[1][0][1])
+        return 200, {}, _xml("ListBucketResult", [("Name", bucket), ("Prefix", prefix),
+                                                  ("KeyCount", len(contents)), ("MaxKeys", 1000),
+                                                  ("IsTruncated", "false")] + contents)
+
+    def _delete_objects(self, bucket, body):
+        deleted = []
+        for element in ElementTree.fromstring(body).iter():
+            if element.tag.endswith("Key"):
+                try:
+                    os.remove(self._object_path(bucket, element.text))
+                except FileNotFoundError:
+                    pass
+                deleted.append(("Deleted", [("Key", element.text)]))
+        return 200, {}, _xml("DeleteResult", deleted)
@@ -1,13 +1,27 @@
 """
 Functions for processing and describing movements of attachers.
+
+Attacher heights arrive as inches (None when not measured) and are only
+formatted as feet-inches when a line of text is written.
 """
 
+import math
+from .height_utils import format_height_feet_inches
+
+
+def _whole_inches(height):
+    """Height rounded to whole inches as shown in the report, or None if it is missing."""
+    if height is None or not math.isfinite(height):
+        return None
+    return int(round(height))
+
+
 def get_movement_summary(attacher_data, cps_only=False):
     """
     Generate a movement summary for all attachers that have moves, proposed wires, and guying.
     
     Args:
-        attacher_data (list): List of attacher data dictionaries
+        attacher_data (list): List of attacher data dictionaries (heights in inches)
         cps_only (bool): If True, only include CPS Energy movements
         
     Returns:
@@ -18,8 +32,8 @@ def get_movement_summary(attacher_data, cps_only=False):
     # First handle movements of existing attachments
     for attacher in attacher_data:
         name = attacher['name']
-        existing = attacher['existing_height']
-        proposed = attacher['proposed_height']
+        existing = format_height_feet_inches(attacher['existing_height'])
+        proposed = format_height_feet_inches(attacher['proposed_height'])
         is_proposed = attacher.get('is_proposed', False)
         is_guy = '(Down Guy)' in name
         
@@ -36,36 +50,34 @@ def get_movement_summary(attacher_data, cps_only=False):
             continue
             
         # Handle movements of existing attachments
-        if proposed and existing:
-            try:
-                existing_parts = existing.replace('"', '').split("'")
-                proposed_parts = proposed.replace('"', '').split("'")
-                
-                existing_inches = int(existing_parts[0]) * 12 + int(existing_parts[1])
-                proposed_inches = int(proposed_parts[0]) * 12 + int(proposed_parts[1])
-                
-                # Calculate movement
-                movement = proposed_inches - existing_inches
+        existing_inches = _whole_inches(attacher['existing_height'])
+        proposed_inches = _whole_inches(attacher['proposed_height'])
+        if existing_inches is not None and proposed_inches is not None:
+            # Calculate movement
+            movement = proposed_inches - existing_inches
+            
+            if movement != 0:
+                # Determine if raising or lowering
+                action = "Raise" if movement > 0 else "Lower"
+                # Get absolute movement in inches
+                inches_moved = abs(movement)
                 
-                if movement != 0:
-                    # Determine if raising or lowering
-                    action = "Raise" if movement > 0 else "Lower"
-                    # Get absolute movement in inches
-                    inches_moved = abs(movement)
-                    
-                    summary = f"{action} {name} {inches_moved}\" from {existing} to {proposed}"
-                    summaries.append(summary)
-            except (ValueError, IndexError):
-                continue
+                summary = f"{action} {name} {inches_moved}\" from {existing} to {proposed}"
+                summaries.append(summary)
     
     return "\n".join(summaries) if summaries else ""
 
+def _height_text(attacher):
+    """Formatted proposed height of an attacher, falling back to its existing height."""
+    return (format_height_feet_inches(attacher.get('proposed_height'))
+            or format_height_feet_inches(attacher.get('existing_height')))
+
 def generate_remedy_description(attacher_data, is_underground=False):
     """
     Generate a remedy description including installations and movements.
     
     Args:
-        attacher_data (list): List of attacher data dictionaries
+        attacher_data (list): List of attacher data dictionaries (heights in inches)
         is_underground (bool): Whether this is for an underground connection
         
     Returns:
@@ -78,7 +90,7 @@ def generate_remedy_description(attacher_data, is_underground=False):
     for attacher in attacher_data:
         if attacher.get('is_proposed'):
             company = attacher['name'].split()[0]
-            height = attacher.get('proposed_height') or attacher.get('existing_height') or ""
+            height = _height_text(attacher)
             
             install_line = f"Install proposed {attacher['name']} at {height}" if height else f"Install proposed {attacher['name']}"
             install_lines.append(install_line)
@@ -91,7 +103,7 @@ def generate_remedy_description(attacher_data, is_underground=False):
     if not install_lines and attacher_data:
         attacher = attacher_data[0]
         company = attacher['name'].split()[0]
-        height = attacher.get('proposed_height') or attacher.get('existing_height') or ""
+        height = _height_text(attacher)
         
         install_lines.append(f"Install proposed {attacher['name']} at {height}" if height else f"Install proposed {attacher['name']}")
         
@@ -1,53 +1,24 @@
 """
 Functions for processing node-related data from Katapult JSON.
 """
-import math
 import logging
-from .height_utils import format_height_feet_inches
-from .utils import calculate_bearing
-from .photo_data_utils import get_photofirst_data, get_utility_company_names
+from .height_utils import format_height_feet_inches, get_pole_wire_table
+from .connection_processing import get_span_profile
+from .job_index import JobIndex, as_job_index
+from .geometry import get_job_geometry
+from .instrumentation import timed
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def get_neutral_wire_height(job_data, node_id):
+def get_neutral_wire_height(job_index, node_id):
     """Find the height of the neutral wire for a given node"""
-    node_data = job_data.get("nodes", {}).get(node_id, {})
-    node_photos_dict = node_data.get("photos", {})
-    main_photo_id = next((pid for pid, p_entry in node_photos_dict.items() if p_entry.get("association") == "main"), None)
-    
-    utility_company_names = get_utility_company_names()
+    job_index = as_job_index(job_index)
+    main_photo_id = job_index.node_main_photo_id(node_id)
     
     if main_photo_id:
-        main_photo_entry = node_photos_dict.get(main_photo_id, {})
-        photofirst_data = get_photofirst_data(main_photo_id, main_photo_entry, job_data)
-        trace_data = job_data.get("traces", {}).get("trace_data", {})
-        
-        neutral_heights = []
-        
-        for wire_key, wire in photofirst_data.get("wire", {}).items():
-            trace_id = wire.get("_trace")
-            if trace_id and trace_id in trace_data:
-                trace_info = trace_data[trace_id]
-                company = trace_info.get("company", "").strip()
-                cable_type = trace_info.get("cable_type", "").strip()
-                
-                # Use flexible matching for utility company and neutral wire
-                is_utility = any(company.upper() == util_name.upper() for util_name in utility_company_names)
-                is_neutral = cable_type.upper() == "NEUTRAL"
-                
-                if is_utility and is_neutral:
-                    measured_height = wire.get("_measured_height")
-                    if measured_height is not None:
-                        try:
-                            if isinstance(measured_height, str):
-                                measured_height = float(measured_height)
-                            neutral_height = float(measured_height)
-                            neutral_heights.append(neutral_height)
-                            logger.debug(f"Found neutral wire for company '{company}' at height {neutral_height}")
-                        except (ValueError, TypeError) as e:
-                            logger.debug(f"Error parsing neutral wire height: {str(e)}")
-                            continue
+        # Utility neutral wires of the main photo, read from the pole's wire table
+        neutral_heights = get_pole_wire_table(job_index, node_id).main_photo_neutral_heights
     
         # Return the lowest neutral height if any found
         if neutral_heights:
@@ -64,18 +35,15 @@ def get_neutral_wire_height(job_data, node_id):
     return None
 
 
-def get_attachers_from_node_trace(job_data, node_id): # This function seems more about trace logic than direct photo access pattern change
+def get_attachers_from_node_trace(job_index, node_id): # This function seems more about trace logic than direct photo access pattern change
     """Extract attachers from node trace data"""
     attachers = {}
-    node_data = job_data.get("nodes", {}).get(node_id, {}) # Renamed node_info to node_data
-    node_photos_dict = node_data.get("photos", {}) # Renamed photo_ids
-    main_photo_id = next((pid for pid, p_entry in node_photos_dict.items() if p_entry.get("association") == "main"), None)
-    if not main_photo_id:
+    job_index = as_job_index(job_index)
+    if not job_index.node_main_photo_id(node_id):
         return {}
     
-    main_photo_entry = node_photos_dict.get(main_photo_id, {})
-    photofirst_data = get_photofirst_data(main_photo_id, main_photo_entry, job_data)
-    trace_data = job_data.get("traces", {}).get("trace_data", {})
+    photofirst_data = job_index.node_main_photofirst_data(node_id)
+    trace_data = job_index.trace_data
     
     # First pass: collect all power wires to find the lowest one
     power_wires = {}
@@ -126,17 +94,14 @@ def get_attachers_from_node_trace(job_data, node_id): # This function seems more
     return attachers
 
 
-def get_heights_for_node_trace_attachers(job_data, node_id, attacher_trace_map):
+def get_heights_for_node_trace_attachers(job_index, node_id, attacher_trace_map):
     """Get attachment heights for a specific node's attachers"""
     heights = {}
-    node_data = job_data.get("nodes", {}).get(node_id, {})
-    node_photos_dict = node_data.get("photos", {})
-    main_photo_id = next((pid for pid, p_entry in node_photos_dict.items() if p_entry.get("association") == "main"), None)
-    if not main_photo_id:
+    job_index = as_job_index(job_index)
+    if not job_index.node_main_photo_id(node_id):
         return heights
     
-    main_photo_entry = node_photos_dict.get(main_photo_id, {})
-    photofirst_data = get_photofirst_data(main_photo_id, main_photo_entry, job_data)
+    photofirst_data = job_index.node_main_photofirst_data(node_id)
     
     all_sections = {**photofirst_data.get("wire", {}), **photofirst_data.get("equipment", {}), **photofirst_data.get("guying", {})}
     for attacher_name, trace_id in attacher_trace_map.items():
@@ -159,39 +124,48 @@ def get_heights_for_node_trace_attachers(job_data, node_id, attacher_trace_map):
     return heights
 
 
-def get_attachers_for_node(job_data, node_id):
-    """Get all attachers for a node including guying and drip loops"""
+def get_attachers_for_node(job_index, node_id):
+    """
+    Get all attachers for a node including guying and drip loops.
+    
+    When called with a JobIndex the result is computed once per node and then
+    served from the index's attachers_memo, so the returned dict is shared
+    between callers and must not be modified.
+    """
+    if not isinstance(job_index, JobIndex):
+        return _compute_attachers_for_node(as_job_index(job_index), node_id)
+    return job_index.attachers_memo.get_or_compute(
+        node_id, lambda: _compute_attachers_for_node(job_index, node_id))
+
+
+@timed("compute_attachers_for_node")
+def _compute_attachers_for_node(job_index, node_id):
+    """Build the main, reference span and backspan attacher data for a node (uncached)."""
     main_attacher_data = []
-    neutral_height = get_neutral_wire_height(job_data, node_id)
-    node_data = job_data.get("nodes", {}).get(node_id, {})
-    node_photos_dict = node_data.get("photos", {})
-    main_photo_id = next((pid for pid, p_entry in node_photos_dict.items() if p_entry.get("association") == "main"), None)
+    neutral_height = get_neutral_wire_height(job_index, node_id)
+    main_photo_id = job_index.node_main_photo_id(node_id)
     
     if main_photo_id:
-        main_photo_entry = node_photos_dict.get(main_photo_id, {})
-        # Use enhanced photofirst_data extraction
-        photofirst_data = get_photofirst_data(main_photo_id, main_photo_entry, job_data)
-        trace_data = job_data.get("traces", {}).get("trace_data", {})
+        # Use enhanced photofirst_data extraction (resolved once per job by the index)
+        photofirst_data = job_index.node_main_photofirst_data(node_id)
         
         # Process wire attachments
         for wire_key, wire in photofirst_data.get("wire", {}).items():
             trace_id = wire.get("_trace")
-            if trace_id and trace_id in trace_data:
-                trace_info = trace_data[trace_id]
-                company = trace_info.get("company", "").strip()
-                cable_type = trace_info.get("cable_type", "").strip()
-                
+            trace = job_index.trace_class(trace_id) if trace_id else None
+            if trace is not None:
                 # Skip primary wires
-                if cable_type.upper() == "PRIMARY":
+                if trace.is_primary:
                     continue
                     
                 measured_height = wire.get("_measured_height")
                 mr_move = wire.get("mr_move")
                 
-                if company and cable_type:
-                    attacher_name = f"{company} {cable_type}"
-                    existing_height = ""
-                    proposed_height = ""
+                if trace.company and trace.cable_type:
+                    attacher_name = trace.attacher_name
+                    # Heights stay in inches; they are formatted by the report writers
+                    existing_height = None
+                    proposed_height = None
                     raw_height = None
                     
                     if measured_height is not None:
@@ -200,7 +174,7 @@ def get_attachers_for_node(job_data, node_id):
                                 measured_height = float(measured_height)
                             measured_height_float = float(measured_height)
                             raw_height = measured_height_float
-                            existing_height = format_height_feet_inches(measured_height_float)
+                            existing_height = measured_height_float
                             logger.debug(f"Node {node_id}: Found wire attacher '{attacher_name}' with height {existing_height}")
                             
                             # Process any make-ready moves
@@ -209,37 +183,36 @@ def get_attachers_for_node(job_data, node_id):
                                     if isinstance(mr_move, str):
                                         mr_move = float(mr_move)
                                     mr_move_float = float(mr_move)
-                                    proposed_height_value = measured_height_float + mr_move_float
-                                    proposed_height = format_height_feet_inches(proposed_height_value)
+                                    proposed_height = measured_height_float + mr_move_float
                                     logger.debug(f"Node {node_id}: Attacher '{attacher_name}' has move {mr_move_float}, proposed height {proposed_height}")
                                 except (ValueError, TypeError) as e:
                                     logger.debug(f"Node {node_id}: Error processing mr_move for '{attacher_name}': {str(e)}")
-                                    proposed_height = "" # Keep existing if mr_move is invalid
+                                    proposed_height = None # Keep existing if mr_move is invalid
                         except (ValueError, TypeError) as e:
                             logger.debug(f"Node {node_id}: Error processing measured_height for '{attacher_name}': {str(e)}")
-                            existing_height = ""
-                            proposed_height = ""
+                            existing_height = None
+                            proposed_height = None
                             raw_height = 0.0 # Default to 0 if parsing fails
                     
                     main_attacher_data.append({
                         'name': attacher_name,
+                        'company': trace.company,
+                        'cable_type': trace.cable_type,
                         'existing_height': existing_height,
                         'proposed_height': proposed_height,
                         'raw_height': raw_height if raw_height is not None else 0.0,
-                        'is_proposed': trace_info.get("proposed", False)
+                        'is_proposed': trace.proposed
                     })
         
         # Process guy wires
         for guy_key, guy in photofirst_data.get("guying", {}).items():
             trace_id = guy.get("_trace")
-            if trace_id and trace_id in trace_data:
-                trace_info = trace_data[trace_id]
-                company = trace_info.get("company", "").strip()
-                cable_type = trace_info.get("cable_type", "").strip()
+            trace = job_index.trace_class(trace_id) if trace_id else None
+            if trace is not None:
                 measured_height = guy.get("_measured_height")
                 mr_move = guy.get("mr_move")
                 
-                if company and cable_type:
+                if trace.company and trace.cable_type:
                     is_down_guy = False
                     raw_height_guy = None
                     if measured_height is not None and neutral_height is not None:
@@ -250,36 +223,37 @@ def get_attachers_for_node(job_data, node_id):
                             raw_height_guy = guy_height_float
                             if guy_height_float < neutral_height:
                                 is_down_guy = True
-                                logger.debug(f"Node {node_id}: Found down guy for '{company} {cable_type}' at height {guy_height_float}")
+                                logger.debug(f"Node {node_id}: Found down guy for '{trace.attacher_name}' at height {guy_height_float}")
                         except (ValueError, TypeError) as e:
                             logger.debug(f"Node {node_id}: Error processing guy measured_height: {str(e)}")
                             pass # Keep is_down_guy as False
                     
                     if is_down_guy:
-                        attacher_name = f"{company} {cable_type} (Down Guy)"
-                        existing_height = ""
-                        proposed_height = ""
+                        attacher_name = f"{trace.attacher_name} (Down Guy)"
+                        existing_height = raw_height_guy
+                        proposed_height = None
                         
                         if raw_height_guy is not None:
-                            existing_height = format_height_feet_inches(raw_height_guy)
                             if mr_move is not None:
                                 try:
                                     if isinstance(mr_move, str):
                                         mr_move = float(mr_move)
                                     mr_move_float = float(mr_move)
-                                    proposed_height_value = raw_height_guy + mr_move_float
-                                    proposed_height = format_height_feet_inches(proposed_height_value)
+                                    proposed_height = raw_height_guy + mr_move_float
                                     logger.debug(f"Node {node_id}: Down guy '{attacher_name}' has move {mr_move_float}, proposed height {proposed_height}")
                                 except (ValueError, TypeError) as e:
                                     logger.debug(f"Node {node_id}: Error processing guy mr_move: {str(e)}")
-                                    proposed_height = ""
+                                    proposed_height = None
                         
                         main_attacher_data.append({
                             'name': attacher_name,
+                            'company': trace.company,
+                            'cable_type': trace.cable_type,
                             'existing_height': existing_height,
                             'proposed_height': proposed_height,
                             'raw_height': raw_height_guy if raw_height_guy is not None else 0.0,
-                            'is_proposed': trace_info.get("proposed", False)
+                            'is_proposed': trace.proposed,
+                            'is_down_guy': True
                         })
     
     # Sort attachers by height (highest to lowest)
@@ -289,8 +263,8 @@ def get_attachers_for_node(job_data, node_id):
         logger.debug(f"Node {node_id}: No attachers found")
     
     # Get reference and backspan data
-    reference_spans = get_reference_attachers(job_data, node_id)
-    backspan_data, backspan_bearing = get_backspan_attachers(job_data, node_id)
+    reference_spans = get_reference_attachers(job_index, node_id)
+    backspan_data, backspan_bearing = get_backspan_attachers(job_index, node_id)
     
     return {
         'main_attachers': main_attacher_data,
@@ -302,102 +276,83 @@ def get_attachers_for_node(job_data, node_id):
     }
 
 
-def get_reference_attachers(job_data, node_id):
+def get_reference_attachers(job_index, node_id):
     """Find reference span attachers by finding connections where node_id matches either node_id_1 or node_id_2"""
     reference_info = []
-    neutral_height = get_neutral_wire_height(job_data, node_id)
+    job_index = as_job_index(job_index)
+    neutral_height = get_neutral_wire_height(job_index, node_id)
     
-    for conn_id, conn_data in job_data.get("connections", {}).items():
+    for conn_id, conn_data in job_index.connections_for_node(node_id):
         connection_type = conn_data.get("attributes", {}).get("connection_type", {})
         connection_type_value = next(iter(connection_type.values()), "") if isinstance(connection_type, dict) else connection_type.get("button_added", "")
         
-        if "reference" in str(connection_type_value).lower() and \
-           (conn_data.get("node_id_1") == node_id or conn_data.get("node_id_2") == node_id):
+        if "reference" in str(connection_type_value).lower():
             bearing_str = ""
             sections = conn_data.get("sections", {})
             if sections:
                 section_ids = list(sections.keys())
                 mid_section_id = section_ids[len(section_ids) // 2]
-                mid_section_entry = sections[mid_section_id] # Renamed mid_section to mid_section_entry
-                lat, lon = mid_section_entry.get("latitude"), mid_section_entry.get("longitude")
                 
-                if lat and lon:
-                    from_node_data = job_data.get("nodes", {}).get(node_id, {}) # Renamed from_node
-                    from_node_photos_dict = from_node_data.get("photos", {}) # Renamed from_photos
-                    if from_node_photos_dict:
-                        main_photo_id_from = next((pid for pid, p_entry in from_node_photos_dict.items() if p_entry.get("association") == "main"), None)
-                        if main_photo_id_from:
-                            # This photo_data_from is for bearing calculation, not photofirst_data directly
-                            photo_data_from = job_data.get("photos", {}).get(main_photo_id_from, {}) # Keep old lookup for lat/lon if it's there
-                            if not photo_data_from: # Fallback if not in top-level photos
-                                photo_data_from = from_node_photos_dict.get(main_photo_id_from, {})
-
-                            if photo_data_from and "latitude" in photo_data_from and "longitude" in photo_data_from:
-                                from_lat, from_lon = photo_data_from["latitude"], photo_data_from["longitude"]
-                                degrees, cardinal = calculate_bearing(from_lat, from_lon, lat, lon)
-                                bearing_str = f"{cardinal} ({int(degrees)}°)"
+                # Bearing from the pole to the span midpoint (computed for the whole job at once)
+                bearing = get_job_geometry(job_index).bearing(node_id, conn_id)
+                if bearing:
+                    degrees, cardinal = bearing
+                    bearing_str = f"{cardinal} ({int(degrees)}°)"
                 
-                section_photos_dict = mid_section_entry.get("photos", {}) # Renamed photos_mid
-                main_photo_id_mid = next((pid for pid, p_entry in section_photos_dict.items() if p_entry.get("association") == "main"), None)
+                main_photo_id_mid = job_index.section_main_photo_id(conn_id, mid_section_id)
                 if main_photo_id_mid:
-                    main_photo_entry_mid = section_photos_dict.get(main_photo_id_mid, {})
-                    photofirst_data_mid = get_photofirst_data(main_photo_id_mid, main_photo_entry_mid, job_data)
+                    photofirst_data_mid = job_index.section_main_photofirst_data(conn_id, mid_section_id)
                     
                     if not photofirst_data_mid: continue # Skip if no photofirst_data
                     
                     span_data = []
-                    trace_data = job_data.get("traces", {}).get("trace_data", {})
                     
-                    for wire_key, wire in photofirst_data_mid.get("wire", {}).items():
-                        trace_id = wire.get("_trace")
-                        if not trace_id or trace_id not in trace_data: continue
-                        trace_info = trace_data[trace_id]
-                        company, cable_type = trace_info.get("company", "").strip(), trace_info.get("cable_type", "").strip()
-                        if cable_type.lower() == "primary": continue
+                    # Wires of the mid section come from the span profile shared with the midspan lookups
+                    span_profile = get_span_profile(job_index, conn_id)
+                    for span_wire in span_profile.section_wires.get(mid_section_id, ()):
+                        trace = span_wire.trace
+                        if trace.is_primary: continue
                         
-                        measured_height = wire.get("_measured_height")
+                        wire = span_wire.annotation
+                        measured_height_float = span_wire.height
                         mr_move = wire.get("mr_move", 0)
                         effective_moves = wire.get("_effective_moves", {})
                         
-                        if company and cable_type and measured_height is not None:
+                        if trace.company and trace.cable_type and measured_height_float is not None:
                             try:
-                                measured_height_float = float(measured_height)
-                                attacher_name = f"{company} {cable_type}"
-                                existing_height = format_height_feet_inches(measured_height_float)
-                                proposed_height = ""
+                                attacher_name = trace.attacher_name
+                                existing_height = measured_height_float
+                                proposed_height = None
                                 total_move = float(mr_move) if mr_move else 0.0
                                 for move_val in (effective_moves or {}).values(): # Ensure effective_moves is not None
                                     try: total_move += float(move_val)
                                     except (ValueError, TypeError): continue
                                 if abs(total_move) > 0.001: # Check for significant move
-                                    proposed_height_value = measured_height_float + total_move
-                                    proposed_height = format_height_feet_inches(proposed_height_value)
+                                    proposed_height = measured_height_float + total_move
                                 span_data.append({'name': attacher_name, 'existing_height': existing_height, 'proposed_height': proposed_height, 'raw_height': measured_height_float, 'is_reference': True})
                             except (ValueError, TypeError): continue
                     
                     for guy_key, guy in photofirst_data_mid.get("guying", {}).items():
                         trace_id = guy.get("_trace")
-                        if not trace_id or trace_id not in trace_data: continue
-                        trace_info = trace_data[trace_id]
-                        company, cable_type = trace_info.get("company", "").strip(), trace_info.get("cable_type", "").strip()
+                        trace = job_index.trace_class(trace_id) if trace_id else None
+                        if trace is None: continue
                         measured_height = guy.get("_measured_height")
                         mr_move = guy.get("mr_move", 0)
                         effective_moves = guy.get("_effective_moves", {})
                         
-                        if company and cable_type and measured_height is not None and neutral_height is not None:
+                        if trace.company and trace.cable_type and measured_height is not None and neutral_height is not None:
                             try:
                                 guy_height_float = float(measured_height)
                                 if guy_height_float < neutral_height:
-                                    attacher_name = f"{company} {cable_type} (Down Guy)"
-                                    existing_height = format_height_feet_inches(guy_height_float)
-                                    proposed_height = ""
+                                    attacher_name = f"{trace.attacher_name} (Down Guy)"
+                                    existing_height = guy_height_float
+                                    proposed_height = None
                                     total_move = float(mr_move) if mr_move else 0.0
                                     for move_val in (effective_moves or {}).values(): # Ensure effective_moves is not None
                                         try: total_move += float(move_val)
                                         except (ValueError, TypeError): continue
                                     if abs(total_move) > 0.001: # Check for significant move
-                                        proposed_height_value = guy_height_float + total_move
-                                        proposed_height = format_height_feet_inches(proposed_height_value)
+                                        proposed_height = guy_height_float + total_move
                                     span_data.append({'name': attacher_name, 'existing_height': existing_height, 'proposed_height': proposed_height, 'raw_height': guy_height_float, 'is_reference': True})
                             except (ValueError, TypeError): continue
                     
@@ -407,12 +362,12 @@ def get_reference_attachers(job_data, node_id):
     return reference_info
 
 
-def get_backspan_attachers(job_data, node_id):
+def get_backspan_attachers(job_index, node_id):
     """
     Get backspan attachers information for a node.
     
     Args:
-        job_data (dict): The Katapult JSON data
+        job_index (JobIndex): Index over the Katapult JSON data (a raw job dict is also accepted)
         node_id (str): The node ID to find backspan attachers for
         
     Returns:
@@ -421,153 +376,48 @@ def get_backspan_attachers(job_data, node_id):
     backspan_data = []
     bearing_str = ""
     
-    neutral_height = get_neutral_wire_height(job_data, node_id)
-    
-    # Determine what connections could be considered "backspan"
-    node_data = job_data.get("nodes", {}).get(node_id, {}) # Get node_data once
-    node_photos_dict = node_data.get("photos", {})
-    node_lat, node_lon = None, None
-    
-    # Get node location
-    main_photo_id_node = next((pid for pid, p_entry in node_photos_dict.items() 
-                         if p_entry.get("association") == "main"), None)
-    if main_photo_id_node:
-        # This photo_data is for node's lat/lon, not photofirst_data directly
-        photo_data_node = job_data.get("photos", {}).get(main_photo_id_node, {}) # Keep old lookup for lat/lon
-        if not photo_data_node: # Fallback if not in top-level photos
-            photo_data_node = node_photos_dict.get(main_photo_id_node, {})
-
-        if photo_data_node:
-            node_lat, node_lon = photo_data_node.get("latitude"), photo_data_node.get("longitude")
-    
-    if not node_lat or not node_lon:
-        return backspan_data, bearing_str
-    
-    # Find connections that match criteria for backspan
-    potential_backspans = []
-    
-    for conn_id, conn_data in job_data.get("connections", {}).items():
-        # Skip if this isn't a connection from our node
-        if conn_data.get("node_id_1") != node_id and conn_data.get("node_id_2") != node_id:
-            continue
-            
-        # Skip certain connection types that can't be backspans
-        conn_button = conn_data.get("button", "").lower()
-        if conn_button in ["anchor", "ug_poly_path"]:  # Skip anchors and underground connections
-            continue
-            
-        # Get the other node in this connection
-        other_node_id = conn_data.get("node_id_2") if conn_data.get("node_id_1") == node_id else conn_data.get("node_id_1")
-        if not other_node_id or other_node_id not in job_data.get("nodes", {}):
-            continue
-            
-        # Check if this connection is marked as a backspan in attributes
-        is_backspan = False
-        connection_type = conn_data.get("attributes", {}).get("connection_type", {})
-        
-        if isinstance(connection_type, dict):
-            for type_val in connection_type.values():
-                if isinstance(type_val, str) and "back" in type_val.lower():
-                    is_backspan = True
-                    break
-        elif isinstance(connection_type, str) and "back" in connection_type.lower():
-            is_backspan = True
-            
-        # Find midpoint section to calculate bearing
-        sections = conn_data.get("sections", {})
-        mid_section_id = None
-        mid_lat, mid_lon = None, None
-        
-        if sections:
-            section_ids = list(sections.keys())
-            # Use the middle section for most accurate midpoint
-            mid_section_id = section_ids[len(section_ids) // 2]
-            mid_section_entry = sections[mid_section_id] # Renamed mid_section
-            mid_lat, mid_lon = mid_section_entry.get("latitude"), mid_section_entry.get("longitude")
-            
-        if mid_lat and mid_lon:
-            # Calculate bearing from our node to the midpoint
-            bearing_tuple = calculate_bearing(node_lat, node_lon, mid_lat, mid_lon)
-            
-            # Add to potential backspans
-            potential_backspans.append({
-                'conn_id': conn_id,
-                'other_node_id': other_node_id,
-                'is_backspan_marked': is_backspan,
-                'bearing': bearing_tuple[0],  # Numeric bearing
-                'cardinal': bearing_tuple[1],  # Cardinal direction
-                'mid_section_id': mid_section_id
-            })
+    job_index = as_job_index(job_index)
+    neutral_height = get_neutral_wire_height(job_index, node_id)
     
-    # Choose the backspan based on priority:
-    # 1. Connection explicitly marked as a backspan
-    # 2. If no marked backspan, choose the one most directly behind the pole
-    
-    chosen_backspan = None
-    
-    # First try to find a connection explicitly marked as backspan
-    marked_backspans = [bs for bs in potential_backspans if bs['is_backspan_marked']]
-    if marked_backspans:
-        chosen_backspan = marked_backspans[0] # TODO: Could be multiple, pick one? For now, first.
-    elif potential_backspans:
-        all_bearings = [bs['bearing'] for bs in potential_backspans]
-        if not all_bearings: # Should not happen if potential_backspans is not empty
-            return backspan_data, bearing_str
-            
-        avg_sin = sum(math.sin(math.radians(b)) for b in all_bearings) / len(all_bearings)
-        avg_cos = sum(math.cos(math.radians(b)) for b in all_bearings) / len(all_bearings)
-        avg_bearing = (math.degrees(math.atan2(avg_sin, avg_cos)) + 360) % 360
-        
-        chosen_backspan = min(potential_backspans, 
-                              key=lambda bs: abs(((bs['bearing'] - avg_bearing + 180) % 360) - 180))
+    # The backspan is chosen for every pole of the job at once: a connection marked
+    # as a backspan, otherwise the one closest to the mean bearing of the pole's spans
+    chosen_backspan = get_job_geometry(job_index).backspan(node_id)
     
     # If we found a backspan, extract the attachment data
     if chosen_backspan:
         bearing_str = f"{chosen_backspan['cardinal']} ({int(chosen_backspan['bearing'])}°)"
         
-        conn_data = job_data.get("connections", {}).get(chosen_backspan['conn_id'], {})
-        sections = conn_data.get("sections", {})
+        chosen_conn_id = chosen_backspan['conn_id']
+        sections = job_index.connection(chosen_conn_id).get("sections", {})
         mid_section_id = chosen_backspan['mid_section_id']
         
         if sections and mid_section_id and mid_section_id in sections:
-            mid_section_entry = sections[mid_section_id] # Renamed mid_section
-            section_photos_dict = mid_section_entry.get("photos", {}) # Renamed photos
-            main_photo_id_mid = next((pid for pid, p_entry in section_photos_dict.items() 
-                                 if p_entry.get("association") == "main"), None)
+            main_photo_id_mid = job_index.section_main_photo_id(chosen_conn_id, mid_section_id)
             
             if main_photo_id_mid:
-                main_photo_entry_mid = section_photos_dict.get(main_photo_id_mid, {})
-                photofirst_data = get_photofirst_data(main_photo_id_mid, main_photo_entry_mid, job_data)
+                photofirst_data = job_index.section_main_photofirst_data(chosen_conn_id, mid_section_id)
                 
                 if not photofirst_data: 
                     return backspan_data, bearing_str # No photofirst_data to process
                 
-                trace_data = job_data.get("traces", {}).get("trace_data", {})
-                
-                # Extract wire attachments
-                for wire_key, wire in photofirst_data.get("wire", {}).items():
-                    trace_id = wire.get("_trace")
-                    if not trace_id or trace_id not in trace_data: 
-                        continue
-                        
-                    trace_info = trace_data[trace_id]
-                    company = trace_info.get("company", "").strip()
-                    cable_type = trace_info.get("cable_type", "").strip()
+                # Extract wire attachments (the mid section's wires come from the span profile)
+                for span_wire in get_span_profile(job_index, chosen_conn_id).section_wires.get(mid_section_id, ()):
+                    trace = span_wire.trace
                     
                     # Skip primary
-                    if cable_type.lower() == "primary":
+                    if trace.is_primary:
                         continue
                     
-                    measured_height = wire.get("_measured_height")
+                    wire = span_wire.annotation
+                    measured_height_float = span_wire.height
                     mr_move = wire.get("mr_move", 0)
                     effective_moves = wire.get("_effective_moves", {})
                     
-                    if company and cable_type and measured_height is not None:
+                    if trace.company and trace.cable_type and measured_height_float is not None:
                         try:
-                            measured_height_float = float(measured_height)
-                            attacher_name = f"{company} {cable_type}"
-                            existing_height = format_height_feet_inches(measured_height_float)
-                            proposed_height = ""
+                            attacher_name = trace.attacher_name
+                            existing_height = measured_height_float
+                            proposed_height = None
                             
                             # Calculate total movement from MR moves and effective moves
                             total_move = float(mr_move) if mr_move else 0.0 # Ensure mr_move is float
@@ -580,8 +430,7 @@ def get_backspan_attachers(job_data, node_id):
                             
                             # If there's a significant move, calculate proposed height
                             if abs(total_move) > 0.001:
-                                proposed_height_value = measured_height_float + total_move
-                                proposed_height = format_height_feet_inches(proposed_height_value)
+                                proposed_height = measured_height_float + total_move
                                 
                             backspan_data.append({
                                 'name': attacher_name,
@@ -596,24 +445,22 @@ def get_backspan_attachers(job_data, node_id):
                 # Extract guy attachments
                 for guy_key, guy in photofirst_data.get("guying", {}).items():
                     trace_id = guy.get("_trace")
-                    if not trace_id or trace_id not in trace_data:
+                    trace = job_index.trace_class(trace_id) if trace_id else None
+                    if trace is None:
                         continue
                         
-                    trace_info = trace_data[trace_id]
-                    company = trace_info.get("company", "").strip()
-                    cable_type = trace_info.get("cable_type", "").strip()
                     measured_height = guy.get("_measured_height")
                     mr_move = guy.get("mr_move", 0)
                     effective_moves = guy.get("_effective_moves", {})
                     
                     # Only include down guys (below neutral)
-                    if company and cable_type and measured_height is not None and neutral_height is not None:
+                    if trace.company and trace.cable_type and measured_height is not None and neutral_height is not None:
                         try:
                             guy_height_float = float(measured_height)
                             if guy_height_float < neutral_height:  # It's a down guy
-                                attacher_name = f"{company} {cable_type} (Down Guy)"
-                                existing_height = format_height_feet_inches(guy_height_float)
-                                proposed_height = ""
+                                attacher_name = f"{trace.attacher_name} (Down Guy)"
+                                existing_height = guy_height_float
+                                proposed_height = None
                                 
                                 # Calculate total movement
                                 total_move = float(mr_move) if mr_move else 0.0 # Ensure mr_move is float
@@ -626,8 +473,7 @@ def get_backspan_attachers(job_data, node_id):
                                 
                                 # If there's a significant move, calculate proposed height
                                 if abs(total_move) > 0.001:
-                                    proposed_height_value = guy_height_float + total_move
-                                    proposed_height = format_height_feet_inches(proposed_height_value)
+                                    proposed_height = guy_height_float + total_move
                                 
                                 backspan_data.append({
                                     'name': attacher_name,
@@ -3,75 +3,228 @@ Utilities for extracting photo-related data, especially photofirst_data,
 from Katapult JSON structures, handling various potential paths.
 """
 import logging
+from .instrumentation import timed
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def get_photofirst_data(photo_id, photo_entry_data, job_data):
-    """
-    Retrieves photofirst_data for a given photo_id, checking multiple common paths.
-
-    Args:
-        photo_id (str): The ID of the photo.
-        photo_entry_data (dict): The photo entry data, typically from a node's or section's 'photos' dictionary.
-                                 Example: node_data.get('photos', {}).get(photo_id, {})
-        job_data (dict): The full Katapult job data.
+def _from_photo_entry(photo_id, photo_entry_data, job_data):
+    # photofirst_data nested directly in the provided photo_entry_data
+    if photo_entry_data:
+        return photo_entry_data.get("photofirst_data")
+    return None
 
-    Returns:
-        dict: The photofirst_data dictionary, or an empty dictionary if not found.
-    """
-    photofirst_data = None
-    
-    # For debugging
-    search_paths = []
 
-    # Attempt 1: photofirst_data nested directly in the provided photo_entry_data
-    if photo_entry_data:
-        search_paths.append("photo_entry_data.photofirst_data")
-        photofirst_data = photo_entry_data.get("photofirst_data")
+def _from_photo_summary(photo_id, photo_entry_data, job_data):
+    # photofirst_data in top-level job_data["photo_summary"]
+    if photo_id and job_data.get("photo_summary"):
+        return job_data.get("photo_summary", {}).get(photo_id, {}).get("photofirst_data")
+    return None
 
-    # Attempt 2: photofirst_data in top-level job_data["photo_summary"]
-    if not photofirst_data and photo_id and job_data.get("photo_summary"):
-        search_paths.append("job_data.photo_summary[photo_id].photofirst_data")
-        photofirst_data = job_data.get("photo_summary", {}).get(photo_id, {}).get("photofirst_data")
 
-    # Attempt 3: photofirst_data in top-level job_data["photos"]
-    if not photofirst_data and photo_id and job_data.get("photos"):
-        search_paths.append("job_data.photos[photo_id].photofirst_data")
+def _from_top_level_photo(photo_id, photo_entry_data, job_data):
+    # photofirst_data in top-level job_data["photos"]
+    if photo_id and job_data.get("photos"):
         top_level_photo_data = job_data.get("photos", {}).get(photo_id, {})
         if isinstance(top_level_photo_data, dict) and "photofirst_data" in top_level_photo_data:
-             photofirst_data = top_level_photo_data.get("photofirst_data")
+            return top_level_photo_data.get("photofirst_data")
+    return None
 
-    # Attempt 4: Look in job_data.photos[photo_id].data.photofirst_data (alternative structure)
-    if not photofirst_data and photo_id and job_data.get("photos"):
-        search_paths.append("job_data.photos[photo_id].data.photofirst_data")
+
+def _from_top_level_photo_data(photo_id, photo_entry_data, job_data):
+    # job_data.photos[photo_id].data.photofirst_data (alternative structure)
+    if photo_id and job_data.get("photos"):
         top_level_photo = job_data.get("photos", {}).get(photo_id, {})
         if isinstance(top_level_photo, dict) and "data" in top_level_photo:
-            photofirst_data = top_level_photo.get("data", {}).get("photofirst_data")
+            return top_level_photo.get("data", {}).get("photofirst_data")
+    return None
+
 
-    # Attempt 5: Look in job_data.nodes[node_id].properties.photos[photo_id].photofirst_data
-    # Only applicable if node_id is retrievable from the context
+def _from_node_properties(photo_id, photo_entry_data, job_data):
+    # job_data.nodes[node_id].properties.photos[photo_id].photofirst_data
+    # Only applicable if node_id is retrievable from the photo entry
     node_id = None
     if photo_entry_data and "node_id" in photo_entry_data:
         node_id = photo_entry_data.get("node_id")
-    
-    if not photofirst_data and node_id and photo_id:
-        search_paths.append(f"job_data.nodes[{node_id}].properties.photos[{photo_id}].photofirst_data")
+    if node_id and photo_id:
         node_properties = job_data.get("nodes", {}).get(node_id, {}).get("properties", {})
         node_photos = node_properties.get("photos", {})
         if photo_id in node_photos:
-            photofirst_data = node_photos.get(photo_id, {}).get("photofirst_data")
+            return node_photos.get(photo_id, {}).get("photofirst_data")
+    return None
+
 
+# Lookup paths in order of precedence: the first one holding photofirst_data wins
+PHOTOFIRST_PATHS = (
+    ("photo_entry", _from_photo_entry),
+    ("photo_summary", _from_photo_summary),
+    ("photos", _from_top_level_photo),
+    ("photos.data", _from_top_level_photo_data),
+    ("node_properties", _from_node_properties),
+)
+
+
+def _checked_photofirst_data(photo_id, photofirst_data, search_paths):
+    """Return photofirst_data if it is a non-empty dict, logging why not otherwise."""
     if not photofirst_data:
         logger.debug(f"Could not find photofirst_data for photo_id={photo_id}. Searched paths: {', '.join(search_paths)}")
         return {}
-    
+
     if not isinstance(photofirst_data, dict):
         logger.warning(f"Found photofirst_data for photo_id={photo_id} but it's not a dictionary: {type(photofirst_data)}")
         return {}
-        
+
     return photofirst_data
 
+
+@timed("get_photofirst_data")
+def get_photofirst_data(photo_id, photo_entry_data, job_data):
+    """
+    Retrieves photofirst_data for a given photo_id, checking multiple common paths.
+
+    Args:
+        photo_id (str): The ID of the photo.
+        photo_entry_data (dict): The photo entry data, typically from a node's or section's 'photos' dictionary.
+                                 Example: node_data.get('photos', {}).get(photo_id, {})
+        job_data (dict): The full Katapult job data.
+
+    Returns:
+        dict: The photofirst_data dictionary, or an empty dictionary if not found.
+    """
+    photofirst_data = None
+    search_paths = []
+    for path_name, lookup in PHOTOFIRST_PATHS:
+        search_paths.append(path_name)
+        photofirst_data = lookup(photo_id, photo_entry_data, job_data)
+        if photofirst_data:
+            break
+    return _checked_photofirst_data(photo_id, photofirst_data, search_paths)
+
+
+def _photo_entries(job_data):
+    """Yield every photo entry of the job's nodes and connection sections."""
+    for node_data in (job_data.get("nodes", {}) or {}).values():
+        yield from (node_data.get("photos", {}) or {}).values()
+    for conn_data in (job_data.get("connections", {}) or {}).values():
+        for section_data in (conn_data.get("sections", {}) or {}).values():
+            yield from (section_data.get("photos", {}) or {}).values()
+
+
+def detect_photofirst_paths(job_data):
+    """
+    Return the names of the PHOTOFIRST_PATHS that can hold data in this job.
+
+    A path is left out when the collection it reads is absent, e.g. no photo
+    entry carries inline photofirst_data or the job has no photo_summary.
+    """
+    entries = [entry for entry in _photo_entries(job_data) if isinstance(entry, dict)]
+    available = set()
+    if any("photofirst_data" in entry for entry in entries):
+        available.add("photo_entry")
+    if job_data.get("photo_summary"):
+        available.add("photo_summary")
+    if job_data.get("photos"):
+        available.update(("photos", "photos.data"))
+    if any("node_id" in entry for entry in entries):
+        available.add("node_properties")
+    return available
+
+
+class PhotofirstResolver:
+    """
+    Per-job resolution cache for photofirst_data.
+
+    Each photo id is resolved once; misses are cached too. Lookups skip paths
+    the job's layout cannot use (see detect_photofirst_paths) and try the path
+    that has resolved the most photos so far first. When that path hits, only
+    the usable paths of higher precedence are checked, so the result is always
+    the one get_photofirst_data would return.
+
+    Attributes:
+        hits (int): Lookups answered from the cache
+        misses (int): Lookups that had to be resolved
+        path_hits (dict): Path name -> number of photos resolved through it
+        not_found (int): Photos for which no path held photofirst_data
+    """
+
+    def __init__(self, job_data):
+        self.job_data = job_data or {}
+        available = detect_photofirst_paths(self.job_data)
+        self._paths = [(name, lookup) for name, lookup in PHOTOFIRST_PATHS if name in available]
+        self._cache = {}
+        self._preferred = None
+        self.hits = 0
+        self.misses = 0
+        self.not_found = 0
+        self.path_hits = {name: 0 for name, _ in PHOTOFIRST_PATHS}
+
+    @property
+    def preferred_path(self):
+        """Name of the path tried first, or None before anything was resolved."""
+        return self._paths[self._preferred][0] if self._preferred is not None else None
+
+    def resolve(self, photo_id, photo_entry_data):
+        """
+        Return the photofirst_data for photo_id, resolving it on first use.
+
+        Args:
+            photo_id (str): The ID of the photo
+            photo_entry_data (dict): The photo entry from a node's or section's 'photos' dictionary
+
+        Returns:
+            dict: The photofirst_data dictionary, or an empty dictionary if not found
+        """
+        if photo_id is not None and photo_id in self._cache:
+            self.hits += 1
+            return self._cache[photo_id]
+
+        self.misses += 1
+        position, photofirst_data = self._lookup(photo_id, photo_entry_data)
+        if position is None:
+            self.not_found += 1
+        else:
+            name = self._paths[position][0]
+            self.path_hits[name] += 1
+            if self._preferred is None or self.path_hits[name] > self.path_hits[self._paths[self._preferred][0]]:
+                self._preferred = position
+
+        result = _checked_photofirst_data(photo_id, photofirst_data, [name for name, _ in self._paths])
+        if photo_id is not None:
+            self._cache[photo_id] = result
+        return result
+
+    @timed("get_photofirst_data")
+    def _lookup(self, photo_id, photo_entry_data):
+        """Return (position in self._paths, value) of the first path holding data, or (None, None)."""
+        job_data = self.job_data
+        preferred = self._preferred
+        if preferred is not None:
+            photofirst_data = self._paths[preferred][1](photo_id, photo_entry_data, job_data)
+            if photofirst_data:
+                for position in range(preferred):
+                    earlier = self._paths[position][1](photo_id, photo_entry_data, job_data)
+                    if earlier:
+                        return position, earlier
+                return preferred, photofirst_data
+
+        for position, (name, lookup) in enumerate(self._paths):
+            if position == preferred:
+                continue
+            photofirst_data = lookup(photo_id, photo_entry_data, job_data)
+            if photofirst_data:
+                return position, photofirst_data
+        return None, None
+
+    def stats(self):
+        """Return {'hits', 'misses', 'not_found', 'preferred_path', 'path_hits'}."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_found": self.not_found,
+            "preferred_path": self.preferred_path,
+            "path_hits": dict(self.path_hits),
+        }
+
 def get_utility_company_names():
     """
     Returns a list of possible utility company names used in the Katapult data.
@@ -0,0 +1,253 @@
+"""
+Columnar tables of the extracted report data and the statistics computed from them.
+
+process_data builds one record per connection, each carrying the nested
+attacher dicts of its pole. build_report_tables flattens the records into
+three DataFrames:
+
+    poles        one row per pole (the first record of each node_id_1)
+    connections  one row per connection record
+    attachers    one row per main attacher of each pole
+
+Heights are float32 inches (NaN where not measured) and are only formatted as
+feet-inches by the writers (height_utils.format_heights); company, cable type
+and owner columns are categorical. The Excel writer and the report statistics read these tables
+instead of walking the records, so movement columns and counts are column
+operations rather than per-row Python loops.
+"""
+
+import logging
+import numbers
+from collections import namedtuple
+import pandas as pd
+
+from .node_processing import get_attachers_for_node
+from .connection_processing import get_lowest_height_values
+from .height_utils import get_pole_primary_neutral_values
+from .geometry import get_span_lengths
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The three tables of a report (see build_report_tables)
+ReportTables = namedtuple("ReportTables", "poles connections attachers")
+
+# Columns of the pole table (one row per pole, in job order)
+POLE_TABLE_COLUMNS = [
+    'node_id', 'connection_id', 'operation_number', 'attachment_action', 'pole_owner',
+    'pole_number', 'scid', 'pole_structure', 'proposed_riser', 'proposed_guy',
+    'pla_percentage', 'construction_grade', 'primary_height', 'neutral_height'
+]
+
+# Columns of the connection table (one row per connection record, in job order)
+CONNECTION_TABLE_COLUMNS = [
+    'connection_id', 'node_id_1', 'node_id_2', 'pole_tag_1', 'pole_tag_2', 'scid_1', 'scid_2',
+    'span_length', 'span_length_source', 'measured_span_length', 'span_length_flagged',
+    'connection_type', 'mr_status', 'latitude_1', 'longitude_1',
+    'latitude_2', 'longitude_2', 'lowest_com_height', 'lowest_cps_height',
+    'movement_summary', 'remedy_description'
+]
+
+# Columns of the attacher table (one row per main attacher of each pole, highest first)
+ATTACHER_TABLE_COLUMNS = [
+    'node_id', 'position', 'name', 'company', 'cable_type', 'existing_height', 'proposed_height',
+    'raw_height', 'is_proposed', 'is_down_guy', 'is_reference', 'is_backspan', 'move_inches'
+]
+
+# Height columns of each table (float32 inches)
+POLE_HEIGHT_COLUMNS = ['primary_height', 'neutral_height']
+CONNECTION_HEIGHT_COLUMNS = ['lowest_com_height', 'lowest_cps_height']
+ATTACHER_HEIGHT_COLUMNS = ['existing_height', 'proposed_height', 'raw_height', 'move_inches']
+
+# Label used in breakdowns for poles without an owner
+UNKNOWN_OWNER = "Unknown"
+
+
+def _number(value):
+    """A height (inches) or length (feet) as a float, NaN for missing or non-numeric values."""
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return float(value)
+    return float('nan')
+
+
+def _typed(table, height_columns, categorical_columns):
+    """Cast height columns to float32 and label columns to category; other text columns get "" for missing."""
+    for column in height_columns:
+        table[column] = table[column].astype('float32')
+    for column in table.columns:
+        if column not in height_columns and (table[column].dtype == object
+                                             or pd.api.types.is_string_dtype(table[column])):
+            table[column] = table[column].fillna("")
+    for column in categorical_columns:
+        table[column] = table[column].astype('category')
+    return table
+
+
+def _pole_row(record, job_index):
+    """Pole table row for the first record of a pole."""
+    node_id = record.get('node_id_1')
+    if 'primary_height' in record:
+        primary_height = record.get('primary_height')
+        neutral_height = record.get('neutral_height')
+    elif job_index is not None:
+        heights = get_pole_primary_neutral_values(node_id, job_index)
+        primary_height, neutral_height = heights['primary_height'], heights['neutral_height']
+    else:
+        primary_height = neutral_height = None
+    operation_number = record.get('operation_number')
+    if operation_number == "":
+        operation_number = None  # DataFrame records have missing values filled with ""
+    return (
+        node_id, record.get('connection_id'), operation_number,
+        record.get('attachment_action'), record.get('pole_owner'), record.get('pole_number'),
+        record.get('scid_1'), record.get('pole_structure'), record.get('proposed_riser'),
+        record.get('proposed_guy'), record.get('pla_percentage'), record.get('construction_grade'),
+        _number(primary_height), _number(neutral_height),
+    )
+
+
+def _connection_row(record, job_index):
+    """Connection table row for a record."""
+    lowest_com, lowest_cps = record.get('lowest_com_height'), record.get('lowest_cps_height')
+    if isinstance(lowest_com, str) or isinstance(lowest_cps, str):
+        # DataFrame records hold the formatted text; read the numbers from the job
+        lowest_com = lowest_cps = None
+        if job_index is not None and record.get('connection_id'):
+            lowest_com, lowest_cps = get_lowest_height_values(job_index, record['connection_id'])
+    span_length = record.get('span_length')
+    span_length_source = record.get('span_length_source', "")
+    measured_span_length = record.get('measured_span_length')
+    span_length_flagged = record.get('span_length_flagged', False)
+    if 'span_length_flagged' not in record and job_index is not None and record.get('connection_id'):
+        # DataFrame records only hold the span length; read the rest from the job
+        span_lengths = get_span_lengths(job_index)
+        span_length_source = span_lengths.span_length(record['connection_id'])[1]
+        measured_span_length = span_lengths.measured_length(record['connection_id'])
+        span_length_flagged = span_lengths.is_flagged(record['connection_id'])
+    return (
+        record.get('connection_id'), record.get('node_id_1'), record.get('node_id_2'),
+        record.get('pole_tag_1'), record.get('pole_tag_2'), record.get('scid_1'), record.get('scid_2'),
+        _number(span_length), span_length_source, _number(measured_span_length), bool(span_length_flagged),
+        record.get('connection_type'), record.get('mr_status'),
+        record.get('latitude_1'), record.get('longitude_1'), record.get('latitude_2'),
+        record.get('longitude_2'), _number(lowest_com), _number(lowest_cps),
+        record.get('movement_summary'), record.get('remedy_description'),
+    )
+
+
+def _attacher_rows(node_id, attachers_data):
+    """Attacher table rows for the main attachers of a pole."""
+    for position, attacher in enumerate(attachers_data.get('main_attachers', [])):
+        yield (
+            node_id, position, attacher.get('name') or "", attacher.get('company') or "",
+            attacher.get('cable_type') or "", _number(attacher.get('existing_height')),
+            _number(attacher.get('proposed_height')), attacher.get('raw_height', 0.0),
+            bool(attacher.get('is_proposed', False)), bool(attacher.get('is_down_guy', False)),
+            bool(attacher.get('is_reference', False)), bool(attacher.get('is_backspan', False)),
+            float('nan'),
+        )
+
+
+def build_report_tables(records, job_index=None):
+    """
+    Flatten connection records into the pole, connection and attacher tables.
+
+    Records from process_data carry everything the tables need. Records that
+    only have the DataFrame columns (e.g. a DataFrame passed straight to the
+    Excel writer) get their attachers and numeric heights from job_index.
+
+    Args:
+        records (list): Connection records (dicts), in job order
+        job_index (JobIndex, optional): Index used to fill in data missing from the records
+
+    Returns:
+        ReportTables: The poles, connections and attachers DataFrames
+    """
+    pole_rows = []
+    attacher_rows = []
+    seen_poles = set()
+    for record in records:
+        node_id = record.get('node_id_1')
+        if not node_id or node_id in seen_poles:
+            continue
+        seen_poles.add(node_id)
+        pole_rows.append(_pole_row(record, job_index))
+
+        attachers_data = record.get('attachers_data')
+        if attachers_data is None and job_index is not None:
+            attachers_data = get_attachers_for_node(job_index, node_id)
+        attacher_rows.extend(_attacher_rows(node_id, attachers_data or {}))
+
+    poles = pd.DataFrame.from_records(pole_rows, columns=POLE_TABLE_COLUMNS)
+    poles['operation_number'] = pd.array(poles['operation_number'].tolist(), dtype='Int64')
+    poles = _typed(poles, POLE_HEIGHT_COLUMNS, ['pole_owner'])
+    connections = _typed(
+        pd.DataFrame.from_records([_connection_row(record, job_index) for record in records],
+                                  columns=CONNECTION_TABLE_COLUMNS),
+        CONNECTION_HEIGHT_COLUMNS, ['connection_type', 'span_length_source'])
+    connections['span_length_flagged'] = connections['span_length_flagged'].astype(bool)
+
+    attachers = pd.DataFrame.from_records(attacher_rows, columns=ATTACHER_TABLE_COLUMNS)
+    attachers = _typed(attachers, ATTACHER_HEIGHT_COLUMNS, ['company', 'cable_type'])
+    for column in ('is_proposed', 'is_down_guy', 'is_reference', 'is_backspan'):
+        attachers[column] = attachers[column].astype(bool)
+    attachers['position'] = attachers['position'].astype(int)
+
+    # Whole-inch move of each attacher, as shown in the report (NaN where it does not move)
+    move = attachers['proposed_height'].round() - attachers['existing_height'].round()
+    attachers['move_inches'] = move.where(move != 0)
+
+    logger.debug(f"Built report tables: {len(poles)} poles, {len(connections)} connections, "
+                 f"{len(attachers)} attachers")
+    return ReportTables(poles, connections, attachers)
+
+
+def _breakdown(attachers, key):
+    """Group attachers by key into {value: {'poles', 'attachers', 'proposed'}}, largest first."""
+    if attachers.empty:
+        return {}
+    grouped = attachers.groupby(key, sort=False).agg(
+        poles=('node_id', 'nunique'),
+        attachers=('node_id', 'size'),
+        proposed=('is_proposed', 'sum'),
+    ).sort_values(['attachers', 'poles'], ascending=False, kind='stable')
+    return {
+        str(value): {name: int(count) for name, count in row.items()}
+        for value, row in grouped.to_dict('index').items()
+    }
+
+
+def _span_length_counts(connections):
+    """Counts of recorded, computed (from coordinates), missing and flagged span lengths."""
+    sources = connections['span_length_source'].astype(object)
+    return {
+        "recorded": int((sources == "recorded").sum()),
+        "computed": int((sources == "computed").sum()),
+        "missing": int(connections['span_length'].isna().sum()),
+        "flagged": int(connections['span_length_flagged'].sum()),
+    }
+
+
+def compute_statistics(tables):
+    """
+    Compute the report statistics.
+
+    Args:
+        tables (ReportTables): The tables from build_report_tables
+
+    Returns:
+        dict: pole_count, connection_count, attacher_count, proposed_count, the
+            'span_lengths' counts and the 'attachers_by_owner' / 'attachers_by_name' breakdowns
+    """
+    poles, connections, attachers = tables
+    owners = attachers['node_id'].map(poles.set_index('node_id')['pole_owner'].astype(object))
+    owners = owners.fillna("").replace("", UNKNOWN_OWNER)
+    return {
+        "pole_count": len(poles),
+        "connection_count": len(connections),
+        "attacher_count": len(attachers),
+        "proposed_count": int(attachers['is_proposed'].sum()),
+        "span_lengths": _span_length_counts(connections),
+        "attachers_by_owner": _breakdown(attachers.assign(pole_owner=owners), 'pole_owner'),
+        "attachers_by_name": _breakdown(attachers, 'name'),
+    }
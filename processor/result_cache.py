@@ -0,0 +1,326 @@
+"""
+Content-addressed cache of generated reports.
+
+Field crews upload the same Katapult export several times a day, and every
+upload used to be processed from scratch. Uploads are hashed while
+storage.save_file writes them (storage.ContentHash); the report and stats
+produced for an upload are stored under that hash plus processor_version(), so
+a repeated upload is answered by copying the cached report instead of running
+process_katapult_json. Reports from an older processor are never served.
+
+Entries live in REPORT_CACHE_DIR locally, or under REPORT_CACHE_PREFIX in the
+S3 bucket when storage uses S3. Each store evicts entries older than
+REPORT_CACHE_MAX_AGE_DAYS, then the oldest entries until the cache fits in
+REPORT_CACHE_MAX_MB.
+"""
+
+import os
+import io
+import json
+import time
+import shutil
+import hashlib
+import logging
+import functools
+from importlib import metadata
+
+from . import storage
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Serve repeated uploads from the cache
+REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE', 'True').lower() == 'true'
+
+# Local cache folder (next to the app's uploads)
+REPORT_CACHE_DIR = os.environ.get(
+    'REPORT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads', 'report_cache')
+)
+
+# Key prefix of cache entries in the S3 bucket
+REPORT_CACHE_PREFIX = os.environ.get('REPORT_CACHE_PREFIX', 'report_cache/')
+
+# Eviction limits
+REPORT_CACHE_MAX_MB = float(os.environ.get('REPORT_CACHE_MAX_MB', 500))
+REPORT_CACHE_MAX_AGE_DAYS = float(os.environ.get('REPORT_CACHE_MAX_AGE_DAYS', 7))
+
+REPORT_SUFFIX = ".xlsx"
+STATS_SUFFIX = ".json"
+
+# Installed packages whose version can change the workbook (part of processor_version)
+REPORT_DEPENDENCIES = ("pandas", "numpy", "openpyxl")
+
+# Stats that describe one particular run rather than the report, so they are not cached
+RUN_STATS = ("processing_time", "timings", "incremental", "attacher_cache_hits",
+             "attacher_cache_misses", "photofirst_cache")
+
+
+@functools.lru_cache(maxsize=None)
+def processor_version():
+    """
+    Fingerprint of the processor source code and the report dependencies.
+
+    Any change to the processor package, or an upgrade of a package in
+    REPORT_DEPENDENCIES (either may change the report), gives a new version,
+    so cache entries written by older code are not served.
+
+    Returns:
+        str: 12 hex digits
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(package_dir)):
+        if name.endswith(".py"):
+            digest.update(name.encode("utf-8"))
+            with open(os.path.join(package_dir, name), "rb") as f:
+                digest.update(f.read())
+    for package in REPORT_DEPENDENCIES:
+        try:
+            package_version = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            package_version = "missing"
+        digest.update(f"{package}=={package_version}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def cache_key(content_hash):
+    """Cache key of an upload: its SHA-256 plus the processor version."""
+    return f"{content_hash}-{processor_version()}"
+
+
+class LocalCacheStore:
+    """Cache entries as files in a local folder."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read(self, name):
+        """Contents of an entry file, or None if it does not exist."""
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, name, source_path=None, data=None):
+        """Write an entry file from a local file or bytes (atomically)."""
+        temp_path = self._path(f".{name}.{os.getpid()}.tmp")
+        if source_path is not None:
+            shutil.copyfile(source_path, temp_path)
+        else:
+            with open(temp_path, "wb") as f:
+                f.write(data)
+        os.replace(temp_path, self._path(name))
+
+    def copy_to(self, name, destination_path):
+        """Copy an entry file to where reports are downloaded from; False if it is gone."""
+        try:
+            with open(self._path(name), "rb") as f:
+                storage.save_file(destination_path, f)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list(self):
+        """(name, size in bytes, modified timestamp) of every entry file."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_size, stat.st_mtime))
+        return entries
+
+    def delete(self, names):
+        for name in names:
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+
+class S3CacheStore:
+    """
+    Cache entries as objects under a key prefix in the storage bucket.
+
+    The client, bucket and transfer settings are taken from storage.get_s3_backend()
+    on every operation, so a forked worker uses its own client and never the one
+    inherited from its parent.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    @staticmethod
+    def _backend():
+        s3_backend = storage.get_s3_backend()
+        if s3_backend is None:
+            raise RuntimeError("Storage no longer uses S3")
+        return s3_backend
+
+    def read(self, name):
+        s3_backend = self._backend()
+        try:
+            return s3_backend.client.get_object(Bucket=s3_backend.bucket, Key=self.prefix + name)['Body'].read()
+        except s3_backend.client.exceptions.NoSuchKey:
+            return None
+
+    def write(self, name, source_path=None, data=None):
+        s3_backend = self._backend()
+        if source_path is not None:
+            s3_backend.client.upload_file(source_path, s3_backend.bucket, self.prefix + name,
+                                          Config=s3_backend.transfer_config)
+        else:
+            s3_backend.client.upload_fileobj(io.BytesIO(data), s3_backend.bucket, self.prefix + name,
+                                             Config=s3_backend.transfer_config)
+
+    def copy_to(self, name, destination_path):
+        # Reports are downloaded from the bucket by file name (see storage.save_file);
+        # copy server-side instead of downloading and re-uploading
+        s3_backend = self._backend()
+        try:
+            s3_backend.client.copy_object(Bucket=s3_backend.bucket, Key=os.path.basename(destination_path),
+                                          CopySource={'Bucket': s3_backend.bucket, 'Key': self.prefix + name})
+            return True
+        except s3_backend.client.exceptions.NoSuchKey:
+            return False
+
+    def list(self):
+        s3_backend = self._backend()
+        entries = []
+        paginator = s3_backend.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=s3_backend.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                entries.append((item['Key'][len(self.prefix):], item['Size'], item['LastModified'].timestamp()))
+        return entries
+
+    def delete(self, names):
+        s3_backend = self._backend()
+        names = list(names)
+        for start in range(0, len(names), 1000):  # delete_objects takes up to 1000 keys
+            s3_backend.client.delete_objects(Bucket=s3_backend.bucket, Delete={
+                'Objects': [{'Key': self.prefix + name} for name in names[start:start + 1000]],
+                'Quiet': True,
+            })
+
+
+class ResultCache:
+    """
+    Reports and stats keyed by upload content hash and processor version.
+
+    Attributes:
+        store: LocalCacheStore or S3CacheStore holding the entries
+        max_bytes (int): Total size the cache is trimmed to after each store
+        max_age (float): Seconds after which an entry is evicted
+    """
+
+    def __init__(self, store, max_mb=REPORT_CACHE_MAX_MB, max_age_days=REPORT_CACHE_MAX_AGE_DAYS):
+        self.store = store
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 24 * 3600
+
+    def fetch(self, content_hash, destination_path):
+        """
+        Serve a cached report for an upload.
+
+        Args:
+            content_hash (str): SHA-256 of the upload
+            destination_path (str): Where the report should be placed for download
+
+        Returns:
+            dict: The stats stored with the report, or None on a cache miss
+        """
+        key = cache_key(content_hash)
+        stats_data = self.store.read(key + STATS_SUFFIX)
+        if stats_data is None:
+            return None
+        if not self.store.copy_to(key + REPORT_SUFFIX, destination_path):
+            return None
+        logger.info(f"Report cache hit for {content_hash}")
+        stats = json.loads(stats_data)
+        stats["cache_hit"] = True
+        return stats
+
+    def put(self, content_hash, report_path, stats):
+        """
+        Store the report and stats generated for an upload, then evict old entries.
+
+        Args:
+            content_hash (str): SHA-256 of the upload
+            report_path (str): Local path of the generated report
+            stats (dict): The statistics returned by process_katapult_json (the RUN_STATS
+                of this run are left out, so a cache hit does not replay them)
+        """
+        key = cache_key(content_hash)
+        report_stats = {name: value for name, value in stats.items() if name not in RUN_STATS}
+        # Report first: an entry is only visible once its stats exist
+        self.store.write(key + REPORT_SUFFIX, source_path=report_path)
+        self.store.write(key + STATS_SUFFIX, data=json.dumps(report_stats).encode("utf-8"))
+        logger.info(f"Cached report for {content_hash}")
+        self.evict()
+
+    def evict(self):
+        """
+        Drop entries older than max_age, then the oldest entries until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of entries evicted
+        """
+        entries = {}
+        for name, size, modified in self.store.list():
+            key = name.rsplit(".", 1)[0]
+            files, total_size, newest = entries.get(key, ([], 0, 0.0))
+            entries[key] = (files + [name], total_size + size, max(newest, modified))
+
+        now = time.time()
+        evicted = []
+        total_size = 0
+        # Newest first: keep entries while they are young enough and fit
+        for key, (files, size, modified) in sorted(entries.items(), key=lambda item: item[1][2], reverse=True):
+            if now - modified > self.max_age or total_size + size > self.max_bytes:
+                evicted.extend(files)
+            else:
+                total_size += size
+        if evicted:
+            self.store.delete(evicted)
+            logger.info(f"Evicted {len(evicted)} report cache file(s)")
+        return len(evicted)
+
+
+def default_cache():
+    """
+    The cache, on S3 when storage uses S3 and in REPORT_CACHE_DIR otherwise.
+
+    Built on every call (it is cheap) rather than memoized, so it always follows
+    the current storage backend, including after a fork or storage.set_backend().
+
+    Returns:
+        ResultCache: The cache, or None if REPORT_CACHE is disabled
+    """
+    if not REPORT_CACHE_ENABLED:
+        return None
+    if storage.get_s3_backend() is not None:
+        return ResultCache(S3CacheStore(REPORT_CACHE_PREFIX))
+    return ResultCache(LocalCacheStore(REPORT_CACHE_DIR))
+
+
+def cache_report(content_hash, report_path, stats):
+    """
+    Add a generated report to the default cache; failures are logged, never raised.
+
+    Args:
+        content_hash (str): SHA-256 of the upload (nothing is cached if None)
+        report_path (str): Local path of the generated report
+        stats (dict): The statistics returned by process_katapult_json
+    """
+    cache = default_cache()
+    if cache is None or not content_hash:
+        return
+    try:
+        cache.put(content_hash, report_path, stats)
+    except Exception as e:
+        logger.warning(f"Could not cache report for {content_hash}: {e}")
@@ -0,0 +1,279 @@
+"""
+One-time index over a SPIDAcalc export, joined to the poles of a Katapult job.
+
+A SPIDAcalc file lists its poles as leads[].locations[], each with designs[]
+("Measured Design", "Recommended Design", ...) and analysis results. Looking up
+a pole meant scanning every lead and location. SpidacalcIndex reads every
+location once, keyed by normalized pole label and by a coarse latitude /
+longitude grid, and pre-computes the values the report reads (PLA and
+construction grade). join_spidacalc then matches the Katapult nodes to their
+locations once per job (pole tag first, nearest unclaimed location within
+MATCH_RADIUS_FEET second), so extraction looks them up with
+get_spidacalc_location.
+"""
+
+import re
+import math
+import logging
+
+from .utils import normalize_pole_label
+from .data_extraction import extract_pole_tag, extract_location
+from .geometry import haversine_feet
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Size of a spatial grid cell in degrees (about 360 ft of latitude)
+GRID_CELL_DEGREES = 0.001
+
+# Farthest a SPIDAcalc location may be from a Katapult pole to match by coordinates
+MATCH_RADIUS_FEET = 50.0
+
+# Designs whose results are used for PLA and construction grade, most preferred first
+RESULT_DESIGN_PRIORITY = ("Recommended Design", "Measured Design")
+
+# Keys of the match counts (see join_spidacalc)
+MATCH_BY_LABEL = "by_label"
+MATCH_BY_COORDINATES = "by_coordinates"
+
+_GRADE_PATTERN = re.compile(r"grade\s*([A-Z0-9/]+)", re.IGNORECASE)
+
+
+def _float(value):
+    """Value as a float, None when missing or not numeric."""
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _location_coordinates(location):
+    """(lat, lon) of a SPIDAcalc location, (None, None) if it has none."""
+    lat, lon = _float(location.get("latitude")), _float(location.get("longitude"))
+    if lat is not None and lon is not None:
+        return lat, lon
+    # GeoJSON points, [longitude, latitude]
+    for key in ("geographicCoordinate", "mapLocation"):
+        point = location.get(key)
+        coordinates = point.get("coordinates") if isinstance(point, dict) else None
+        if isinstance(coordinates, (list, tuple)) and len(coordinates) >= 2:
+            lon, lat = _float(coordinates[0]), _float(coordinates[1])
+            if lat is not None and lon is not None:
+                return lat, lon
+    return None, None
+
+
+def _pole_stress_results(location):
+    """
+    Pole stress results of a location as (design label, load info, actual) tuples.
+
+    Reads location.poleResults and the analysis of each design
+    (designs[].analysis[].results[], where the analysis id is the load case).
+    """
+    results = []
+    for result in location.get("poleResults", []) or []:
+        if isinstance(result, dict):
+            results.append((result.get("designLabel", ""), result.get("loadInfo", ""), result))
+    for design in location.get("designs", []) or []:
+        if not isinstance(design, dict):
+            continue
+        for analysis in design.get("analysis", []) or []:
+            if not isinstance(analysis, dict):
+                continue
+            for result in analysis.get("results", []) or []:
+                if isinstance(result, dict):
+                    results.append((design.get("label", ""), analysis.get("id", ""), result))
+
+    stress_results = []
+    for design_label, load_info, result in results:
+        if str(result.get("component", "")).lower() != "pole":
+            continue
+        if str(result.get("analysisType", "STRESS")).upper() != "STRESS":
+            continue
+        actual = _float(result.get("actual"))
+        if actual is not None:
+            stress_results.append((design_label or "", str(load_info or ""), actual))
+    return stress_results
+
+
+class SpidacalcLocation:
+    """
+    One SPIDAcalc pole location.
+
+    Attributes:
+        label (str): The location label (e.g. "1-PL410620")
+        normalized_label (str): normalize_pole_label(label)
+        latitude, longitude (float): Coordinates (None if the location has none)
+        designs (dict): Design label -> design dict, in file order
+        pla_percentage (float): Governing pole stress in percent (None without results)
+        construction_grade (str): Construction grade of that load case ("" if unknown)
+    """
+
+    __slots__ = ("label", "normalized_label", "latitude", "longitude", "designs",
+                 "pla_percentage", "construction_grade")
+
+    def __init__(self, location):
+        self.label = str(location.get("label", "") or "")
+        self.normalized_label = normalize_pole_label(self.label)
+        self.latitude, self.longitude = _location_coordinates(location)
+        self.designs = {}
+        for design in location.get("designs", []) or []:
+            if isinstance(design, dict):
+                self.designs.setdefault(design.get("label", ""), design)
+
+        # Governing (highest) pole stress of the most preferred design that has results
+        self.pla_percentage = None
+        self.construction_grade = ""
+        stress_results = _pole_stress_results(location)
+        for design_label in RESULT_DESIGN_PRIORITY + (None,):
+            candidates = [r for r in stress_results if design_label is None or r[0] == design_label]
+            if candidates:
+                _, load_info, actual = max(candidates, key=lambda r: r[2])
+                self.pla_percentage = actual
+                grade = _GRADE_PATTERN.search(load_info)
+                self.construction_grade = grade.group(1).upper() if grade else ""
+                break
+
+    def design(self, label):
+        """The design with the given label (e.g. "Recommended Design"), or None."""
+        return self.designs.get(label)
+
+    def __repr__(self):
+        return f"SpidacalcLocation({self.label!r})"
+
+
+class SpidacalcIndex:
+    """
+    Every location of a SPIDAcalc export, keyed by normalized label and by grid cell.
+
+    Attributes:
+        locations (list): SpidacalcLocation entries, in file order
+        match_counts (dict): Node match counts, set by join_spidacalc (None before)
+    """
+
+    def __init__(self, spidacalc_data):
+        self.locations = []
+        self.match_counts = None
+        self._by_label = {}
+        self._grid = {}
+        for lead in (spidacalc_data or {}).get("leads", []) or []:
+            for location in (lead or {}).get("locations", []) or []:
+                if not isinstance(location, dict):
+                    continue
+                entry = SpidacalcLocation(location)
+                self.locations.append(entry)
+                if entry.normalized_label:
+                    if entry.normalized_label in self._by_label:
+                        logger.warning(f"Duplicate SPIDAcalc location label {entry.label!r}; keeping the first")
+                    else:
+                        self._by_label[entry.normalized_label] = entry
+                if entry.latitude is not None:
+                    self._grid.setdefault(self._cell(entry.latitude, entry.longitude), []).append(entry)
+        logger.debug(f"Indexed {len(self.locations)} SPIDAcalc locations "
+                     f"({len(self._by_label)} labels, {len(self._grid)} grid cells)")
+
+    @staticmethod
+    def _cell(lat, lon):
+        return math.floor(lat / GRID_CELL_DEGREES), math.floor(lon / GRID_CELL_DEGREES)
+
+    def find_by_label(self, label):
+        """The location whose normalized label matches, or None."""
+        normalized = normalize_pole_label(label)
+        return self._by_label.get(normalized) if normalized else None
+
+    def find_nearest(self, lat, lon, max_distance_feet=MATCH_RADIUS_FEET, exclude=()):
+        """
+        The location nearest to a point, within max_distance_feet.
+
+        Only the point's grid cell and its eight neighbours are searched, so
+        max_distance_feet must not exceed the cell size.
+
+        Args:
+            lat, lon (float): The point in degrees
+            max_distance_feet (float, optional): Farthest acceptable location
+            exclude (set, optional): Locations that may not be returned
+
+        Returns:
+            tuple: (SpidacalcLocation, distance in feet), or (None, None) if none is close enough
+        """
+        row, column = self._cell(lat, lon)
+        candidates = [entry for d_row in (-1, 0, 1) for d_column in (-1, 0, 1)
+                      for entry in self._grid.get((row + d_row, column + d_column), ())
+                      if entry not in exclude]
+        if not candidates:
+            return None, None
+        distances = haversine_feet(lat, lon, [entry.latitude for entry in candidates],
+                                   [entry.longitude for entry in candidates])
+        nearest = int(distances.argmin())
+        if distances[nearest] > max_distance_feet:
+            return None, None
+        return candidates[nearest], float(distances[nearest])
+
+
+def join_spidacalc(job_index, spidacalc_data):
+    """
+    Index a SPIDAcalc export and match the nodes of the job to their locations.
+
+    Nodes are matched by pole tag first. The remaining nodes are matched to the
+    nearest location within MATCH_RADIUS_FEET that no other node has claimed;
+    when two nodes are nearest to the same location, the closer one gets it.
+    Sets job_index.spidacalc and job_index.spidacalc_locations (node_id -> location).
+
+    Args:
+        job_index (JobIndex): Index over the Katapult JSON data
+        spidacalc_data (dict): The loaded SPIDAcalc JSON data
+
+    Returns:
+        dict: Match counts: 'locations', 'by_label', 'by_coordinates', 'unmatched'
+    """
+    index = SpidacalcIndex(spidacalc_data)
+    matches = {}
+
+    # Pole tags
+    unmatched = []
+    for node_id, node_data in job_index.nodes.items():
+        location = index.find_by_label(extract_pole_tag(node_data))
+        if location is not None:
+            matches[node_id] = location
+        else:
+            unmatched.append((node_id, node_data))
+    by_label = len(matches)
+
+    # Coordinates, closest pairs first
+    claimed = set(matches.values())
+    proposals = []
+    for position, (node_id, node_data) in enumerate(unmatched):
+        lat, lon = (_float(value) for value in extract_location(node_data))
+        if lat is None or lon is None:
+            continue
+        location, distance = index.find_nearest(lat, lon, exclude=claimed)
+        if location is not None:
+            proposals.append((distance, position, node_id, location))
+    for _, _, node_id, location in sorted(proposals, key=lambda proposal: proposal[:2]):
+        if location not in claimed:
+            matches[node_id] = location
+            claimed.add(location)
+
+    index.match_counts = {
+        "locations": len(index.locations),
+        MATCH_BY_LABEL: by_label,
+        MATCH_BY_COORDINATES: len(matches) - by_label,
+        "unmatched": len(job_index.nodes) - len(matches),
+    }
+    job_index.spidacalc = index
+    job_index.spidacalc_locations = matches
+    return index.match_counts
+
+
+def get_spidacalc_location(job_index, node_id):
+    """
+    The SPIDAcalc location joined to a node.
+
+    Args:
+        job_index (JobIndex): Index over the Katapult JSON data
+        node_id (str): The node ID
+
+    Returns:
+        SpidacalcLocation: The matched location, or None (no match or no SPIDAcalc data)
+    """
+    return job_index.spidacalc_locations.get(node_id)
@@ -1,7 +1,15 @@
 import os
 import io
+import time
+import shutil
+import hashlib
 import logging
+import threading
+import unicodedata
+from urllib.parse import quote
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 # Configure logging
@@ -11,93 +19,372 @@ logger = logging.getLogger(__name__)
 S3_BUCKET = os.environ.get('S3_BUCKET_NAME')
 USE_S3 = os.environ.get('USE_S3', 'False').lower() == 'true'
 
-# Initialize S3 client if using S3
-s3_client = None
-if USE_S3:
+# S3 endpoint override: an S3-compatible server (e.g. "http://localhost:9000"), or
+# "file:///path" for the filesystem stand-in in processor.local_s3
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+
+# S3 transfer tuning: objects larger than the threshold are sent and fetched in
+# parts of S3_MULTIPART_CHUNKSIZE_MB, up to S3_MAX_CONCURRENCY parts at a time
+S3_MULTIPART_THRESHOLD_MB = float(os.environ.get('S3_MULTIPART_THRESHOLD_MB', 8))
+S3_MULTIPART_CHUNKSIZE_MB = float(os.environ.get('S3_MULTIPART_CHUNKSIZE_MB', 8))
+S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', 10))
+
+# HTTP connections kept open by the S3 client of each process (shared by all its requests)
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 20))
+
+# Seconds a presigned S3 download URL stays valid
+S3_PRESIGNED_URL_EXPIRY = int(os.environ.get('S3_PRESIGNED_URL_EXPIRY', 300))
+
+# Bytes read per block when copying a file-like object
+COPY_CHUNK_SIZE = 1024 * 1024
+
+MB = 1024 * 1024
+
+
+class ContentHash:
+    """Running SHA-256 and byte count of the content save_file writes."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start over (e.g. when a failed S3 upload falls back to local storage)."""
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def update(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+class ObservingReader:
+    """
+    Read-only wrapper that feeds every block read from a file-like object to observers.
+
+    Observers are objects with update(data) and reset(), such as ContentHash or
+    streaming_ingest.UploadValidator. Lets save_file hash and check an upload
+    while it is streamed to disk or S3, instead of reading it a second time.
+    """
+
+    def __init__(self, file_object, observers):
+        self._file_object = file_object
+        self.observers = observers
+
+    def read(self, size=-1):
+        data = self._file_object.read(size)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        for observer in self.observers:
+            observer.update(data)
+        return data
+
+
+def make_transfer_config(threshold_mb=None, chunksize_mb=None, max_concurrency=None):
+    """
+    TransferConfig for S3 uploads and downloads, from the S3_* settings unless overridden.
+
+    Args:
+        threshold_mb (float, optional): Size above which transfers use multipart
+        chunksize_mb (float, optional): Size of each part
+        max_concurrency (int, optional): Parts transferred at the same time
+
+    Returns:
+        TransferConfig: The transfer configuration
+    """
+    threshold_mb = S3_MULTIPART_THRESHOLD_MB if threshold_mb is None else threshold_mb
+    chunksize_mb = S3_MULTIPART_CHUNKSIZE_MB if chunksize_mb is None else chunksize_mb
+    max_concurrency = S3_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+    return TransferConfig(
+        multipart_threshold=int(threshold_mb * MB),
+        multipart_chunksize=int(chunksize_mb * MB),
+        max_concurrency=max_concurrency,
+        use_threads=max_concurrency > 1
+    )
+
+
+def create_s3_client(max_pool_connections=None):
+    """
+    Build an S3 client from the environment configuration.
+
+    With S3_ENDPOINT_URL=file:///path the requests are answered by the filesystem
+    stand-in in processor.local_s3, so the S3 backend can run offline.
+
+    Args:
+        max_pool_connections (int, optional): HTTP connection pool size. Defaults to
+            S3_MAX_POOL_CONNECTIONS, raised to S3_MAX_CONCURRENCY if lower so parallel
+            parts never wait for a connection.
+
+    Returns:
+        botocore.client.S3: The client
+    """
+    pool_size = max_pool_connections or max(S3_MAX_POOL_CONNECTIONS, S3_MAX_CONCURRENCY)
+    config = Config(max_pool_connections=pool_size, retries={'mode': 'standard'})
+
+    if S3_ENDPOINT_URL and S3_ENDPOINT_URL.startswith('file://'):
+        from .local_s3 import LocalS3
+        return LocalS3(S3_ENDPOINT_URL[len('file://'):]).create_client(config)
+
+    return boto3.session.Session().client(
+        's3',
+        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.environ.get('AWS_REGION', 'us-east-1'),
+        endpoint_url=S3_ENDPOINT_URL,
+        config=config
+    )
+
+
+def content_disposition(download_name):
+    """
+    Content-Disposition header value for downloading a file as download_name.
+
+    Built like werkzeug's send_file: a quoted ASCII fallback name, plus a
+    filename*=UTF-8'' parameter when the name is not plain ASCII.
+
+    Args:
+        download_name (str): File name the browser saves the download as
+
+    Returns:
+        str: The header value
+    """
     try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.environ.get('AWS_REGION', 'us-east-1')
-        )
-        logger.info("S3 client initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize S3 client: {e}")
+        download_name.encode('ascii')
+        extended = None
+    except UnicodeEncodeError:
+        extended = quote(download_name, safe="!#$&+^`|")
+        download_name = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+    fallback = download_name.replace('\\', '\\\\').replace('"', '\\"')
+    value = f'attachment; filename="{fallback}"'
+    if extended:
+        value += f"; filename*=UTF-8''{extended}"
+    return value
+
+
+def _iter_blocks(file_object, chunk_size):
+    """Yield a file-like object's content in blocks, closing it at the end (or when the consumer stops)."""
+    try:
+        while True:
+            block = file_object.read(chunk_size)
+            if not block:
+                break
+            yield block
+    finally:
+        file_object.close()
+
+
+class LocalBackend:
+    """Files on the local disk, addressed by path."""
+
+    def save(self, file_path, source, content_type=None):
+        """Copy a file-like object to file_path in COPY_CHUNK_SIZE blocks; returns the path."""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as f:
+            shutil.copyfileobj(source, f, COPY_CHUNK_SIZE)
+        return file_path
+
+    def open(self, file_path):
+        return open(file_path, 'rb')
+
+    def stream(self, file_path, chunk_size=COPY_CHUNK_SIZE):
+        """(iterator over the file in blocks, size in bytes); FileNotFoundError if it does not exist."""
+        f = open(file_path, 'rb')
+        return _iter_blocks(f, chunk_size), os.fstat(f.fileno()).st_size
+
+    def presigned_url(self, file_path, expires_in=S3_PRESIGNED_URL_EXPIRY, download_name=None, content_type=None):
+        """Local files have no direct download URL."""
+        return None
+
+    def delete(self, file_path):
+        """Remove a file; False if it does not exist."""
+        if not os.path.exists(file_path):
+            return False
+        os.remove(file_path)
+        return True
+
+
+class S3Backend:
+    """
+    Objects in one S3 bucket, addressed by "s3://<bucket>/<key>" URIs.
+
+    Attributes:
+        client: The S3 client (one per process, shared by every request; see get_backend)
+        bucket (str): The bucket name
+        transfer_config (TransferConfig): Multipart threshold, part size and concurrency
+    """
+
+    def __init__(self, client, bucket, transfer_config=None):
+        self.client = client
+        self.bucket = bucket
+        self.transfer_config = transfer_config or make_transfer_config()
+        self._prefix = f"s3://{bucket}/"
+
+    def owns(self, file_path):
+        """True if file_path is an s3:// URI in this bucket."""
+        return file_path.startswith(self._prefix)
+
+    def key(self, file_path):
+        """Object key of an s3:// URI."""
+        return file_path[len(self._prefix):]
+
+    def save(self, file_path, source, content_type=None):
+        """Upload a file-like object under the file name of file_path; returns its s3:// URI."""
+        file_name = os.path.basename(file_path)
+        extra_args = {'ContentType': content_type} if content_type else {}
+        self.client.upload_fileobj(source, self.bucket, file_name, ExtraArgs=extra_args,
+                                   Config=self.transfer_config)
+        return self._prefix + file_name
+
+    def open(self, file_path):
+        """The body of an object, streamed from S3 as it is read."""
+        return self.client.get_object(Bucket=self.bucket, Key=self.key(file_path))['Body']
+
+    def stream(self, file_path, chunk_size=COPY_CHUNK_SIZE):
+        """(iterator over the object body in blocks, size in bytes); FileNotFoundError if it does not exist."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key(file_path))
+        except self.client.exceptions.NoSuchKey:
+            raise FileNotFoundError(file_path)
+        return _iter_blocks(response['Body'], chunk_size), response['ContentLength']
+
+    def presigned_url(self, file_path, expires_in=S3_PRESIGNED_URL_EXPIRY, download_name=None, content_type=None):
+        """
+        A time-limited URL the client can download the object from directly.
+
+        Args:
+            file_path (str): s3:// URI of the object
+            expires_in (int, optional): Seconds the URL stays valid
+            download_name (str, optional): File name the browser saves the download as
+            content_type (str, optional): Content-Type of the response
+
+        Returns:
+            str: The URL, or None if the object does not exist
+        """
+        key = self.key(file_path)
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        params = {'Bucket': self.bucket, 'Key': key}
+        if download_name:
+            params['ResponseContentDisposition'] = content_disposition(download_name)
+        if content_type:
+            params['ResponseContentType'] = content_type
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
+
+    def delete(self, file_path):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(file_path))
+        return True
+
+
+# Storage backend of this process (see get_backend). It is rebuilt after a fork:
+# S3 clients and their connection pools must not be shared between processes.
+_backend = None
+_backend_pid = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    The storage backend of this process, created on first use and reused by every request.
+
+    Returns:
+        S3Backend when USE_S3 is set and the S3 client can be created, LocalBackend otherwise
+    """
+    global _backend, _backend_pid
+    with _backend_lock:
+        if _backend is None or _backend_pid != os.getpid():
+            backend = LocalBackend()
+            if USE_S3:
+                try:
+                    backend = S3Backend(create_s3_client(), S3_BUCKET)
+                    logger.info("S3 client initialized")
+                except Exception as e:
+                    logger.error(f"Failed to initialize S3 client: {e}")
+            _backend, _backend_pid = backend, os.getpid()
+        return _backend
+
+
+def set_backend(backend):
+    """Use the given backend in this process (e.g. an S3Backend on processor.local_s3)."""
+    global _backend, _backend_pid
+    with _backend_lock:
+        _backend, _backend_pid = backend, os.getpid()
+
+
+def get_s3_backend(file_path=None):
+    """
+    The S3 backend, if storage uses S3.
+
+    Args:
+        file_path (str, optional): Only return the backend if it holds this path (an s3:// URI)
+
+    Returns:
+        S3Backend: The backend, or None for local storage (or a local path)
+    """
+    backend = get_backend()
+    if isinstance(backend, S3Backend) and (file_path is None or backend.owns(file_path)):
+        return backend
+    return None
 
 
-def save_file(file_path, file_object, content_type=None):
+def save_file(file_path, file_object, content_type=None, content_hash=None, validator=None):
     """
     Save a file either locally or to S3 based on environment configuration.
-    
+
     Args:
         file_path (str): Local file path or relative path for S3
         file_object: File-like object or bytes to save
         content_type (str, optional): MIME type of the file
-        
+        content_hash (ContentHash, optional): Updated with every byte saved, so the caller
+            gets the content hash and size without reading the file again
+        validator (optional): Also fed every block saved (e.g. streaming_ingest.UploadValidator),
+            so the upload is checked without being read again
+
     Returns:
         str: Path to the saved file (local or S3 URI)
     """
+    if not hasattr(file_object, 'read'):
+        # Bytes or string: saved through the same streaming path
+        if isinstance(file_object, str):
+            file_object = file_object.encode('utf-8')
+        file_object = io.BytesIO(file_object)
+    elif hasattr(file_object, 'seek'):
+        # If it's a file uploaded by the user, it might need to be reset
+        file_object.seek(0)
+
+    # The file is read in COPY_CHUNK_SIZE blocks (multipart parts on S3), so memory use
+    # does not grow with its size; observers see each block as it is read
+    observers = [observer for observer in (content_hash, validator) if observer is not None]
+    source = ObservingReader(file_object, observers) if observers else file_object
+
     # If using S3 and client is properly initialized
-    if USE_S3 and s3_client:
+    s3_backend = get_s3_backend()
+    if s3_backend is not None:
         try:
-            # Prepare extra arguments
-            extra_args = {}
-            if content_type:
-                extra_args['ContentType'] = content_type
-            
-            # Get file name from path and use it as the S3 key
-            file_name = os.path.basename(file_path)
-            
-            # If file_object is a file-like object, upload it
-            if hasattr(file_object, 'read'):
-                # If it's a file uploaded by the user, it might need to be reset
-                if hasattr(file_object, 'seek'):
-                    file_object.seek(0)
-                
-                s3_client.upload_fileobj(file_object, S3_BUCKET, file_name, ExtraArgs=extra_args)
-            # If file_object is bytes or string, convert and upload
-            else:
-                if isinstance(file_object, str):
-                    file_object = file_object.encode('utf-8')
-                    
-                s3_client.upload_fileobj(
-                    io.BytesIO(file_object), 
-                    S3_BUCKET, 
-                    file_name, 
-                    ExtraArgs=extra_args
-                )
-                
-            logger.info(f"File saved to S3: {file_name}")
-            return f"s3://{S3_BUCKET}/{file_name}"
-        
+            s3_path = s3_backend.save(file_path, source, content_type)
+            logger.info(f"File saved to S3: {s3_backend.key(s3_path)}")
+            return s3_path
+
         except ClientError as e:
             logger.error(f"S3 upload error: {e}")
             # Fall back to local storage if S3 fails
             logger.warning("Falling back to local storage")
-        
-    # Local file storage (default or fallback)
-    try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Handle file-like objects
-        if hasattr(file_object, 'read'):
             if hasattr(file_object, 'seek'):
                 file_object.seek(0)
-                
-            with open(file_path, 'wb') as f:
-                f.write(file_object.read())
-                
-        # Handle bytes or string
-        else:
-            mode = 'wb' if isinstance(file_object, bytes) else 'w'
-            with open(file_path, mode) as f:
-                f.write(file_object)
-                
+            for observer in observers:
+                observer.reset()
+
+    # Local file storage (default or fallback)
+    try:
+        LocalBackend().save(file_path, source)
         logger.info(f"File saved locally: {file_path}")
         return file_path
-    
+
     except Exception as e:
         logger.error(f"Error saving file locally: {e}")
         raise
@@ -106,77 +393,186 @@ def save_file(file_path, file_object, content_type=None):
 def get_file(file_path):
     """
     Retrieve a file from local storage or S3.
-    
+
     Args:
         file_path (str): Path to the file, can be local or S3 URI
-        
+
     Returns:
         bytes: The file content
     """
+    with open_file(file_path) as f:
+        content = f.read()
+    logger.info(f"File retrieved: {file_path}")
+    return content
+
+
+def open_file(file_path):
+    """
+    Open a stored file for reading in blocks, without loading it into memory.
+
+    Args:
+        file_path (str): Path to the file, can be local or S3 URI
+
+    Returns:
+        A binary file-like object (the S3 response body for S3 URIs); close it when done
+    """
     # Check if path is an S3 URI
-    if USE_S3 and s3_client and file_path.startswith(f"s3://{S3_BUCKET}/"):
+    s3_backend = get_s3_backend(file_path)
+    if s3_backend is not None:
         try:
-            file_name = file_path.split(f"s3://{S3_BUCKET}/")[1]
-            
-            # Get the object from S3
-            response = s3_client.get_object(Bucket=S3_BUCKET, Key=file_name)
-            content = response['Body'].read()
-            
-            logger.info(f"File retrieved from S3: {file_name}")
-            return content
-            
+            body = s3_backend.open(file_path)
+            logger.info(f"File opened from S3: {s3_backend.key(file_path)}")
+            return body
+
         except ClientError as e:
             logger.error(f"S3 download error: {e}")
             raise
-            
-    # Local file retrieval
+
+    # Local file
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-            
-        logger.info(f"File retrieved locally: {file_path}")
-        return content
-        
+        return LocalBackend().open(file_path)
+
     except Exception as e:
-        logger.error(f"Error retrieving local file: {e}")
+        logger.error(f"Error opening local file: {e}")
         raise
 
 
+def stream_file(file_path, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Read a stored file as a stream of blocks, for sending it without holding it in memory.
+
+    Args:
+        file_path (str): Path to the file, can be local or S3 URI
+        chunk_size (int, optional): Bytes per block
+
+    Returns:
+        tuple: (iterator of bytes blocks, size in bytes). The file (or S3 body) is
+            closed once the iterator is exhausted or closed.
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    s3_backend = get_s3_backend(file_path)
+    if s3_backend is not None:
+        try:
+            blocks, size = s3_backend.stream(file_path, chunk_size)
+            logger.info(f"Streaming file from S3: {s3_backend.key(file_path)} ({size} bytes)")
+            return blocks, size
+
+        except ClientError as e:
+            logger.error(f"S3 download error: {e}")
+            raise
+
+    return LocalBackend().stream(file_path, chunk_size)
+
+
+def presigned_url(file_path, expires_in=S3_PRESIGNED_URL_EXPIRY, download_name=None, content_type=None):
+    """
+    A direct, time-limited download URL for a stored file, so the bytes don't pass through the app.
+
+    Args:
+        file_path (str): Path to the file, can be local or S3 URI
+        expires_in (int, optional): Seconds the URL stays valid
+        download_name (str, optional): File name the browser saves the download as
+        content_type (str, optional): Content-Type of the response
+
+    Returns:
+        str: The URL, or None for local files and S3 objects that do not exist
+    """
+    s3_backend = get_s3_backend(file_path)
+    if s3_backend is None:
+        return None
+    try:
+        return s3_backend.presigned_url(file_path, expires_in, download_name, content_type)
+    except ClientError as e:
+        logger.error(f"S3 presign error: {e}")
+        return None
+
+
 def delete_file(file_path):
     """
     Delete a file from local storage or S3.
-    
+
     Args:
         file_path (str): Path to the file, can be local or S3 URI
-        
+
     Returns:
         bool: True if deleted successfully, False otherwise
     """
     # Check if path is an S3 URI
-    if USE_S3 and s3_client and file_path.startswith(f"s3://{S3_BUCKET}/"):
+    s3_backend = get_s3_backend(file_path)
+    if s3_backend is not None:
         try:
-            file_name = file_path.split(f"s3://{S3_BUCKET}/")[1]
-            
-            # Delete the object from S3
-            s3_client.delete_object(Bucket=S3_BUCKET, Key=file_name)
-            
-            logger.info(f"File deleted from S3: {file_name}")
+            s3_backend.delete(file_path)
+            logger.info(f"File deleted from S3: {s3_backend.key(file_path)}")
             return True
-            
+
         except ClientError as e:
             logger.error(f"S3 delete error: {e}")
             return False
-            
+
     # Local file deletion
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if LocalBackend().delete(file_path):
             logger.info(f"File deleted locally: {file_path}")
             return True
         else:
             logger.warning(f"Local file not found for deletion: {file_path}")
             return False
-            
+
     except Exception as e:
         logger.error(f"Error deleting local file: {e}")
         return False
+
+
+def benchmark_s3_transfers(size_mb=64, settings=((8, 8, 1), (8, 8, 4), (8, 8, 10), (16, 16, 10)), root=None):
+    """
+    Time uploads and streamed reads through S3Backend against the filesystem stand-in.
+
+    Args:
+        size_mb (float): Size of the object transferred
+        settings (iterable): (threshold_mb, chunksize_mb, max_concurrency) combinations to time
+        root (str, optional): Folder for the stand-in's temporary bucket (system temp by default)
+
+    Returns:
+        list: One dict per setting with 'upload_mb_s', 'read_mb_s' and 'requests'
+    """
+    import tempfile
+    from .local_s3 import LocalS3
+
+    data = os.urandom(int(size_mb * MB))
+    results = []
+    with tempfile.TemporaryDirectory(dir=root) as folder:
+        for threshold_mb, chunksize_mb, max_concurrency in settings:
+            local_s3 = LocalS3(folder)
+            client = local_s3.create_client(Config(max_pool_connections=max(S3_MAX_POOL_CONNECTIONS, max_concurrency)))
+            backend = S3Backend(client, 'benchmark', make_transfer_config(threshold_mb, chunksize_mb, max_concurrency))
+
+            start = time.perf_counter()
+            s3_path = backend.save('benchmark.bin', io.BytesIO(data))
+            upload_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with backend.open(s3_path) as body:
+                while body.read(COPY_CHUNK_SIZE):
+                    pass
+            read_seconds = time.perf_counter() - start
+
+            results.append({
+                'threshold_mb': threshold_mb, 'chunksize_mb': chunksize_mb, 'max_concurrency': max_concurrency,
+                'upload_mb_s': size_mb / upload_seconds, 'read_mb_s': size_mb / read_seconds,
+                'requests': local_s3.requests
+            })
+    return results
+
+
+if __name__ == '__main__':
+    # Offline S3 transfer benchmark, e.g. `python -m processor.storage 128`
+    import sys
+
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 64
+    print(f"{size:g} MB object, filesystem S3 stand-in")
+    for result in benchmark_s3_transfers(size):
+        print(f"threshold {result['threshold_mb']:4g} MB  part {result['chunksize_mb']:4g} MB  "
+              f"concurrency {result['max_concurrency']:3d}  upload {result['upload_mb_s']:8.1f} MB/s  "
+              f"read {result['read_mb_s']:8.1f} MB/s  ({result['requests']} requests)")
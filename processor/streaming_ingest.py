@@ -0,0 +1,311 @@
+"""
+Incremental (streaming) ingestion of Katapult JSON exports.
+
+json.load materializes the entire export, and the resulting dict tree is
+several times larger than the file itself. Most of it (photo metadata, map
+styles, sync state, ...) is never read by the extractors. This module walks
+the file with an event parser, builds one node / connection / photo / trace at
+a time and keeps only the fields the processor actually reads, so peak memory
+scales with the retained data rather than with the raw file size.
+"""
+
+import io
+import os
+import json
+import logging
+
+from . import json_backend
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover - ijson is listed in requirements.txt
+    ijson = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Fields read from each kind of entry by data_extraction, node_processing,
+# connection_processing, height_utils and photo_data_utils. Everything else is dropped.
+NODE_FIELDS = ("attributes", "photos", "latitude", "longitude", "id", "properties")
+PHOTO_ENTRY_FIELDS = ("association", "latitude", "longitude", "photofirst_data", "node_id")
+CONNECTION_FIELDS = ("node_id_1", "node_id_2", "button", "attributes", "length", "sections")
+SECTION_FIELDS = ("latitude", "longitude", "photos")
+TOP_LEVEL_PHOTO_FIELDS = ("photofirst_data", "data", "latitude", "longitude")
+
+# Marker kept on entries whose every field was dropped, so they stay truthy
+# (several helpers treat an empty dict as "missing")
+PRUNED_MARKER = "_pruned"
+
+
+def _prune(entry, fields):
+    """Return a copy of entry restricted to fields (non-dict values are returned unchanged)."""
+    if not isinstance(entry, dict):
+        return entry
+    pruned = {key: entry[key] for key in fields if key in entry}
+    if entry and not pruned:
+        pruned[PRUNED_MARKER] = True
+    return pruned
+
+
+def _prune_photo_entries(photos):
+    if not isinstance(photos, dict):
+        return photos
+    return {photo_id: _prune(photo_entry, PHOTO_ENTRY_FIELDS) for photo_id, photo_entry in photos.items()}
+
+
+def prune_node(node_data):
+    """Keep only the node fields the processor reads."""
+    node = _prune(node_data, NODE_FIELDS)
+    if isinstance(node, dict):
+        if "photos" in node:
+            node["photos"] = _prune_photo_entries(node["photos"])
+        properties = node.get("properties")
+        if isinstance(properties, dict):
+            node["properties"] = {"photos": _prune_photo_entries(properties["photos"])} if "photos" in properties else {}
+    return node
+
+
+def prune_connection(conn_data):
+    """Keep only the connection and section fields the processor reads."""
+    conn = _prune(conn_data, CONNECTION_FIELDS)
+    if isinstance(conn, dict) and isinstance(conn.get("sections"), dict):
+        sections = {}
+        for section_id, section_data in conn["sections"].items():
+            section = _prune(section_data, SECTION_FIELDS)
+            if isinstance(section, dict) and "photos" in section:
+                section["photos"] = _prune_photo_entries(section["photos"])
+            sections[section_id] = section
+        conn["sections"] = sections
+    return conn
+
+
+def prune_top_level_photo(photo_data):
+    """Keep only the photofirst_data and location of a top-level photo entry."""
+    photo = _prune(photo_data, TOP_LEVEL_PHOTO_FIELDS)
+    if isinstance(photo, dict) and isinstance(photo.get("data"), dict):
+        photo["data"] = _prune(photo["data"], ("photofirst_data",))
+    return photo
+
+
+def prune_photo_summary(summary_data):
+    """Keep only the photofirst_data of a photo_summary entry."""
+    return _prune(summary_data, ("photofirst_data",))
+
+
+def prune_trace(trace_data):
+    """Traces are small and read by several helpers; keep them whole."""
+    return trace_data
+
+
+# Top-level keys every Katapult export has (see core.validate_katapult_data)
+REQUIRED_KEYS = ("nodes", "connections")
+NOT_KATAPULT_MESSAGE = "This does not appear to be a valid Katapult JSON file. Required keys not found."
+
+# Bytes handed to the UploadValidator parser at a time
+VALIDATOR_FEED_SIZE = 64 * 1024
+
+
+class UploadValidator:
+    """
+    Incremental check of an upload while it is being saved.
+
+    Fed every block storage.save_file writes (update), it runs an ijson push
+    parser over the bytes as they arrive and records whether the document is
+    well-formed JSON with the REQUIRED_KEYS at the top level, holding only the
+    parser state. Once the keys have been seen the remaining bytes are only
+    checked for syntax. Errors are recorded, not raised, so a save is never
+    interrupted; validate() raises them afterwards. Without ijson nothing is
+    checked here and the upload is validated when it is loaded.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start over (e.g. when a failed S3 upload falls back to local storage)."""
+        self._events = ijson.sendable_list() if ijson is not None else None
+        self._parser = ijson.basic_parse_coro(self._events, use_float=True) if ijson is not None else None
+        self._depth = 0
+        self._is_object = None
+        self._missing_keys = set(REQUIRED_KEYS)
+        self.error = None
+        self._closed = False
+
+    def update(self, data):
+        # An empty block would end the parser; the end of the upload is handled by validate()
+        if not data or self._parser is None or self.error is not None or self._closed:
+            return
+        # Parsed in small pieces so the pending events never hold more than a piece's worth
+        view = memoryview(data)
+        for start in range(0, len(view), VALIDATOR_FEED_SIZE):
+            try:
+                self._parser.send(bytes(view[start:start + VALIDATOR_FEED_SIZE]))
+            except ijson.JSONError as e:
+                self.error = json.JSONDecodeError(f"Invalid JSON: {e}", "", 0)
+                return
+            self._consume_events()
+
+    def _consume_events(self):
+        if self._missing_keys:
+            depth = self._depth
+            for event, value in self._events:
+                if event == "map_key":
+                    if depth == 1:
+                        self._missing_keys.discard(value)
+                elif event == "start_map" or event == "start_array":
+                    if depth == 0:
+                        self._is_object = event == "start_map"
+                    depth += 1
+                elif event == "end_map" or event == "end_array":
+                    depth -= 1
+                elif depth == 0:
+                    self._is_object = False  # A top-level scalar
+            self._depth = depth
+        del self._events[:]
+
+    def validate(self):
+        """
+        Finish parsing and check the result.
+
+        Raises:
+            json.JSONDecodeError: If the bytes seen so far are not a complete JSON document
+            ValueError: If the document is not an object with the REQUIRED_KEYS
+        """
+        if self._parser is None:
+            return
+        if self.error is None and not self._closed:
+            self._closed = True
+            try:
+                self._parser.close()
+                self._consume_events()
+            except ijson.JSONError as e:
+                self.error = json.JSONDecodeError(f"Invalid JSON: {e}", "", 0)
+        if self.error is not None:
+            raise self.error
+        if not self._is_object or self._missing_keys:
+            raise ValueError(NOT_KATAPULT_MESSAGE)
+
+
+# Dotted ijson prefix of each streamed collection -> pruning function for its entries
+STREAMED_COLLECTIONS = {
+    "nodes": prune_node,
+    "connections": prune_connection,
+    "photos": prune_top_level_photo,
+    "photo_summary": prune_photo_summary,
+    "traces.trace_data": prune_trace,
+}
+
+
+def _collection_target(job, prefix):
+    """Return (creating it if needed) the dict in job that holds the collection at prefix."""
+    target = job
+    for key in prefix.split("."):
+        target = target.setdefault(key, {})
+    return target
+
+
+def load_katapult_stream(source):
+    """
+    Load a Katapult export with a streaming parser, keeping only the fields the processor reads.
+
+    Args:
+        source (str | bytes | file-like): Path to the JSON file, its raw bytes, or a binary file object
+
+    Returns:
+        dict: Katapult job data with the same shape as json.load would give, minus unused fields
+
+    Raises:
+        json.JSONDecodeError: If the input is not valid JSON (same as the json.load path)
+    """
+    if ijson is None:
+        logger.warning("ijson is not installed; falling back to a full parse for Katapult ingestion")
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return json_backend.loads(source)
+        return json_backend.load(source)
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return _walk(file)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return _walk(io.BytesIO(source))
+    return _walk(source)
+
+
+def _walk(file):
+    try:
+        return _walk_events(file)
+    except ijson.JSONError as e:
+        # Callers already handle json.JSONDecodeError for malformed uploads
+        raise json.JSONDecodeError(f"Invalid JSON: {e}", "", 0) from e
+
+
+def _walk_events(file):
+    job = {}
+    builder = None       # ObjectBuilder for the entry currently being materialized
+    depth = 0            # container depth inside the current entry
+    store = None         # callable(value) that stores the finished entry
+    pending_key = None   # (prefix, key) of the map_key whose value comes next
+    items = 0
+
+    for prefix, event, value in ijson.parse(file, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    store(builder.value)
+                    builder = None
+            continue
+
+        if event == "map_key":
+            pending_key = (prefix, value)
+            continue
+
+        if pending_key is None:
+            continue
+        parent, key = pending_key
+        pending_key = None
+
+        if parent in STREAMED_COLLECTIONS:
+            # An entry of a streamed collection: build it, prune it, keep it
+            prune = STREAMED_COLLECTIONS[parent]
+            collection = _collection_target(job, parent)
+
+            def store(entry, collection=collection, key=key, prune=prune):
+                collection[key] = prune(entry)
+
+            items += 1
+        elif parent == "" and key in STREAMED_COLLECTIONS and event == "start_map":
+            # Start of a streamed collection; its entries arrive as map_keys at this prefix
+            _collection_target(job, key)
+            continue
+        elif parent == "" and key == "traces" and event == "start_map":
+            # Only traces.trace_data is streamed; other trace keys are skipped
+            job.setdefault("traces", {})
+            continue
+        elif parent == "":
+            # Other top-level values: keep scalars (job_name, ...). Containers are skipped
+            # unless they are a streamed collection in an unexpected shape (e.g. a list),
+            # which is kept whole so validation and error reporting still see it.
+            if event not in ("start_map", "start_array"):
+                job[key] = value
+                continue
+            if key not in STREAMED_COLLECTIONS and key != "traces":
+                continue
+
+            def store(entry, key=key):
+                job[key] = entry
+        else:
+            continue
+
+        if event in ("start_map", "start_array"):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            depth = 1
+        else:
+            store(value)
+
+    logger.debug(f"Streamed {items} Katapult entries")
+    return job
@@ -0,0 +1,111 @@
+"""
+One-time classification of the traces in a Katapult job.
+
+Every wire visit used to strip and upper-case the trace's company and cable
+type and loop over the utility company names to decide whether it is a
+utility primary, neutral, guy, ... The same few hundred traces were classified
+again for every photo, pole and span. classify_traces builds a table of
+TraceClass entries once per job (JobIndex.trace_class) and the extraction
+loops read the flags and names from it.
+"""
+
+import enum
+import logging
+from .photo_data_utils import get_utility_company_names
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class TraceFlag(enum.IntFlag):
+    """Classification flags of a trace."""
+    NONE = 0
+    UTILITY = 1
+    PRIMARY = 2
+    NEUTRAL = 4
+    STREET_LIGHT = 8
+    GUY = 16
+    PROPOSED = 32
+
+
+class TraceClass:
+    """
+    Classified view of one traces.trace_data entry.
+
+    Attributes:
+        trace_id (str): The trace ID
+        company (str): Stripped company name ("" if missing)
+        cable_type (str): Stripped cable type ("" if missing)
+        company_upper (str): company.upper()
+        cable_type_upper (str): cable_type.upper()
+        attacher_name (str): Canonical attacher name, "<company> <cable_type>" (stripped)
+        attacher_name_upper (str): attacher_name.upper()
+        proposed: The trace's raw 'proposed' value (False if missing)
+        flags (TraceFlag): Combined classification flags
+        is_utility, is_primary, is_neutral, is_street_light, is_guy, is_proposed (bool):
+            The individual flags, kept as plain attributes for the hot loops
+    """
+
+    __slots__ = (
+        "trace_id", "company", "cable_type", "company_upper", "cable_type_upper",
+        "attacher_name", "attacher_name_upper", "proposed", "flags",
+        "is_utility", "is_primary", "is_neutral", "is_street_light", "is_guy", "is_proposed",
+    )
+
+    def __init__(self, trace_id, trace_info, utility_company_names):
+        self.trace_id = trace_id
+        self.company = _text(trace_info.get("company"))
+        self.cable_type = _text(trace_info.get("cable_type"))
+        self.company_upper = self.company.upper()
+        self.cable_type_upper = self.cable_type.upper()
+        self.attacher_name = f"{self.company} {self.cable_type}".strip()
+        self.attacher_name_upper = self.attacher_name.upper()
+        self.proposed = trace_info.get("proposed", False)
+
+        self.is_utility = self.company_upper in utility_company_names
+        self.is_primary = self.cable_type_upper == "PRIMARY"
+        self.is_neutral = self.cable_type_upper == "NEUTRAL"
+        self.is_street_light = self.cable_type_upper == "STREET LIGHT"
+        self.is_guy = "GUY" in self.cable_type_upper
+        self.is_proposed = bool(self.proposed)
+
+        flags = TraceFlag.NONE
+        for flag, is_set in ((TraceFlag.UTILITY, self.is_utility), (TraceFlag.PRIMARY, self.is_primary),
+                             (TraceFlag.NEUTRAL, self.is_neutral), (TraceFlag.STREET_LIGHT, self.is_street_light),
+                             (TraceFlag.GUY, self.is_guy), (TraceFlag.PROPOSED, self.is_proposed)):
+            if is_set:
+                flags |= flag
+        self.flags = flags
+
+    def __repr__(self):
+        return f"TraceClass({self.trace_id!r}, {self.attacher_name!r}, {self.flags!r})"
+
+
+def _text(value):
+    """Stripped string form of a trace field ("" for None)."""
+    if value is None:
+        return ""
+    return value.strip() if isinstance(value, str) else str(value).strip()
+
+
+# Classification used for wires whose trace is not defined in trace_data
+UNKNOWN_TRACE = TraceClass(None, {}, frozenset())
+
+
+def classify_traces(trace_data):
+    """
+    Classify every trace of a job.
+
+    Args:
+        trace_data (dict): job_data["traces"]["trace_data"]
+
+    Returns:
+        dict: trace_id -> TraceClass (entries that are not dicts are left out)
+    """
+    utility_company_names = frozenset(name.upper() for name in get_utility_company_names())
+    table = {}
+    for trace_id, trace_info in (trace_data or {}).items():
+        if isinstance(trace_info, dict):
+            table[trace_id] = TraceClass(trace_id, trace_info, utility_company_names)
+    logger.debug(f"Classified {len(table)} traces")
+    return table
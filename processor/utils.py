@@ -2,6 +2,7 @@
 Utility functions for the Katapult processor.
 """
 
+import re
 import math
 
 def get_nested_value(data_dict, path_keys, default=None):
@@ -56,3 +57,25 @@ def compare_scids(scid1, scid2):
     if len(scid1_parts) == 1 and len(scid2_parts) > 1: return -1
     if len(scid1_parts) > 1 and len(scid2_parts) == 1: return 1
     return -1 if scid1 < scid2 else 1
+
+
+def normalize_pole_label(label):
+    """
+    Normalize a pole identifier for matching across systems.
+
+    SPIDAcalc location labels carry a sequence prefix ("1-PL410620") that
+    Katapult pole tags do not; case, spaces and punctuation are ignored.
+
+    Args:
+        label: The pole label or tag
+
+    Returns:
+        str: The normalized label ("" for missing or "N/A" labels)
+    """
+    if label is None:
+        return ""
+    text = str(label).strip().upper()
+    if text in ("", "N/A"):
+        return ""
+    text = re.sub(r"^\d+-(?=.*[A-Z])", "", text)
+    return re.sub(r"[^A-Z0-9]", "", text)